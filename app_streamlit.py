@@ -1,72 +1,103 @@
 import datetime
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
 import streamlit as st
 
-from services import audio, stt, nlp
+from services import artifacts, audio, pipeline, publish
 from models.episode import Episode
 
 
+# Libellés des étapes du pipeline (barre de progression)
+STAGE_LABELS = {
+    "audio": "Audio final et qualité…",
+    "transcription": "Transcription en cours…",
+    "nlp": "Indexation (mots-clés, catégorie)…",
+    "done": "Terminé",
+}
+
+# Caractères de transcription affichés dans l'aperçu du payload JSON
+PAYLOAD_PREVIEW_CHARS = 300
+
 BASE_DIR = Path(__file__).resolve().parent
 UPLOAD_RAW_DIR = BASE_DIR / "uploads" / "raw"
 UPLOAD_FINAL_DIR = BASE_DIR / "uploads" / "final"
 
 
 def save_uploaded_file(file) -> Path:
-    """Sauvegarde un fichier Streamlit dans uploads/raw/."""
-    UPLOAD_RAW_DIR.mkdir(parents=True, exist_ok=True)
-    dest = UPLOAD_RAW_DIR / file.name
-    with open(dest, "wb") as f:
-        f.write(file.getbuffer())
-    return dest
+    """Sauvegarde un fichier Streamlit dans uploads/raw/ (écriture en streaming)."""
+    file.seek(0)
+    return audio.save_stream(file, file.name)
 
 
 def build_episode_from_file(
     file_path: Path,
     contributor_email: str,
     contributor_name: Optional[str] = None,
-) -> Episode:
-    """
-    Pipeline complet local :
-    - audio.build_final_audio
-    - stt.transcribe
-    - nlp.extract_keywords / guess_category / map_category_to_cover
-    - construit un Episode
+    on_progress: Optional[pipeline.ProgressCallback] = None,
+    on_segment: Optional[pipeline.SegmentCallback] = None,
+) -> Tuple[Episode, Dict[str, Any]]:
     """
+    Pipeline complet local, exécuté dans le thread lancé par
+    run_with_live_transcript (voir services.pipeline.build_episode) :
+    qualité et mixage audio, transcription, NLP et catégorie, puis Episode
+    brouillon. `on_progress` et `on_segment` sont appelés depuis ce thread :
+    ils ne font que déposer les événements dans la file lue par le script.
 
-    # 1. Audio final + qualité
-    audio_info = audio.build_final_audio(str(file_path))
-
-    # 2. Transcription
-    transcript = stt.transcribe(audio_info["final_path"])
-
-    # 3. NLP
-    keywords = nlp.extract_keywords(transcript)
-    category = nlp.guess_category(transcript)
-    cover_image = nlp.map_category_to_cover(category)
-
-    # 4. Episode (brouillon)
-    title = "Titre provisoire"
-    if contributor_name:
-        title = f"{title} - {contributor_name}"
-
-    episode = Episode(
-        title=title,
-        audio_url=audio_info["final_path"],
-        duration=audio_info["duration_seconds"],
-        transcript=transcript,
-        keywords=keywords,
-        category=category,
-        cover_image=cover_image,
+    On renvoie aussi info audio détaillée pour l'affichage.
+    """
+    return pipeline.build_episode(
+        str(file_path),
         contributor_email=contributor_email,
-        quality_status=audio_info["quality_status"],
-        quality_score=audio_info["quality_score"],
-        status="draft",
+        contributor_name=contributor_name,
+        on_progress=on_progress,
+        on_segment=on_segment,
     )
 
-    # On renvoie aussi info audio détaillée pour l'affichage
-    return episode, audio_info
+
+def run_with_live_transcript(raw_path: Path, contributor_email: str, contributor_name: Optional[str]):
+    """
+    Lance le pipeline dans un thread et affiche au fil de l'eau l'étape en
+    cours et la transcription partielle. Les éléments Streamlit ne sont mis
+    à jour que depuis le thread du script : le pipeline ne fait que déposer
+    ses événements dans une file.
+    """
+    events: "queue.Queue" = queue.Queue()
+    progress_bar = st.progress(0.0, text="Démarrage…")
+    live_text = st.empty()
+    lines = []
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(
+            build_episode_from_file,
+            file_path=raw_path,
+            contributor_email=contributor_email,
+            contributor_name=contributor_name,
+            on_progress=lambda stage, progress: events.put(("progress", (stage, progress))),
+            on_segment=lambda seg: events.put(("segment", seg)),
+        )
+
+        while not (future.done() and events.empty()):
+            try:
+                kind, data = events.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            if kind == "progress":
+                stage, progress = data
+                progress_bar.progress(progress, text=STAGE_LABELS.get(stage, stage))
+            else:
+                minutes, seconds = divmod(int(data["start"]), 60)
+                lines.append(f"[{minutes:02d}:{seconds:02d}] {data['text']}")
+                live_text.text("\n".join(lines[-20:]))
+
+        result = future.result()
+
+    progress_bar.empty()
+    live_text.empty()
+    return result
 
 
 def main():
@@ -116,13 +147,14 @@ def main():
             st.error("Merci de renseigner un email de contributeur.")
             return
 
-        with st.spinner("Traitement en cours… (audio + transcription + indexation)"):
+        try:
             raw_path = save_uploaded_file(uploaded_file)
-            episode, audio_info = build_episode_from_file(
-                file_path=raw_path,
-                contributor_email=contributor_email,
-                contributor_name=contributor_name,
-            )
+        except audio.UploadTooLarge as e:
+            st.error(str(e))
+            return
+
+        # Progression et transcription partielle affichées pendant le traitement
+        episode, audio_info = run_with_live_transcript(raw_path, contributor_email, contributor_name)
 
         st.success("✅ Traitement terminé !")
 
@@ -159,7 +191,14 @@ def main():
                 st.error(f"Qualité : **{quality_status}** (score {quality_score}/100)")
 
             if "quality_details" in audio_info:
-                checks = audio_info["quality_details"]["checks"]
+                details = audio_info["quality_details"]
+                if details.get("loudness_lufs") is not None:
+                    st.write(
+                        f"- Loudness : {details['loudness_lufs']:.1f} LUFS "
+                        f"· True peak : {details['true_peak_dbtp']:.1f} dBTP"
+                    )
+
+                checks = details["checks"]
                 with st.expander("Détails des critères éditoriaux"):
                     for name, info in checks.items():
                         ok = info.get("ok", False)
@@ -210,20 +249,19 @@ def main():
             """
         )
 
-        # Payload simulé pour Symfony
-        simulated_payload = {
-            "title": episode.title,
-            "audioUrl": episode.audio_url,
-            "duration": episode.duration,
-            "transcript": episode.transcript,
-            "keywords": episode.keywords,
-            "category": episode.category,
-            "coverImage": episode.cover_image,
-            "contributorEmail": episode.contributor_email,
-            "qualityStatus": episode.quality_status,
-            "qualityScore": episode.quality_score,
-            "status": episode.status,
-        }
+        # Payload simulé pour Symfony (mêmes champs que l'envoi réel)
+        transcript_ref = None
+        if not artifacts.inline_transcript():
+            transcript_ref = artifacts.put_transcript(episode.transcript, audio_info["transcript_segments"])
+        simulated_payload = publish.build_payload(episode, transcript_ref)
+
+        # La transcription complète est déjà affichée plus haut : st.json n'en
+        # montre que le début (rendu lent sur les épisodes longs)
+        transcript = simulated_payload.get("transcript")
+        if transcript and len(transcript) > PAYLOAD_PREVIEW_CHARS:
+            simulated_payload["transcript"] = (
+                f"{transcript[:PAYLOAD_PREVIEW_CHARS]}… ({len(transcript)} caractères au total)"
+            )
 
         with st.expander("Voir le payload JSON prêt pour Symfony"):
             st.json(simulated_payload)
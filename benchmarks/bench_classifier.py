@@ -0,0 +1,76 @@
+"""
+Débit du classifieur par embeddings pour reclasser tout le catalogue.
+
+    python -m benchmarks.bench_classifier [nb_épisodes_synthétiques]
+
+Transcriptions : celles de l'index de recherche (uploads/cache/search.sqlite),
+sinon des transcriptions synthétiques. Deux passes : cache d'embeddings vide
+(base temporaire), puis cache chaud. Affiche épisodes/s, morceaux/s et la
+répartition des catégories et des méthodes (embedding / repli lexique).
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+from services import classifier, nlp, search
+
+
+def _catalog() -> List[str]:
+    if not search.SEARCH_DB_PATH.exists():
+        return []
+    conn = sqlite3.connect(search.SEARCH_DB_PATH)
+    try:
+        return [row[0] for row in conn.execute("SELECT transcript FROM episodes_fts")]
+    finally:
+        conn.close()
+
+
+def _synthetic(count: int, words: int = 2000) -> List[str]:
+    rng = random.Random(0)
+    sentences = [s for group in classifier.CATEGORY_PROTOTYPES.values() for s in group]
+    filler = "alors on en parle avec notre invitée qui nous raconte son parcours".split()
+    out = []
+    for _ in range(count):
+        text = []
+        while len(text) < words:
+            text.extend(rng.choice(sentences).split() if rng.random() < 0.1 else [rng.choice(filler)])
+        out.append(" ".join(text))
+    return out
+
+
+def main(count: int = 200) -> None:
+    transcripts = _catalog()
+    source = "catalogue"
+    if not transcripts:
+        transcripts, source = _synthetic(count), "synthétique"
+
+    themes = [nlp.analyze(t)["categories"] for t in transcripts]
+    chunks = sum(len(classifier.chunk_text(t)) for t in transcripts)
+    print(f"{len(transcripts)} épisodes ({source}), {chunks} morceaux de {classifier.CHUNK_WORDS} mots, "
+          f"modèle {classifier.EMBEDDING_MODEL}, lots de {classifier.EMBEDDING_BATCH_SIZE}")
+
+    classifier._prototype_matrix()  # modèle chargé hors chronométrage
+
+    with tempfile.TemporaryDirectory() as tmp:
+        classifier.EMBEDDING_CACHE_PATH = Path(tmp) / "embeddings.sqlite"
+        classifier._prototypes = None
+        classifier._prototype_matrix()
+
+        for label in ("cache vide", "cache chaud"):
+            start = time.perf_counter()
+            results = classifier.classify_batch(transcripts, themes)
+            elapsed = time.perf_counter() - start
+            print(f"{label:12s}: {elapsed:7.1f} s  {len(transcripts) / elapsed:8.1f} épisodes/s  "
+                  f"{chunks / elapsed:8.1f} morceaux/s")
+
+    print("Catégories :", dict(Counter(r["category"] for r in results)))
+    print("Méthodes   :", dict(Counter(r["method"] for r in results)))
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,53 @@
+"""
+Benchmark de l'index du corpus (document frequency, SQLite) et du classement BM25.
+
+    python -m benchmarks.bench_corpus_index [nb_épisodes] [mots_par_épisode]
+
+Remplit un index temporaire avec des épisodes synthétiques (vocabulaire de
+Zipf) et mesure, au fil de la croissance du corpus, le coût d'ajout d'un
+épisode et du classement BM25 de ses mots.
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from services import corpus_index
+
+
+def _episode(rng: np.random.Generator, words: int, vocabulary: int = 50000) -> Counter:
+    ranks = np.minimum(rng.zipf(1.3, size=words), vocabulary)
+    return Counter(f"mot{r}" for r in ranks.tolist())
+
+
+def main(episodes: int = 20000, words: int = 8000) -> None:
+    rng = np.random.default_rng(0)
+    checkpoints = {int(episodes * f) for f in (0.01, 0.1, 0.5, 1.0)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_index.CORPUS_DB_PATH = Path(tmp) / "corpus.sqlite"
+        print(f"{'épisodes':>9s} {'ajout':>9s} {'BM25':>9s} {'termes':>8s} {'base':>8s}")
+
+        add_time = 0.0
+        for i in range(1, episodes + 1):
+            counts = _episode(rng, words)
+            start = time.perf_counter()
+            corpus_index.add_document(f"ep{i}", counts)
+            add_time += time.perf_counter() - start
+
+            if i in checkpoints:
+                probe = _episode(rng, words)
+                start = time.perf_counter()
+                corpus_index.bm25_scores(probe)
+                t_rank = time.perf_counter() - start
+                size_mb = os.path.getsize(corpus_index.CORPUS_DB_PATH) / 1e6
+                print(f"{i:9d} {add_time * 1000 / i:7.1f}ms {t_rank * 1000:7.1f}ms "
+                      f"{len(probe):8d} {size_mb:6.1f}Mo")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
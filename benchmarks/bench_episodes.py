@@ -0,0 +1,66 @@
+"""
+Benchmark de la liste des épisodes (pagination par curseur) sur un catalogue synthétique.
+
+    python -m benchmarks.bench_episodes [nb_épisodes]
+
+Remplit une base temporaire puis mesure le temps d'une page au début, au
+milieu et à la fin du catalogue, avec et sans filtre. Le temps ne doit pas
+dépendre de la position de la page (pas d'OFFSET).
+"""
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from services import episodes
+
+CATEGORIES = ["Régulation émotionnelle", "Communication & relations", "Inspiration & transformation"]
+
+
+def _fill(count: int) -> None:
+    rng = random.Random(0)
+    now = time.time()
+    with episodes._connect() as conn:
+        conn.executemany(
+            "INSERT INTO episodes (episode_id, status, stage, title, contributor_email, category, keywords, "
+            "duration, quality_status, quality_score, created_at, updated_at) "
+            "VALUES (?, 'draft', 'done', ?, ?, ?, '[]', 1800, 'OK', 90, ?, ?)",
+            ((f"ep{i}", f"Épisode {i}", f"c{rng.randrange(500)}@example.org", rng.choice(CATEGORIES),
+              now - count + i, now) for i in range(count)),
+        )
+
+
+def _page_at(position: int, size: int, **filters) -> float:
+    """Temps (médiane) de la page qui commence après `position` épisodes."""
+    cursor = None
+    remaining = position
+    while remaining > 0:
+        page = episodes.list_episodes(limit=min(remaining, episodes.EPISODES_MAX_PAGE_SIZE), cursor=cursor, **filters)
+        cursor = page["next_cursor"]
+        remaining -= len(page["episodes"])
+        if cursor is None:
+            break
+
+    timings = []
+    for _ in range(20):
+        start = time.perf_counter()
+        episodes.list_episodes(limit=size, cursor=cursor, **filters)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(count: int = 100000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        episodes.EPISODES_DB_PATH = Path(tmp) / "episodes.sqlite"
+        _fill(count)
+
+        for label, filters in (("tous", {}), ("catégorie", {"category": CATEGORIES[0]})):
+            for position in (0, count // 6, count // 3 - 100):
+                print(f"{label:10s} page de 50 après {position:6d} épisodes : "
+                      f"{_page_at(position, 50, **filters) * 1000:5.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
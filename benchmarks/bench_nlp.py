@@ -0,0 +1,88 @@
+"""
+Benchmark NLP : trois appels séparés (ancienne implémentation, texte
+normalisé à chaque appel) vs `nlp.analyze` (une passe).
+
+    python -m benchmarks.bench_nlp [nb_mots] [nb_transcriptions]
+
+La transcription est synthétique (vocabulaire des lexiques + mots courants),
+aucun modèle requis.
+"""
+import random
+import sys
+import time
+from collections import Counter
+from typing import List
+
+from services import nlp
+
+FILLER = (
+    "alors on va parler aujourd'hui de comment les équipes vivent leur quotidien "
+    "avec beaucoup de questions autour du corps du travail et des projets"
+).split()
+
+
+def _synthetic(words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    vocabulary = nlp.CURATED_KEYWORDS + [e for exprs in nlp.THEME_LEXICON.values() for e in exprs]
+    out = []
+    while len(out) < words:
+        if rng.random() < 0.05:
+            out.extend(rng.choice(vocabulary).split())
+        else:
+            out.append(rng.choice(FILLER))
+        if rng.random() < 0.08:
+            out[-1] += rng.choice([",", ".", " ?"])
+    return " ".join(out)
+
+
+def _legacy(transcript: str) -> tuple:
+    """Ancienne implémentation : extract_keywords, guess_category, pochette."""
+    text_norm = nlp._normalize(transcript)
+    tokens = nlp._tokenize(transcript)
+    curated = [kw for kw in nlp.CURATED_KEYWORDS if nlp._normalize(kw) in text_norm]
+    counts = Counter(tokens)
+    frequent = [w for w, _ in counts.most_common(30) if len(w) >= 4]
+    keywords: List[str] = list(dict.fromkeys(curated + frequent))[:10]
+
+    text_norm = nlp._normalize(transcript)
+    scores = {}
+    for category, expressions in nlp.THEME_LEXICON.items():
+        score = sum(1 for expr in expressions if expr in text_norm)
+        if score:
+            scores[category] = score
+    category = max(scores.items(), key=lambda x: x[1])[0] if scores else "Bien-être général"
+    return keywords, category, nlp.map_category_to_cover(category)
+
+
+def _timed(fn, *args, repeat: int = 3):
+    """Meilleur temps sur `repeat` exécutions."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main(words: int = 20000, count: int = 20) -> None:
+    transcripts = [_synthetic(words, seed) for seed in range(count)]
+    # Même classement que l'ancien code (sans index du corpus) : comparaison à périmètre égal
+    nlp.KEYWORD_RANKING = "frequency"
+    nlp.analyze("")  # automate construit hors chronométrage
+
+    _, t_legacy = _timed(lambda: [_legacy(t) for t in transcripts])
+    results, t_analyze = _timed(nlp.analyze_batch, transcripts)
+
+    same_category = sum(
+        r["category"] == _legacy(t)[1] for r, t in zip(results, transcripts)
+    )
+
+    print(f"{count} transcriptions de {words} mots")
+    print(f"3 appels (ancien) : {t_legacy * 1000 / count:8.1f} ms / transcription")
+    print(f"nlp.analyze       : {t_analyze * 1000 / count:8.1f} ms / transcription")
+    print(f"Accélération      : x{t_legacy / t_analyze:.2f}")
+    print(f"Même catégorie    : {same_category}/{count} (l'ancien code matchait aussi à l'intérieur des mots)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,86 @@
+"""
+Benchmark du poids d'un épisode sur le réseau : transcription dans le JSON
+(TRANSCRIPT_MODE=inline) contre artefact compressé référencé par hash.
+
+    python -m benchmarks.bench_payload [minutes]
+
+Transcription synthétique en français : mots tirés du vocabulaire des
+lexiques et des prototypes du classifieur (moitié loi de Zipf, moitié
+uniforme, moins redondant qu'une vraie transcription), ~150 mots/minute,
+un segment toutes les ~4 s, précédé de segments de générique.
+"""
+import gzip
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from models.episode import Episode
+from services import artifacts, classifier, nlp, publish
+
+
+def _vocabulary():
+    texts = [s for group in classifier.CATEGORY_PROTOTYPES.values() for s in group]
+    texts += nlp.CURATED_KEYWORDS + [e for group in nlp.THEME_LEXICON.values() for e in group]
+    return sorted({w.strip(".,").lower() for text in texts for w in text.split()})
+
+
+def _transcript(rng: random.Random, minutes: int):
+    vocabulary = _vocabulary()
+    segments = [{"start": 0.0, "end": 3.5, "text": " Bienvenue sur Inspiron.", "source": "intro"}]
+    t, words = 4.0, 0
+    while words < minutes * 150:
+        n = rng.randint(6, 16)
+        text = " " + " ".join(
+            vocabulary[min(int(rng.paretovariate(0.8)) - 1, len(vocabulary) - 1)]
+            if rng.random() < 0.5 else rng.choice(vocabulary)
+            for _ in range(n)
+        ) + "."
+        segments.append({"start": round(t, 2), "end": round(t + n / 2.5, 2), "text": text, "source": "episode"})
+        t += n / 2.5 + rng.random() * 0.4
+        words += n
+    return "".join(s["text"] for s in segments[1:]).strip(), segments
+
+
+def main(minutes: int = 60) -> None:
+    rng = random.Random(0)
+    transcript, segments = _transcript(rng, minutes)
+    episode = Episode(
+        title="Titre provisoire", audio_url="uploads/final/episode.mp3", duration=minutes * 60,
+        transcript=transcript, keywords=["charge mentale"] * 10, category=nlp.CATEGORY_REGULATION,
+        cover_image="cover.png", contributor_email="a@example.org", quality_status="OK", quality_score=90,
+    )
+
+    inline = json.dumps(publish.build_payload(episode), ensure_ascii=False).encode("utf-8")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        artifacts.ARTIFACT_DIR = Path(tmp)
+        for codec in ("gzip", "zstd"):
+            artifacts.ARTIFACT_CODEC = codec
+            for path in Path(tmp).iterdir():
+                path.unlink()
+            start = time.perf_counter()
+            ref = artifacts.put_transcript(transcript, segments)
+            elapsed = time.perf_counter() - start
+            if ref["encoding"] != codec:
+                print(f"{codec} : module absent, repli sur {ref['encoding']}")
+                continue
+            loaded = artifacts.load_transcript(ref["hash"])
+            assert loaded["transcript"] == transcript
+            assert [s["text"] for s in loaded["segments"]] == [s["text"].strip() for s in segments]
+            assert [s["start"] for s in loaded["segments"]] == [s["start"] for s in segments]
+
+            slim = json.dumps(publish.build_payload(episode, ref), ensure_ascii=False).encode("utf-8")
+            total = len(slim) + ref["compressedSize"]
+            print(f"{ref['encoding']:5s} artefact {ref['size'] / 1e3:7.1f} ko → {ref['compressedSize'] / 1e3:6.1f} ko "
+                  f"en {elapsed * 1000:5.1f} ms ; payload {len(slim)} o ({len(inline) / len(slim):.0f}× moins) ; "
+                  f"payload + artefact {total / 1e3:6.1f} ko ({len(inline) / total:4.1f}× moins)")
+
+    print(f"inline : payload {len(inline) / 1e3:.1f} ko sans les {len(segments)} segments "
+          f"(réponse API gzip : {len(gzip.compress(inline)) / 1e3:.1f} ko)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,128 @@
+"""
+Publication vers un faux serveur Symfony local : débit de republication du
+catalogue et comportement en cas de panne.
+
+    python -m benchmarks.bench_publish [nb_épisodes] [latence_ms] [taux_erreur]
+
+Compare :
+- l'ancien client (requests.post, une connexion par épisode)
+- la session partagée (keep-alive), un appel par épisode
+- le mode groupé (SYMFONY_BULK_URL, PUBLISH_BULK_SIZE épisodes par requête)
+Puis vérifie les nouvelles tentatives (taux d'erreurs 503 injecté) et le
+disjoncteur (serveur en panne totale).
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from models.episode import Episode
+from services import publish
+
+
+class _Stub:
+    latency = 0.0
+    error_rate = 0.0
+    down = False
+    received = 0
+    requests = 0
+    lock = threading.Lock()
+    counter = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    # En-têtes et corps écrits séparément : sans ça, Nagle + ACK retardé
+    # ajoutent ~40 ms à chaque réponse sur une connexion réutilisée
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(_Stub.latency)
+
+        with _Stub.lock:
+            _Stub.counter += 1
+            fail = _Stub.down or (_Stub.error_rate and _Stub.counter % round(1 / _Stub.error_rate) == 0)
+            if not fail:
+                _Stub.requests += 1
+                _Stub.received += len(body["episodes"]) if self.path.endswith("/bulk") else 1
+
+        status = 503 if fail else 201
+        payload = json.dumps({"ok": not fail}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _episode(i: int) -> Episode:
+    return Episode(
+        title=f"Épisode {i}", audio_url=f"/final/{i}.mp3", duration=1800,
+        transcript="mot " * 3000, keywords=["stress"], category="Stress & émotions",
+        cover_image="/covers/stress.png", contributor_email="test@inspiron.com",
+        quality_status="OK", quality_score=90,
+    )
+
+
+def _legacy(episodes):
+    """Ancien client : requests.post sans session."""
+    for episode in episodes:
+        requests.post(publish.SYMFONY_API_URL, json=publish.build_payload(episode),
+                      headers={"Content-Type": "application/json"}, timeout=10)
+
+
+def _timed(label, fn, episodes):
+    _Stub.received = _Stub.requests = 0
+    start = time.perf_counter()
+    results = fn(episodes)
+    elapsed = time.perf_counter() - start
+    print(f"{label:28s} {len(episodes) / elapsed:8.1f} épisodes/s  "
+          f"({_Stub.requests} requêtes, {_Stub.received} épisodes reçus)")
+    return results
+
+
+def main(count: int = 500, latency_ms: float = 2.0, error_rate: float = 0.2) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    publish.SYMFONY_API_URL = f"{base}/api/episodes"
+    publish.PUBLISH_BACKOFF_BASE = 0.01
+    _Stub.latency = latency_ms / 1000
+    episodes = [_episode(i) for i in range(count)]
+
+    print(f"{count} épisodes, latence serveur {latency_ms:.0f} ms")
+    _timed("ancien client", _legacy, episodes)
+    publish.SYMFONY_BULK_URL = None
+    _timed("session partagée", publish.publish_bulk, episodes)
+    publish.SYMFONY_BULK_URL = f"{base}/api/episodes/bulk"
+    _timed(f"groupé ({publish.PUBLISH_BULK_SIZE}/requête)", publish.publish_bulk, episodes)
+
+    # Pannes intermittentes : tout doit finir par passer grâce aux nouvelles tentatives
+    publish.SYMFONY_BULK_URL = None
+    _Stub.error_rate = error_rate
+    results = _timed(f"{error_rate:.0%} de 503", publish.publish_bulk, episodes[:100])
+    attempts = sum(r["attempts"] for r in results)
+    print(f"  statuts : {sorted({r['status'] for r in results})}, {attempts} tentatives pour {len(results)} épisodes")
+
+    # Panne totale : le disjoncteur s'ouvre et les appels suivants échouent sans attendre
+    _Stub.error_rate, _Stub.down = 0.0, True
+    publish.breaker = publish.CircuitBreaker(threshold=5, reset_seconds=60)
+    start = time.perf_counter()
+    results = publish.publish_bulk(episodes[:50])
+    print(f"  serveur en panne : {dict((s, sum(r['status'] == s for r in results)) for s in ('FAILED', 'CIRCUIT_OPEN'))} "
+          f"en {time.perf_counter() - start:.2f} s")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:4]
+    main(*(t(a) for t, a in zip((int, float, float), args)))
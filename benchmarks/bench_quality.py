@@ -0,0 +1,83 @@
+"""
+Benchmark : analyse qualité pydub (boucle par trame) vs analyseur NumPy vectorisé.
+
+    python -m benchmarks.bench_quality [durée_minutes]
+
+Le signal est synthétique (parole simulée + bruit), aucun fichier ni ffmpeg requis.
+"""
+import sys
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+from services import quality
+
+
+def _synthetic(minutes: float, sample_rate: int = 44100) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    n = int(minutes * 60 * sample_rate)
+    t = np.arange(n) / sample_rate
+    envelope = (np.sin(2 * np.pi * 0.3 * t) > 0).astype(np.float32)
+    voice = 0.2 * np.sin(2 * np.pi * 220 * t) * envelope
+    noise = 0.003 * rng.standard_normal(n)
+    mono = (voice + noise).astype(np.float32)
+    return np.stack([mono, mono], axis=1)
+
+
+def _legacy(audio: AudioSegment, frame_ms: int = 200):
+    """Ancienne implémentation (services/audio._estimate_noise_floor + dBFS)."""
+    levels = []
+    for i in range(0, len(audio), frame_ms):
+        levels.append(audio[i:i + frame_ms].dBFS)
+    levels.sort()
+    quiet = levels[:max(1, int(len(levels) * 0.2))]
+    return audio.dBFS, audio.max_dBFS, sum(quiet) / len(quiet)
+
+
+def _check_true_peak() -> None:
+    """Régression : un sinus pleine échelle ne dépasse pas ~0 dBTP (pas de ringing des bords)."""
+    for sample_rate in (44100, 48000):
+        t = np.arange(10 * sample_rate) / sample_rate
+        mono = np.sin(2 * np.pi * 1000 * t + 0.3).astype(np.float32)
+        stereo = np.stack([mono, mono], axis=1)
+        true_peak = quality.true_peak_dbtp(stereo, sample_rate)
+        assert true_peak <= 0.1, f"true peak {true_peak:+.2f} dBTP à {sample_rate} Hz"
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(minutes: float = 15.0) -> None:
+    sample_rate = 44100
+    samples = _synthetic(minutes, sample_rate)
+    pcm = (samples * 32767).astype("<i2")
+    segment = AudioSegment(data=pcm.tobytes(), sample_width=2,
+                           frame_rate=sample_rate, channels=2)
+
+    legacy, t_legacy = _timed(_legacy, segment)
+
+    def vectorized():
+        levels = quality.measure(samples, sample_rate, with_broadcast=False)
+        return levels["loudness_dbfs"], levels["peak_dbfs"], levels["noise_floor_dbfs"]
+
+    fast, t_fast = _timed(vectorized)
+    # Import de scipy.signal (~0.5 s, une fois par process) hors mesure
+    import scipy.signal  # noqa: F401
+    full, t_full = _timed(quality.measure, samples, sample_rate)
+
+    print(f"Signal : {minutes:.0f} min, {sample_rate} Hz stéréo")
+    print(f"pydub (boucle)       : {t_legacy:7.3f} s  loudness={legacy[0]:.2f} peak={legacy[1]:.2f} noise={legacy[2]:.2f}")
+    print(f"NumPy (mêmes mesures): {t_fast:7.3f} s  loudness={fast[0]:.2f} peak={fast[1]:.2f} noise={fast[2]:.2f}")
+    print(f"NumPy (+ LUFS, dBTP) : {t_full:7.3f} s  lufs={full['loudness_lufs']:.2f} true_peak={full['true_peak_dbtp']:.2f}")
+    print(f"Accélération         : x{t_legacy / t_fast:.1f}")
+
+    _check_true_peak()
+    print("True peak (sinus 0 dBFS) : ≤ +0.1 dBTP")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 15.0)
@@ -0,0 +1,60 @@
+"""
+Benchmark de la recherche plein texte (SQLite FTS5) sur un catalogue synthétique.
+
+    python -m benchmarks.bench_search [nb_épisodes] [segments_par_épisode]
+
+Indexe des épisodes synthétiques dans une base temporaire (vocabulaire de
+Zipf + expressions des lexiques) puis mesure le temps de requêtes fréquentes
+et rares.
+"""
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from services import nlp, search
+
+QUERIES = ["charge mentale", "burn-out", "\"santé mentale\"", "télétravail isolement", "sophro*", "mot12"]
+
+
+def _segments(rng: random.Random, count: int, words: int = 12):
+    expressions = nlp.CURATED_KEYWORDS
+    segments = []
+    for i in range(count):
+        text = [f"mot{min(int(rng.paretovariate(1.1)), 20000)}" for _ in range(words)]
+        if rng.random() < 0.05:
+            text[rng.randrange(words)] = rng.choice(expressions)
+        segments.append({"start": i * 4.0, "end": i * 4.0 + 4.0, "text": " ".join(text), "source": "episode"})
+    return segments
+
+
+def main(episodes: int = 10000, segments: int = 100) -> None:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        search.SEARCH_DB_PATH = Path(tmp) / "search.sqlite"
+
+        start = time.perf_counter()
+        for i in range(episodes):
+            segs = _segments(rng, segments)
+            episode = {"title": f"Épisode {i}", "transcript": " ".join(s["text"] for s in segs)}
+            search.index_episode(f"ep{i}", episode, segs, content_hash=f"h{i}")
+        t_index = time.perf_counter() - start
+        print(f"{episodes} épisodes × {segments} segments indexés en {t_index:.1f} s "
+              f"({t_index * 1000 / episodes:.1f} ms / épisode), "
+              f"base {search.SEARCH_DB_PATH.stat().st_size / 1e6:.0f} Mo")
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                result = search.search(query)
+                timings.append(time.perf_counter() - start)
+            hits = sum(len(r["hits"]) for r in result["results"])
+            print(f"{query:24s} {statistics.median(timings) * 1000:7.1f} ms  "
+                  f"{len(result['results']):3d} épisodes, {hits:4d} extraits")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
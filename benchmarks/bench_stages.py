@@ -0,0 +1,106 @@
+"""
+Benchmark du cache des étapes du pipeline : catalogue retraité après une
+modification des lexiques.
+
+    python -m benchmarks.bench_stages [nb_épisodes]
+
+Les étapes audio et Whisper sont remplacées par des fonctions synthétiques
+(pas de ffmpeg ni de modèle) ; NLP, classifieur
+par lexique, dépôt d'épisodes, index de recherche et outbox sont les vrais,
+dans des bases temporaires. Passes mesurées :
+1. premier traitement (toutes les étapes tournent) ;
+2. relance à l'identique (tout vient du cache) ;
+3. relance après ajout d'un mot-clé à CURATED_KEYWORDS (seule l'étape NLP tourne).
+"""
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from services import (artifacts, audio, classifier, corpus_index, episodes, nlp, outbox, pipeline, search,
+                      stage_cache, stt)
+
+calls: Counter = Counter()
+
+
+def _vocabulary():
+    texts = [s for group in classifier.CATEGORY_PROTOTYPES.values() for s in group]
+    texts += nlp.CURATED_KEYWORDS + [e for group in nlp.THEME_LEXICON.values() for e in group]
+    return sorted({w.strip(".,").lower() for text in texts for w in text.split()})
+
+
+def _install_stubs(tmp: Path, transcripts: dict) -> None:
+    final = tmp / "final.mp3"
+    final.write_bytes(b"")
+
+    def analyze(raw_path, decoded=None, levels=None):
+        return {"duration_seconds": 1800, "quality_score": 90, "quality_status": "OK", "quality_details": {}}
+
+    def mix(raw_path):
+        return str(final)
+
+    def transcribe(ctx, plan, on_segment=None):
+        text = transcripts[ctx.raw_path]
+        return {"text": text, "segments": [{"start": 0.0, "end": 4.0, "text": text[:80], "source": "episode"}],
+                "skipped_seconds": 0.0}
+
+    audio.analyze_episode_audio = analyze
+    audio.mix_final_audio = mix
+    audio.INTRO_PATH = tmp / "absent.mp3"
+    # Pas de décodage ffmpeg : les fonctions synthétiques n'en ont pas besoin
+    pipeline.PipelineContext.decoded = property(lambda self: None)
+    pipeline.PipelineContext.levels = property(lambda self: None)
+    pipeline._skip_plan = lambda ctx: {"key": "", "spans": [(0.0, 0.0, 1800.0)], "skipped_seconds": 0.0}
+    pipeline._transcribe = transcribe
+    stt.fingerprint = lambda: {"model": "synthétique"}
+
+
+def _pass(label: str, raws: list) -> None:
+    calls.clear()
+    start = time.perf_counter()
+    for i, raw in enumerate(raws):
+        result = pipeline.process_upload(str(raw), "contributeur@example.org", episode_id=f"{i:032x}")
+        calls.update(name for name, stage in result["stages"].items() if not stage["cached"])
+    elapsed = time.perf_counter() - start
+    print(f"{label:34s} {elapsed:6.2f} s ({elapsed * 1000 / len(raws):5.1f} ms / épisode) ; "
+          f"étapes recalculées : {dict(calls) or 'aucune'}")
+
+
+def main(count: int = 500) -> None:
+    rng = random.Random(0)
+    vocabulary = _vocabulary()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        stage_cache.STAGE_CACHE_PATH = tmp / "stages.sqlite"
+        episodes.EPISODES_DB_PATH = tmp / "episodes.sqlite"
+        search.SEARCH_DB_PATH = tmp / "search.sqlite"
+        outbox.OUTBOX_DB_PATH = tmp / "outbox.sqlite"
+        corpus_index.CORPUS_DB_PATH = tmp / "corpus.sqlite"
+        artifacts.TRANSCRIPT_MODE = "inline"
+        classifier.CATEGORY_CLASSIFIER = "lexicon"
+
+        transcripts = {}
+        raws = []
+        for i in range(count):
+            raw = tmp / f"episode{i}.mp3"
+            raw.write_bytes(f"audio {i}".encode())
+            transcripts[str(raw)] = " ".join(rng.choice(vocabulary) for _ in range(9000))
+            raws.append(raw)
+        _install_stubs(tmp, transcripts)
+
+        _pass("1. premier traitement", raws)
+        _pass("2. relance à l'identique", raws)
+        nlp.CURATED_KEYWORDS.append("mot-clé ajouté")
+        # Automate reconstruit au prochain appel (en production : redémarrage des workers)
+        nlp._matcher = None
+        nlp._keyword_patterns.clear()
+        nlp._theme_patterns.clear()
+        _pass("3. relance après CURATED_KEYWORDS", raws)
+        print(f"cache des étapes : {stage_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))
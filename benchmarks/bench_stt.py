@@ -0,0 +1,71 @@
+"""
+Benchmark STT : appel Whisper unique vs moteur par morceaux (VAD + process pool).
+
+    python -m benchmarks.bench_stt <fichier_audio> [transcription_de_référence.txt]
+
+Affiche le temps réel, le facteur temps réel (RTF) et le WER de chaque moteur.
+Sans référence, le WER du moteur par morceaux est calculé par rapport à
+l'appel unique. Le cache de transcriptions n'est pas utilisé.
+"""
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from services import stt
+
+
+def _words(text: str) -> List[str]:
+    return re.sub(r"[^\w'-]+", " ", text.lower()).split()
+
+
+def wer(reference: str, hypothesis: str) -> float:
+    """Word error rate (distance d'édition sur les mots / nb de mots de référence)."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _run(engine: str, samples) -> tuple:
+    stt.STT_ENGINE = engine
+    pool = stt.get_pool()
+    start = time.perf_counter()
+    result = stt._run_whisper(pool, samples)
+    return result["text"], time.perf_counter() - start
+
+
+def main(path: str, reference_path: Optional[str] = None) -> None:
+    import whisper
+
+    samples = whisper.load_audio(path)
+    duration = len(samples) / stt.WHISPER_SAMPLE_RATE
+
+    # Chargement du modèle hors chronométrage (et des workers pour "chunked")
+    stt.warmup()
+
+    single_text, t_single = _run("single", samples)
+    chunked_text, t_chunked = _run("chunked", samples)
+
+    reference = Path(reference_path).read_text(encoding="utf-8") if reference_path else single_text
+    label = "référence" if reference_path else "appel unique"
+
+    print(f"Fichier : {path} ({duration:.0f} s), modèle {stt.WHISPER_MODEL}, "
+          f"{stt.STT_CHUNK_WORKERS} workers")
+    print(f"single  : {t_single:7.1f} s  RTF={t_single / duration:.3f}  WER vs {label}={wer(reference, single_text):.3f}")
+    print(f"chunked : {t_chunked:7.1f} s  RTF={t_chunked / duration:.3f}  WER vs {label}={wer(reference, chunked_text):.3f}")
+    print(f"Accélération : x{t_single / t_chunked:.2f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    main(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,123 @@
+"""
+Benchmark des backends STT : openai-whisper (fp32 CPU) vs faster-whisper (int8).
+
+    python -m benchmarks.bench_stt_backends [backend:modèle ...]
+
+Par défaut : whisper:base, faster-whisper:base, whisper:small, faster-whisper:small.
+
+Fixtures (obligatoires) : enregistrements de parole en français dans
+benchmarks/fixtures/*.mp3|wav|m4a, avec la transcription de référence dans
+un .txt du même nom. Sans référence, le WER est calculé par rapport à la
+première configuration (accord entre moteurs, pas justesse).
+
+Les deux moteurs décodent avec les mêmes réglages (STT_BEAM_SIZE, voir
+services.stt_backends) ; les options effectives sont affichées.
+
+Chaque configuration tourne dans un sous-process : le pic de RSS mesuré
+(chargement du modèle compris) ne dépend pas des configurations précédentes.
+Affiche le facteur temps réel (RTF), le pic de RSS et le WER. Le cache de
+transcriptions n'est pas utilisé.
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.bench_stt import wer
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = BASE_DIR / "benchmarks" / "fixtures"
+FIXTURE_SUFFIXES = (".mp3", ".wav", ".m4a")
+
+DEFAULT_CONFIGS = ["whisper:base", "faster-whisper:base", "whisper:small", "faster-whisper:small"]
+
+
+def _fixtures() -> List[Path]:
+    return sorted(p for p in FIXTURES_DIR.glob("*") if p.suffix.lower() in FIXTURE_SUFFIXES)
+
+
+def _reference(path: Path) -> Optional[str]:
+    ref = path.with_suffix(".txt")
+    return ref.read_text(encoding="utf-8") if ref.exists() else None
+
+
+def _worker(paths: List[str]) -> None:
+    """Sous-process : une configuration (fixée par STT_BACKEND / WHISPER_MODEL)."""
+    from services import audio, stt
+
+    # Modèle chargé hors chronométrage
+    pool = stt.get_pool()
+    pool.preload()
+
+    results = []
+    for path in paths:
+        samples = audio.decode(Path(path), stt.WHISPER_SAMPLE_RATE, 1).samples[:, 0]
+        start = time.perf_counter()
+        text = pool.transcribe(samples)["text"]
+        elapsed = time.perf_counter() - start
+        results.append({"path": path, "duration": len(samples) / stt.WHISPER_SAMPLE_RATE,
+                        "elapsed": elapsed, "text": text})
+
+    # ru_maxrss est en kilo-octets sous Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"peak_rss_mb": peak_mb, "options": pool.backend.options(pool.device),
+                      "results": results}))
+
+
+def _run_config(config: str, paths: List[Path]) -> Dict:
+    backend, model = config.split(":", 1)
+    env = dict(os.environ, STT_BACKEND=backend, WHISPER_MODEL=model, WHISPER_DEVICE="cpu", WHISPER_POOL_SIZE="1")
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_stt_backends", "--worker", *map(str, paths)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(configs: List[str]) -> None:
+    paths = _fixtures()
+    if not paths:
+        # Le générique (musique) ne mesure pas la reconnaissance de la parole
+        print(f"Aucune fixture dans {FIXTURES_DIR} : ajouter des enregistrements de parole "
+              f"({', '.join(FIXTURE_SUFFIXES)}) et leur transcription de référence (.txt)")
+        return
+
+    runs = {}
+    for config in configs:
+        try:
+            runs[config] = _run_config(config, paths)
+        except subprocess.CalledProcessError as e:
+            print(f"{config:24s} : échec ({e.stderr.strip().splitlines()[-1] if e.stderr else e})")
+
+    if not runs:
+        return
+
+    baseline = next(iter(runs.values()))["results"]
+    with_reference = sum(_reference(path) is not None for path in paths)
+    print(f"{len(paths)} fixture(s), {sum(r['duration'] for r in baseline):.0f} s d'audio, "
+          f"{with_reference} avec référence (sinon WER par rapport à {next(iter(runs))})")
+    print(f"{'configuration':24s} {'RTF':>7s} {'RSS max':>9s} {'WER':>7s}  décodage")
+
+    for config, run in runs.items():
+        duration = sum(r["duration"] for r in run["results"])
+        elapsed = sum(r["elapsed"] for r in run["results"])
+
+        # WER moyen pondéré par la longueur de chaque fixture
+        errors = 0.0
+        for result, base in zip(run["results"], baseline):
+            reference = _reference(Path(result["path"])) or base["text"]
+            errors += wer(reference, result["text"]) * result["duration"]
+
+        print(f"{config:24s} {elapsed / duration:7.3f} {run['peak_rss_mb']:7.0f} Mo {errors / duration:7.3f}  "
+              f"{run['options']}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        _worker(sys.argv[2:])
+    else:
+        main(sys.argv[1:] or DEFAULT_CONFIGS)
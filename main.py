@@ -1,7 +1,15 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
-from services import audio, stt, nlp, publish, contributors
-from models.episode import Episode
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from services import artifacts, audio, episodes, jobs, outbox, search
+
+# Intervalle de lecture de l'état d'un job pour le direct (SSE / WebSocket)
+STREAM_POLL_SECONDS = 0.5
 
 app = FastAPI(
     title="Agent IA Inspiron",
@@ -9,67 +17,248 @@ app = FastAPI(
     version="0.1.0"
 )
 
+# Réponses JSON compressées (gzip) pour les clients qui l'acceptent ; le
+# flux SSE n'est pas compressé (exclu par le middleware)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+async def _save_upload(file: UploadFile) -> str:
+    """Sauvegarde en streaming ; 413 si le fichier dépasse la taille max."""
+    try:
+        return await audio.save_raw_file(file)
+    except audio.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@app.on_event("startup")
+def start_workers():
+    jobs.start()
+    outbox.start()
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    outbox.shutdown()
+    jobs.shutdown()
+
+
 @app.get("/")
 def health():
+    """Liveness : l'API répond (ne dépend ni de torch ni des workers)."""
     return {"status": "ok", "message": "Agent IA opérationnel"}
 
 
-@app.post("/upload")
+@app.get("/ready")
+def ready():
+    """Readiness : les workers ont démarré et un modèle Whisper est chargé."""
+    state = jobs.readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
+@app.post("/upload", status_code=202)
 async def upload_episode(
     file: UploadFile = File(...),
     contributor_email: str = Form(...)
 ):
+    """
+    Sauvegarde le fichier et met le traitement en file d'attente.
+    Le pipeline (audio, transcription, NLP) tourne dans un process worker :
+    suivre l'avancement via GET /jobs/{job_id}.
+    """
     # 1. Sauvegarde du fichier brut (mp3, mp4, etc.)
-    raw_path = await audio.save_raw_file(file)
-
-    # 2. Audio final + qualité (intro + épisode + analyse)
-    audio_info = audio.build_final_audio(raw_path)
-
-    # 3. Transcription (Whisper) – sur la version finale
-    transcript = stt.transcribe(audio_info["final_path"])
-
-    # 4. NLP : mots-clés, catégorie, pochette
-    keywords = nlp.extract_keywords(transcript)
-    category = nlp.guess_category(transcript)
-    cover_image = nlp.map_category_to_cover(category)
-
-    # 5. Construire un épisode (brouillon)
-    episode = Episode(
-        title="Titre provisoire",
-        audio_url=audio_info["final_path"],
-        duration=audio_info["duration_seconds"],
-        transcript=transcript,
-        keywords=keywords,
-        category=category,
-        cover_image=cover_image,
-        contributor_email=contributor_email,
-        quality_status=audio_info["quality_status"],
-        quality_score=audio_info["quality_score"],
-        status="draft",
-    )
+    raw_path = await _save_upload(file)
 
-    return JSONResponse({
-        "steps": {
-            "audio": "OK",
-            "transcription": "OK",
-            "nlp": "OK",
-            "publication": "NOT_SENT"
-        },
-        "episode_preview": episode.dict()
+    # 2. Mise en file d'attente du pipeline
+    job = jobs.submit(raw_path, contributor_email)
+
+    return JSONResponse(status_code=202, content={
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['id']}",
     })
 
 
+@app.get("/jobs")
+def list_jobs(limit: int = 50):
+    return {"jobs": jobs.list_jobs(limit=limit)}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return job
+
+
+async def _job_events(job_id: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Événements d'un job pour le direct : "segment" (transcription partielle,
+    temps du fichier publié), "progress" (étape) puis "done" ou "failed".
+    Les segments déjà produits sont renvoyés d'abord : un client qui se
+    connecte en cours de route reçoit toute la transcription.
+    """
+    sent = 0
+    last_stage = None
+    while True:
+        job = jobs.get_job(job_id)
+        if job is None:
+            return
+
+        for segment in jobs.read_segments(job_id, start=sent):
+            sent += 1
+            yield "segment", segment
+
+        if job.get("stage") != last_stage:
+            last_stage = job.get("stage")
+            yield "progress", {"status": job["status"], "stage": last_stage, "progress": job.get("progress")}
+
+        if job["status"] in ("done", "failed"):
+            # Derniers segments écrits juste avant la fin du job
+            for segment in jobs.read_segments(job_id, start=sent):
+                sent += 1
+                yield "segment", segment
+            yield job["status"], {"segments": sent, "error": job.get("error")}
+            return
+
+        await asyncio.sleep(STREAM_POLL_SECONDS)
+
+
+@app.get("/jobs/{job_id}/transcript/stream")
+async def stream_transcript(job_id: str):
+    """Transcription partielle en direct (Server-Sent Events)."""
+    if jobs.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+
+    async def events() -> AsyncIterator[str]:
+        async for event, data in _job_events(job_id):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/jobs/{job_id}/transcript/ws")
+async def transcript_websocket(websocket: WebSocket, job_id: str):
+    """Même flux que /transcript/stream, sur WebSocket : {"event", "data"}."""
+    await websocket.accept()
+    if jobs.get_job(job_id) is None:
+        await websocket.close(code=4404, reason="Job introuvable")
+        return
+
+    try:
+        async for event, data in _job_events(job_id):
+            await websocket.send_json({"event": event, "data": data})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/episodes")
+def list_episodes(
+    limit: int = episodes.EPISODES_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    contributor_email: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+):
+    """
+    Catalogue des épisodes traités, du plus récent au plus ancien. Pagination
+    par curseur : passer `next_cursor` de la réponse pour la page suivante.
+    """
+    try:
+        return episodes.list_episodes(limit=limit, cursor=cursor, contributor_email=contributor_email,
+                                      category=category, status=status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/episodes/{episode_id}")
+def get_episode(episode_id: str):
+    """Épisode complet : qualité, classification, transcription (ou sa référence d'artefact)."""
+    episode = episodes.get(episode_id, with_transcript=artifacts.inline_transcript())
+    if episode is None:
+        raise HTTPException(status_code=404, detail="Épisode introuvable")
+    return episode
+
+
+@app.post("/episodes/{episode_id}/reprocess", status_code=202)
+def reprocess_episode(episode_id: str):
+    """
+    Relance le pipeline d'un épisode : seules les étapes dont les entrées,
+    la configuration ou la version ont changé sont recalculées.
+    """
+    job = jobs.resubmit(episode_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Épisode introuvable")
+    return JSONResponse(status_code=202, content={"job_id": job["id"], "status": job["status"]})
+
+
+@app.post("/episodes/reprocess", status_code=202)
+def reprocess_catalog(category: Optional[str] = None, status: Optional[str] = None):
+    """
+    Relance tout le catalogue (ou une catégorie / un statut), par exemple
+    après une modification des lexiques : l'audio et la transcription sont
+    repris du cache des étapes, seule l'étape NLP est recalculée.
+    """
+    submitted = [
+        job["id"] for job in map(jobs.resubmit, episodes.iter_ids(category=category, status=status))
+        if job is not None
+    ]
+    return JSONResponse(status_code=202, content={"submitted": len(submitted)})
+
+
+@app.get("/outbox")
+def outbox_stats():
+    """File de publication vers Symfony : backlog, statuts, plus vieil envoi en attente."""
+    return outbox.stats()
+
+
+@app.get("/artifacts/{digest}")
+def get_artifact(digest: str, request: Request):
+    """
+    Artefact de transcription (payload Symfony : transcriptRef.url), servi
+    tel quel avec son Content-Encoding. Contenu immuable : nom = hash.
+    """
+    found = artifacts.find(digest)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Artefact introuvable")
+
+    path, encoding = found
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if encoding in request.headers.get("accept-encoding", ""):
+        return Response(path.read_bytes(), media_type="application/json",
+                        headers={**headers, "Content-Encoding": encoding})
+    # Client sans zstd (ou sans gzip) : JSON décompressé, recompressé en gzip par le middleware
+    return Response(artifacts.read_bytes(digest), media_type="application/json", headers=headers)
+
+
+@app.get("/search")
+def search_transcripts(q: str, limit: int = 20):
+    """
+    Recherche plein texte dans les transcriptions des épisodes traités :
+    épisodes classés par pertinence, avec les segments horodatés qui
+    contiennent la requête. `"expression exacte"` et `préfixe*` acceptés.
+    """
+    return search.search(q, limit=min(max(limit, 1), 100))
+
+
 @app.post("/check-audio-quality")
-async def check_audio_quality(file: UploadFile = File(...)):
+async def check_audio_quality(file: UploadFile = File(...), full: bool = False):
     """
     Vérifie uniquement la qualité audio du fichier brut (sans générique),
     selon les critères éditoriaux.
+
+    Par défaut : pré-contrôle rapide sur des extraits répartis dans le fichier.
+    `?full=true` : analyse exacte de tout le fichier.
     """
     # 1. Sauvegarde du fichier brut
-    raw_path = await audio.save_raw_file(file)
+    raw_path = await _save_upload(file)
 
-    # 2. Analyse sur le fichier brut
-    quality_info = audio.analyze_raw_audio(raw_path)
+    # 2. Analyse sur le fichier brut (hors de la boucle d'événements)
+    quality_info = await run_in_threadpool(audio.analyze_raw_audio, raw_path, full)
 
     return JSONResponse({
         "step": "audio_quality_raw_only",
@@ -78,4 +267,5 @@ async def check_audio_quality(file: UploadFile = File(...)):
         "quality_status": quality_info["quality_status"],
         "quality_score": quality_info["quality_score"],
         "quality_details": quality_info["quality_details"],
+        "analysis_mode": quality_info["quality_details"]["analysis_mode"],
     })
@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+ARTIFACT_DIR = Path(os.getenv("ARTIFACT_DIR", str(BASE_DIR / "uploads" / "artifacts")))
+
+# Transcription dans le payload Symfony et la réponse des jobs :
+# - "inline" : texte complet dans le JSON (comportement historique)
+# - "artifact" : fichier compressé à part, référencé par son hash
+TRANSCRIPT_MODE = os.getenv("TRANSCRIPT_MODE", "inline")
+
+# Compression des artefacts : "zstd" (si zstandard est installé) ou "gzip"
+ARTIFACT_CODEC = os.getenv("ARTIFACT_CODEC", "zstd")
+ZSTD_LEVEL = 19
+GZIP_LEVEL = 9
+
+# URL publique de l'API (Symfony télécharge les artefacts) ; vide = chemin relatif
+ARTIFACT_BASE_URL = os.getenv("ARTIFACT_BASE_URL", "").rstrip("/")
+
+# Extension de fichier → Content-Encoding HTTP
+ENCODINGS = {".zst": "zstd", ".gz": "gzip"}
+
+# Temps stockés en centisecondes (précision de Whisper)
+TIME_SCALE = 100
+
+
+def _zstd() -> Any:
+    """Module zstandard, ou None s'il n'est pas installé (repli sur gzip)."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def inline_transcript() -> bool:
+    return TRANSCRIPT_MODE != "artifact"
+
+
+# ------------------------------------------------------------
+# 1) Segments en colonnes
+# ------------------------------------------------------------
+
+def columnar_segments(transcript: str, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Segments → tableaux parallèles d'entiers, en deltas (petits nombres
+    répétitifs : ils se compressent 3× mieux que des temps absolus) :
+    - start : début en centisecondes, écart avec le début du segment précédent
+    - duration : durée en centisecondes
+    - text_gap / text_length : position du texte dans le bloc `text`, écart
+      avec la fin du segment précédent, et longueur
+    - source : "intro" / "episode"
+    Le texte n'est pas recopié : chaque segment pointe vers sa place dans la
+    transcription. Les segments absents de la transcription (générique) sont
+    ajoutés après, dans le même bloc `text`.
+    """
+    columns: Dict[str, List[Any]] = {"start": [], "duration": [], "text_gap": [], "text_length": [], "source": []}
+    cursor = 0
+    extra: List[str] = []
+    extra_length = len(transcript)
+    previous_start = 0
+    previous_end = 0
+
+    for seg in segments:
+        seg_text = seg["text"].strip()
+        pos = transcript.find(seg_text, cursor) if seg_text else cursor
+        if pos < 0:
+            pos = extra_length
+            extra.append(seg_text)
+            extra_length += len(seg_text)
+        else:
+            cursor = pos + len(seg_text)
+
+        start = round(float(seg["start"]) * TIME_SCALE)
+        columns["start"].append(start - previous_start)
+        columns["duration"].append(round(float(seg["end"]) * TIME_SCALE) - start)
+        columns["text_gap"].append(pos - previous_end)
+        columns["text_length"].append(len(seg_text))
+        columns["source"].append(seg.get("source", "episode"))
+        previous_start = start
+        previous_end = pos + len(seg_text)
+
+    return {
+        "version": 1,
+        "text": transcript + "".join(extra),
+        "transcript_length": len(transcript),
+        "segments": columns,
+    }
+
+
+def expand_segments(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse de columnar_segments : {"transcript", "segments": [{start, end, text, source}]}."""
+    text = document["text"]
+    columns = document["segments"]
+    segments = []
+    start = 0
+    end_pos = 0
+    for delta, duration, gap, length, source in zip(columns["start"], columns["duration"], columns["text_gap"],
+                                                   columns["text_length"], columns["source"]):
+        start += delta
+        pos = end_pos + gap
+        end_pos = pos + length
+        segments.append({
+            "start": start / TIME_SCALE,
+            "end": (start + duration) / TIME_SCALE,
+            "text": text[pos:end_pos],
+            "source": source,
+        })
+    return {"transcript": text[:document["transcript_length"]], "segments": segments}
+
+
+# ------------------------------------------------------------
+# 2) Stockage par hash (écriture unique, atomique)
+# ------------------------------------------------------------
+
+def _compress(data: bytes) -> Tuple[bytes, str]:
+    zstd = _zstd() if ARTIFACT_CODEC == "zstd" else None
+    if zstd is not None:
+        return zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(data), ".zst"
+    # mtime=0 : même contenu → mêmes octets
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0), ".gz"
+
+
+def find(digest: str) -> Optional[Tuple[Path, str]]:
+    """(chemin, Content-Encoding) de l'artefact, ou None s'il n'existe pas."""
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        return None
+    for ext, encoding in ENCODINGS.items():
+        path = ARTIFACT_DIR / f"{digest}.json{ext}"
+        if path.exists():
+            return path, encoding
+    return None
+
+
+def put_transcript(transcript: str, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Écrit la transcription (texte + segments en colonnes) dans un artefact
+    compressé nommé par le SHA-256 de son contenu JSON, et retourne sa
+    référence pour le payload : {"hash", "url", "encoding", "size", "compressedSize"}.
+    """
+    data = json.dumps(columnar_segments(transcript, segments), ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+
+    existing = find(digest)
+    if existing is None:
+        compressed, ext = _compress(data)
+        ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+        path = ARTIFACT_DIR / f"{digest}.json{ext}"
+        tmp = path.with_suffix(f"{ext}.{os.getpid()}.tmp")
+        tmp.write_bytes(compressed)
+        os.replace(tmp, path)
+        encoding = ENCODINGS[ext]
+    else:
+        path, encoding = existing
+
+    return {
+        "hash": digest,
+        "url": f"{ARTIFACT_BASE_URL}/artifacts/{digest}",
+        "encoding": encoding,
+        "size": len(data),
+        "compressedSize": path.stat().st_size,
+    }
+
+
+def read_bytes(digest: str) -> Optional[bytes]:
+    """JSON décompressé de l'artefact (None s'il n'existe pas)."""
+    found = find(digest)
+    if found is None:
+        return None
+    path, encoding = found
+    raw = path.read_bytes()
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    zstd = _zstd()
+    if zstd is None:
+        raise RuntimeError("Artefact zstd : installer le paquet zstandard pour le lire")
+    return zstd.ZstdDecompressor().decompress(raw)
+
+
+def load_transcript(digest: str) -> Optional[Dict[str, Any]]:
+    data = read_bytes(digest)
+    return None if data is None else expand_segments(json.loads(data))
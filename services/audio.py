@@ -1,10 +1,17 @@
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, BinaryIO, Iterator, List, Optional
 
 from fastapi import UploadFile
-import shutil
+from math import gcd
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
 
-from pydub import AudioSegment
+import numpy as np
+
+from services import quality
 
 # Dossiers
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -15,40 +22,292 @@ RESOURCES_DIR = BASE_DIR / "resources"
 INTRO_PATH = RESOURCES_DIR / "intro.mp3"
 OUTRO_PATH = RESOURCES_DIR / "outro.mp3"
 
+# Upload : taille des morceaux lus/écrits et taille maximale acceptée
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(4 * 1024 ** 3)))
+
+# Mesures qualité du pipeline des jobs : "basic" (RMS, crête, bruit de fond,
+# seules notées) ou "broadcast" (+ LUFS et true peak : un filtrage K de tout
+# le fichier, ~9× plus lent). /check-audio-quality mesure toujours les deux.
+QUALITY_METRICS = os.getenv("QUALITY_METRICS", "basic")
+
 
 # ------------------------------------------------------------
-# 1) Sauvegarde du fichier brut
+# 1) Sauvegarde du fichier brut (écriture en streaming)
 # ------------------------------------------------------------
 
+class UploadTooLarge(Exception):
+    """Le fichier envoyé dépasse UPLOAD_MAX_BYTES."""
+
+
+def _safe_suffix(filename: Optional[str]) -> str:
+    """Extension du fichier client, uniquement si elle est « propre »."""
+    suffix = Path(filename or "").suffix.lower()
+    if 1 < len(suffix) <= 8 and suffix[1:].isalnum():
+        return suffix
+    return ""
+
+
+class _StreamingWriter:
+    """
+    Écrit un upload par morceaux dans un fichier temporaire, calcule le
+    SHA-256 au fil de l'eau et renomme atomiquement le fichier à la fin.
+
+    Le nom final est le hash du contenu : deux uploads portant le même nom
+    ne s'écrasent plus, et un même contenu n'est stocké qu'une fois.
+    """
+
+    def __init__(self, suffix: str, max_bytes: int = UPLOAD_MAX_BYTES):
+        UPLOAD_RAW_DIR.mkdir(parents=True, exist_ok=True)
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=UPLOAD_RAW_DIR, suffix=".part")
+        self._tmp_path = Path(tmp)
+        self._file = os.fdopen(fd, "wb", buffering=UPLOAD_CHUNK_SIZE)
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(
+                f"Fichier trop volumineux (max {self.max_bytes // (1024 * 1024)} Mo)."
+            )
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self) -> Path:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        final_path = UPLOAD_RAW_DIR / f"{self._hash.hexdigest()}{self.suffix}"
+        os.replace(self._tmp_path, final_path)
+        return final_path
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+def save_stream(stream: BinaryIO, filename: Optional[str]) -> Path:
+    """
+    Version synchrone (Streamlit) : lit `stream` par morceaux de
+    UPLOAD_CHUNK_SIZE, sans jamais charger tout le fichier en mémoire.
+    """
+    writer = _StreamingWriter(_safe_suffix(filename))
+    try:
+        while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
 async def save_raw_file(file: UploadFile) -> str:
-    UPLOAD_RAW_DIR.mkdir(parents=True, exist_ok=True)
-    raw_path = UPLOAD_RAW_DIR / file.filename
+    """
+    Sauvegarde l'upload dans uploads/raw/<sha256><extension>.
+    Lève UploadTooLarge si le fichier dépasse UPLOAD_MAX_BYTES.
+    """
+    writer = _StreamingWriter(_safe_suffix(file.filename))
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return str(writer.commit())
+
+
+def content_hash(path: Path) -> str:
+    """
+    SHA-256 du contenu d'un fichier. Pour les uploads de uploads/raw, le nom
+    du fichier est déjà ce hash (voir _StreamingWriter) : pas de relecture.
+    """
+    path = Path(path)
+    stem = path.stem
+    if path.parent == UPLOAD_RAW_DIR and len(stem) == 64 and all(c in "0123456789abcdef" for c in stem):
+        return stem
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ------------------------------------------------------------
+# 1 bis) Décodage unique en PCM float32 (partagé par tout le pipeline)
+# ------------------------------------------------------------
+
+WHISPER_SAMPLE_RATE = 16000
+
+# Analyse en streaming : taille des blocs lus depuis ffmpeg
+STREAM_BLOCK_SECONDS = 10.0
+
+# Pré-contrôle rapide : fenêtres échantillonnées réparties sur le fichier
+SAMPLE_WINDOWS = 30
+SAMPLE_WINDOW_SECONDS = 2.0
+
 
-    with open(raw_path, "wb") as f:
-        f.write(await file.read())
+def probe(path: Path) -> Dict[str, Any]:
+    """Métadonnées du premier flux audio via ffprobe (sans décoder)."""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries",
+        "stream=codec_name,sample_rate,channels,bits_per_sample,bits_per_raw_sample,bit_rate"
+        ":format=duration,bit_rate,format_name",
+        "-of", "json", str(path),
+    ]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    info = json.loads(out)
 
-    return str(raw_path)
+    streams = info.get("streams") or []
+    if not streams:
+        raise ValueError(f"Aucun flux audio dans {path}")
+
+    stream = streams[0]
+    fmt = info.get("format", {})
+    bits = int(stream.get("bits_per_sample") or 0) or int(stream.get("bits_per_raw_sample") or 0)
+
+    return {
+        "codec": stream.get("codec_name"),
+        "sample_rate": int(stream.get("sample_rate") or 0),
+        "channels": int(stream.get("channels") or 0),
+        "bit_depth": bits or 16,
+        "bit_rate": int(stream.get("bit_rate") or fmt.get("bit_rate") or 0),
+        "duration": float(fmt.get("duration") or 0.0),
+        "format_name": fmt.get("format_name"),
+    }
+
+
+class DecodedAudio:
+    """
+    Audio décodé une seule fois par ffmpeg en float32 (frames × canaux).
+
+    Expose les mêmes attributs qu'un AudioSegment pour les infos techniques
+    (channels, frame_rate, sample_width).
+    """
+
+    def __init__(self, samples: np.ndarray, frame_rate: int, sample_width: int = 2):
+        self.samples = samples
+        self.frame_rate = frame_rate
+        self.channels = samples.shape[1]
+        self.sample_width = sample_width
+        self._mono_16k: Optional[np.ndarray] = None
+
+    @property
+    def duration_seconds(self) -> float:
+        return len(self.samples) / self.frame_rate
+
+    def to_mono_16k(self) -> np.ndarray:
+        """Entrée attendue par Whisper : mono, 16 kHz, float32 (calculée une fois)."""
+        if self._mono_16k is None:
+            from scipy.signal import resample_poly
+
+            mono = self.samples.mean(axis=1)
+            if self.frame_rate != WHISPER_SAMPLE_RATE:
+                g = gcd(WHISPER_SAMPLE_RATE, self.frame_rate)
+                mono = resample_poly(mono, WHISPER_SAMPLE_RATE // g, self.frame_rate // g)
+            self._mono_16k = mono.astype(np.float32)
+        return self._mono_16k
+
+
+def decode(path: Path, sample_rate: Optional[int] = None,
+           channels: Optional[int] = None) -> DecodedAudio:
+    """
+    Décode `path` une seule fois en PCM float32.
+    Par défaut on garde la fréquence et le nombre de canaux d'origine.
+    """
+    info = probe(path)
+    sample_rate = sample_rate or info["sample_rate"]
+    channels = channels or info["channels"]
+
+    cmd = [
+        "ffmpeg", "-v", "error", "-nostdin", "-i", str(path),
+        "-vn", "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ar", str(sample_rate), "-ac", str(channels), "pipe:1",
+    ]
+    raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+    samples = np.frombuffer(raw, dtype="<f4").reshape(-1, channels)
+
+    return DecodedAudio(samples, sample_rate, sample_width=max(1, info["bit_depth"] // 8))
+
+
+def stream_blocks(path: Path, sample_rate: int, channels: int,
+                  block_seconds: float = STREAM_BLOCK_SECONDS) -> Iterator[np.ndarray]:
+    """
+    Lit `path` via un pipe ffmpeg par blocs fixes de `block_seconds`.
+    Un seul buffer est réutilisé : chaque bloc doit être consommé avant le suivant.
+    """
+    cmd = [
+        "ffmpeg", "-v", "error", "-nostdin", "-i", str(path),
+        "-vn", "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ar", str(sample_rate), "-ac", str(channels), "pipe:1",
+    ]
+    frame_bytes = 4 * channels
+    buffer = bytearray(int(block_seconds * sample_rate) * frame_bytes)
+    view = memoryview(buffer)
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            filled = 0
+            while filled < len(buffer):
+                n = proc.stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            filled -= filled % frame_bytes
+            if filled:
+                yield np.frombuffer(buffer, dtype="<f4", count=filled // 4).reshape(-1, channels)
+            if filled < len(buffer):
+                break
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+
+
+def sample_windows(path: Path, info: Dict[str, Any], n_windows: int = SAMPLE_WINDOWS,
+                   window_seconds: float = SAMPLE_WINDOW_SECONDS) -> np.ndarray:
+    """
+    Décode seulement `n_windows` fenêtres de `window_seconds` réparties
+    uniformément sur le fichier, en un seul appel ffmpeg (seek par entrée,
+    puis filtre concat). Retourne le PCM float32 concaténé.
+    """
+    last_start = max(0.0, info["duration"] - window_seconds)
+    starts = np.linspace(0.0, last_start, n_windows)
+
+    cmd = ["ffmpeg", "-v", "error", "-nostdin"]
+    for start in starts:
+        cmd += ["-ss", f"{start:.3f}", "-t", f"{window_seconds:.3f}", "-i", str(path)]
+
+    graph = "".join(f"[{i}:a:0]" for i in range(n_windows)) + f"concat=n={n_windows}:v=0:a=1[out]"
+    cmd += [
+        "-filter_complex", graph, "-map", "[out]",
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-ar", str(info["sample_rate"]), "-ac", str(info["channels"]), "pipe:1",
+    ]
+    raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(raw, dtype="<f4").reshape(-1, info["channels"])
 
 
 # ------------------------------------------------------------
 # 2) Analyse ÉDITORIALE — uniquement sur l'audio principal
 # ------------------------------------------------------------
 
-def _estimate_noise_floor(audio: AudioSegment, frame_ms=200) -> float:
-    """Analyse du bruit de fond."""
-    if len(audio) < frame_ms:
-        return float(audio.dBFS)
-
-    samples = []
-    for i in range(0, len(audio), frame_ms):
-        samples.append(audio[i:i+frame_ms].dBFS)
+class _TechInfo:
+    """Infos ffprobe présentées comme un DecodedAudio (pour _compute_tech_info)."""
 
-    samples.sort()
-    quiet_frames = samples[:max(1, int(len(samples) * 0.2))]
+    def __init__(self, info: Dict[str, Any]):
+        self.channels = info["channels"]
+        self.frame_rate = info["sample_rate"]
+        self.sample_width = max(1, info["bit_depth"] // 8)
 
-    return sum(quiet_frames) / len(quiet_frames)
 
-def _compute_tech_info(audio: AudioSegment, path: Path) -> Dict[str, Any]:
+def _compute_tech_info(audio: Any, path: Path) -> Dict[str, Any]:
     """Infos techniques de base sur le fichier audio."""
     channels = audio.channels
     sample_rate = audio.frame_rate
@@ -64,16 +323,57 @@ def _compute_tech_info(audio: AudioSegment, path: Path) -> Dict[str, Any]:
         "bitrate_kbps_approx": bitrate_kbps,
     }
 
-def _analyze_audio_main(path: Path) -> Dict[str, Any]:
+def _analyze_audio_main(path: Path, decoded: Optional[DecodedAudio] = None,
+                        levels: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Analyse SEULEMENT du podcast brut, sans génériques."""
-    audio = AudioSegment.from_file(path)
-    duration = len(audio) / 1000
-    loudness = audio.dBFS
-    peak = audio.max_dBFS
-    noise = _estimate_noise_floor(audio)
+    decoded = decoded or decode(path)
+
+    # Mesures vectorisées sur le buffer partagé (un seul passage par métrique)
+    levels = levels or quality.measure(decoded.samples, decoded.frame_rate,
+                                       with_broadcast=QUALITY_METRICS == "broadcast")
 
     # 👉 Infos techniques pour Streamlit
-    tech = _compute_tech_info(audio, path)
+    tech = _compute_tech_info(decoded, path)
+
+    return _build_report(path, levels, tech)
+
+
+def _analyze_audio_streaming(path: Path, info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Même analyse que `_analyze_audio_main`, mais en lisant le fichier par
+    blocs depuis ffmpeg : mémoire constante quelle que soit la durée.
+    """
+    info = info or probe(path)
+    analyzer = quality.StreamingAnalyzer(info["sample_rate"], info["channels"])
+    for block in stream_blocks(path, info["sample_rate"], info["channels"]):
+        analyzer.update(block)
+
+    tech = _compute_tech_info(_TechInfo(info), path)
+    return _build_report(path, analyzer.result(), tech)
+
+
+def _analyze_audio_sampled(path: Path, info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pré-contrôle rapide : métadonnées ffprobe + mesures sur des fenêtres
+    échantillonnées (SAMPLE_WINDOWS × SAMPLE_WINDOW_SECONDS) au lieu de tout
+    décoder. La durée vient de ffprobe, les niveaux sont des estimations.
+    """
+    samples = sample_windows(path, info)
+    levels = quality.measure(samples, info["sample_rate"])
+    levels["duration"] = info["duration"]
+
+    tech = _compute_tech_info(_TechInfo(info), path)
+    report = _build_report(path, levels, tech)
+    report["sampled_seconds"] = round(len(samples) / info["sample_rate"], 1)
+    return report
+
+
+def _build_report(path: Path, levels: Dict[str, Any], tech: Dict[str, Any]) -> Dict[str, Any]:
+    """Critères éditoriaux, score et statut à partir des mesures."""
+    duration = levels["duration"]
+    loudness = levels["loudness_dbfs"]
+    peak = levels["peak_dbfs"]
+    noise = levels["noise_floor_dbfs"]
 
     score = 100
     checks: Dict[str, Any] = {}
@@ -126,6 +426,8 @@ def _analyze_audio_main(path: Path) -> Dict[str, Any]:
         "loudness_dbfs": loudness,
         "peak_dbfs": peak,
         "noise_floor_dbfs": noise,
+        "true_peak_dbtp": levels["true_peak_dbtp"],
+        "loudness_lufs": levels["loudness_lufs"],
         "quality_score": score,
         "quality_status": status,
         "checks": checks,
@@ -133,38 +435,162 @@ def _analyze_audio_main(path: Path) -> Dict[str, Any]:
         "path": str(path),
     }
 
+def analyze_raw_audio(raw_path: str, full: bool = False) -> Dict[str, Any]:
+    """
+    Contrôle qualité seul (endpoint /check-audio-quality).
+
+    Par défaut : pré-contrôle rapide (ffprobe + fenêtres échantillonnées).
+    `full=True` : analyse exacte de tout le fichier, en streaming.
+    Les fichiers assez courts pour être couverts par les fenêtres sont
+    toujours analysés en entier.
+    """
+    path = Path(raw_path)
+    info = probe(path)
+
+    if full or info["duration"] <= SAMPLE_WINDOWS * SAMPLE_WINDOW_SECONDS:
+        analysis = _analyze_audio_streaming(path, info)
+        analysis["analysis_mode"] = "full"
+    else:
+        analysis = _analyze_audio_sampled(path, info)
+        analysis["analysis_mode"] = "sampled"
+
+    analysis["tech"]["codec"] = info["codec"]
+    analysis["tech"]["bitrate_kbps"] = info["bit_rate"] // 1000
+
+    return {
+        "path": analysis["path"],
+        "duration_seconds": analysis["duration_seconds"],
+        "quality_score": analysis["quality_score"],
+        "quality_status": analysis["quality_status"],
+        "quality_details": analysis,
+    }
+
 # ------------------------------------------------------------
 # 3) Construction du fichier final avec génériques
 # ------------------------------------------------------------
 
-def _combine_audio(main_audio: Path) -> Path:
-    """intro + épisode + outro (optionnel)"""
+# Codecs que l'on sait recopier tel quel (stream copy) → conteneur audio du fichier final
+STREAM_COPY_FORMATS = {
+    "mp3": ".mp3",
+    "aac": ".m4a",
+    "alac": ".m4a",
+    "flac": ".flac",
+    "pcm_s16le": ".wav",
+    "pcm_s24le": ".wav",
+    "opus": ".ogg",
+    "vorbis": ".ogg",
+}
+
+# Encodeur ffmpeg à utiliser pour réencoder une intro au codec de l'épisode
+CODEC_ENCODERS = {
+    "mp3": "libmp3lame",
+    "aac": "aac",
+    "alac": "alac",
+    "flac": "flac",
+    "pcm_s16le": "pcm_s16le",
+    "pcm_s24le": "pcm_s24le",
+    "opus": "libopus",
+    "vorbis": "libvorbis",
+}
+
+# Cible quand le codec de l'épisode ne peut pas être recopié
+FALLBACK_CODEC = "mp3"
+
+
+def _run_ffmpeg(args: List[str]) -> None:
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-y", *args]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg a échoué : {result.stderr.decode(errors='replace')}")
+
+
+def same_format(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    return all(a[k] == b[k] for k in ("codec", "sample_rate", "channels"))
+
+
+def transcode(source: Path, target: Dict[str, Any], out_path: Path) -> None:
+    """Réencode `source` (audio seul) au codec / fréquence / canaux de `target`."""
+    args = [
+        "-i", str(source), "-vn", "-map", "0:a:0",
+        "-c:a", CODEC_ENCODERS[target["codec"]],
+        "-ar", str(target["sample_rate"]), "-ac", str(target["channels"]),
+    ]
+    if target.get("bit_rate") and not target["codec"].startswith(("pcm_", "flac", "alac")):
+        args += ["-b:a", str(target["bit_rate"])]
+    _run_ffmpeg(args + [str(out_path)])
+
+
+def _extract_audio(source: Path, out_path: Path) -> None:
+    """Isole le flux audio (ex. mp4 vidéo → m4a) sans réencoder."""
+    _run_ffmpeg(["-i", str(source), "-vn", "-map", "0:a:0", "-c:a", "copy", str(out_path)])
+
+
+def _concat_copy(parts: List[Path], out_path: Path, workdir: Path) -> None:
+    """Concatène des fichiers de même format via le concat demuxer, en stream copy."""
+    list_path = workdir / "concat.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for part in parts:
+            escaped = str(part.resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", str(list_path),
+                 "-map", "0:a", "-c", "copy", str(out_path)])
+
+
+def _combine_audio(main_audio: Path, episode_info: Optional[Dict[str, Any]] = None) -> Path:
+    """
+    intro + épisode + outro (optionnel), sans décoder l'épisode :
+    - même codec / fréquence / canaux : concat demuxer en stream copy ;
+    - sinon l'intro est prise dans le cache des génériques (services.jingles),
+      transcodée une seule fois par format d'épisode ;
+    - codec d'épisode non recopiable : un seul réencodage (FALLBACK_CODEC).
+    """
+
+    # Import local : services.jingles dépend lui-même de ce module
+    from services import jingles
 
     UPLOAD_FINAL_DIR.mkdir(parents=True, exist_ok=True)
 
-    suffix = main_audio.suffix or ".mp3"
-    final_path = UPLOAD_FINAL_DIR / f"final_{main_audio.stem}{suffix}"
+    episode_info = episode_info or probe(main_audio)
+    target = dict(episode_info)
+
+    with tempfile.TemporaryDirectory(dir=UPLOAD_FINAL_DIR) as tmp:
+        workdir = Path(tmp)
 
-    segments = []
+        # Épisode principal : audio seul, dans un conteneur adapté à son codec
+        if target["codec"] in STREAM_COPY_FORMATS:
+            suffix = STREAM_COPY_FORMATS[target["codec"]]
+            episode_part = main_audio
+            if main_audio.suffix.lower() != suffix:
+                episode_part = workdir / f"episode{suffix}"
+                _extract_audio(main_audio, episode_part)
+        else:
+            target["codec"] = FALLBACK_CODEC
+            suffix = STREAM_COPY_FORMATS[FALLBACK_CODEC]
+            episode_part = workdir / f"episode{suffix}"
+            transcode(main_audio, target, episode_part)
 
-    # Intro
-    if INTRO_PATH.exists():
-        segments.append(AudioSegment.from_file(INTRO_PATH))
+        final_path = UPLOAD_FINAL_DIR / f"final_{main_audio.stem}{suffix}"
 
-    # Épisode principal
-    main = AudioSegment.from_file(main_audio)
-    segments.append(main)
+        parts = []
 
-    # Outro désactivé pour le moment
-    #if OUTRO_PATH.exists():
-      #  segments.append(AudioSegment.from_file(OUTRO_PATH))
+        # Intro : déjà au format de l'épisode, ou version transcodée en cache
+        intro_part = jingles.get_jingle(INTRO_PATH, target, suffix)
+        if intro_part is not None:
+            parts.append(intro_part)
 
-    final = segments[0]
-    for seg in segments[1:]:
-        final += seg
+        parts.append(episode_part)
 
-    # Export
-    final.export(final_path, format=suffix.replace(".", ""))
+        # Outro désactivé pour le moment
+        #outro_part = jingles.get_jingle(OUTRO_PATH, target, suffix)
+        #if outro_part is not None:
+          #  parts.append(outro_part)
+
+        # Écriture dans workdir puis renommage atomique : un lecteur concurrent
+        # du même final_<sha> ne voit jamais un fichier partiel
+        mixed = workdir / f"final{suffix}"
+        _concat_copy(parts, mixed, workdir)
+        os.replace(mixed, final_path)
 
     return final_path
 
@@ -173,19 +599,33 @@ def _combine_audio(main_audio: Path) -> Path:
 # 4) Fonction principale
 # ------------------------------------------------------------
 
-def build_final_audio(raw_path: str) -> dict:
+def analyze_episode_audio(raw_path: str, decoded: Optional[DecodedAudio] = None,
+                          levels: Optional[Dict[str, Any]] = None) -> dict:
+    """Analyse qualité du podcast brut seul (sans générique)."""
     source = Path(raw_path)
-
-    # 1) Analyse uniquement du podcast brut
-    analysis = _analyze_audio_main(source)
-
-    # 2) Création du fichier final avec génériques
-    final_path = _combine_audio(source)
-
+    analysis = _analyze_audio_main(source, decoded or decode(source), levels)
     return {
-        "final_path": str(final_path),
         "duration_seconds": analysis["duration_seconds"],
         "quality_score": analysis["quality_score"],
         "quality_status": analysis["quality_status"],
         "quality_details": analysis,
     }
+
+
+def mix_final_audio(raw_path: str) -> str:
+    """Fichier final avec génériques (stream copy, sans décodage) ; retourne son chemin."""
+    return str(_combine_audio(Path(raw_path)))
+
+
+def build_final_audio(raw_path: str, decoded: Optional[DecodedAudio] = None,
+                      levels: Optional[Dict[str, Any]] = None) -> dict:
+    """
+    Analyse + fichier final. Si `decoded` / `levels` sont fournis (contexte du
+    pipeline), l'épisode n'est ni redécodé ni remesuré ; le fichier final est
+    assemblé sans décodage.
+    """
+    # 1) Analyse uniquement du podcast brut
+    analysis = analyze_episode_audio(raw_path, decoded, levels)
+
+    # 2) Création du fichier final avec génériques (stream copy)
+    return {"final_path": mix_final_audio(raw_path), **analysis}
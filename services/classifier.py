@@ -0,0 +1,262 @@
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Any, ContextManager, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services import nlp, sqlite_store
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", str(BASE_DIR / "uploads" / "cache" / "embeddings.sqlite")))
+
+# Classifieur : "embedding" (modèle local, CPU) ou "lexicon" (THEME_LEXICON seul)
+CATEGORY_CLASSIFIER = os.getenv("CATEGORY_CLASSIFIER", "embedding")
+# Petit modèle multilingue (français), ~120 Mo, rapide sur CPU
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+# Morceaux de transcription (le modèle tronque au-delà de ~128 tokens)
+CHUNK_WORDS = 100
+
+# En dessous de cette confiance, on garde la catégorie du lexique
+CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0.5"))
+# Température du softmax sur les similarités cosinus
+SOFTMAX_TEMPERATURE = 0.05
+
+# Prototypes : phrases représentatives de chaque catégorie éditoriale ;
+# l'embedding du prototype est la moyenne de leurs embeddings
+CATEGORY_PROTOTYPES: Dict[str, List[str]] = {
+    nlp.CATEGORY_REGULATION: [
+        "Gérer son stress, ses émotions et son anxiété au quotidien.",
+        "Prévenir le burn-out, l'épuisement et la charge mentale.",
+        "Respiration, méditation, sophrologie et pleine conscience pour retrouver son calme.",
+        "Prendre soin de sa santé mentale et de son bien-être au travail.",
+        "Poser ses limites, se reposer, sortir de la rumination.",
+    ],
+    nlp.CATEGORY_COMMUNICATION: [
+        "Communication bienveillante et écoute active dans l'équipe.",
+        "Gérer un conflit au travail et les tensions entre collègues.",
+        "Le rôle du manager, le feedback et la reconnaissance.",
+        "Intelligence collective, coopération et cohésion d'équipe.",
+        "Isolement en télétravail et qualité des relations professionnelles.",
+    ],
+    nlp.CATEGORY_INSPIRATION: [
+        "Trouver du sens à son travail et réaligner sa vie sur ses valeurs.",
+        "Reconversion, transitions professionnelles et quête de sens.",
+        "Créativité, intuition et imagination.",
+        "Motivation, engagement et transformation intérieure.",
+        "Se réinventer après une crise, chemin de vie et inspiration.",
+    ],
+}
+
+# Thèmes du lexique → catégorie éditoriale (repli quand la confiance est faible)
+THEME_TO_CATEGORY = {
+    "Burn-out & épuisement": nlp.CATEGORY_REGULATION,
+    "Stress & émotions": nlp.CATEGORY_REGULATION,
+    "Prévention RPS": nlp.CATEGORY_REGULATION,
+    "Télétravail & isolement": nlp.CATEGORY_COMMUNICATION,
+    "Conflits & relations": nlp.CATEGORY_COMMUNICATION,
+    "Motivation & engagement": nlp.CATEGORY_INSPIRATION,
+    "Créativité & intuition": nlp.CATEGORY_INSPIRATION,
+}
+DEFAULT_CATEGORY = nlp.CATEGORY_REGULATION
+
+_model: Any = None
+_model_lock = Lock()
+_prototypes: Optional[np.ndarray] = None
+
+
+# ------------------------------------------------------------
+# 1) Cache des embeddings (SQLite, clé = modèle + texte)
+# ------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return sqlite_store.connect(EMBEDDING_CACHE_PATH, _SCHEMA)
+
+
+def _key(text: str) -> str:
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _get_model() -> Any:
+    global _model
+    with _model_lock:
+        if _model is None:
+            # Import ici : torch n'est chargé que si le classifieur sert
+            from sentence_transformers import SentenceTransformer
+
+            _model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+        return _model
+
+
+def embed(texts: Sequence[str]) -> np.ndarray:
+    """
+    Embeddings normalisés (float32, une ligne par texte). Seuls les textes
+    absents du cache passent dans le modèle, par lots de EMBEDDING_BATCH_SIZE.
+    """
+    keys = [_key(t) for t in texts]
+    found: Dict[str, np.ndarray] = {}
+
+    with _connect() as conn:
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), 900):
+            batch = unique[i:i + 900]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+            )
+            found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+
+    missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in found))
+    if missing:
+        vectors = _get_model().encode(
+            missing, batch_size=EMBEDDING_BATCH_SIZE, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False,
+        ).astype(np.float32)
+        now = time.time()
+        with _connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                ((_key(t), v.tobytes(), now) for t, v in zip(missing, vectors)),
+            )
+        found.update((_key(t), v) for t, v in zip(missing, vectors))
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([found[k] for k in keys])
+
+
+# ------------------------------------------------------------
+# 2) Classification
+# ------------------------------------------------------------
+
+def _prototype_matrix() -> np.ndarray:
+    """Un vecteur (normalisé) par catégorie, calculé une fois par process."""
+    global _prototypes
+    if _prototypes is None:
+        rows = []
+        for sentences in CATEGORY_PROTOTYPES.values():
+            mean = embed(sentences).mean(axis=0)
+            rows.append(mean / np.linalg.norm(mean))
+        _prototypes = np.stack(rows)
+    return _prototypes
+
+
+def chunk_text(transcript: str, words: int = CHUNK_WORDS) -> List[str]:
+    tokens = transcript.split()
+    return [" ".join(tokens[i:i + words]) for i in range(0, len(tokens), words)]
+
+
+def _lexicon_category(themes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Repli : scores des thèmes du lexique regroupés par catégorie éditoriale."""
+    scores = {category: 0 for category in CATEGORY_PROTOTYPES}
+    for theme in themes:
+        scores[THEME_TO_CATEGORY.get(theme["category"], DEFAULT_CATEGORY)] += theme["score"]
+
+    total = sum(scores.values())
+    best = max(scores, key=scores.get) if total else DEFAULT_CATEGORY
+    return {
+        "category": best,
+        "confidence": round(scores[best] / total, 3) if total else 0.0,
+        "scores": {c: round(s / total, 3) if total else 0.0 for c, s in scores.items()},
+        "method": "lexicon",
+    }
+
+
+def _from_embeddings(chunk_vectors: np.ndarray) -> Dict[str, Any]:
+    """
+    Similarité cosinus de chaque morceau aux prototypes, softmax par morceau,
+    puis moyenne sur les morceaux : un épisode qui aborde plusieurs thèmes
+    obtient une confiance plus faible.
+    """
+    sims = chunk_vectors @ _prototype_matrix().T
+    logits = sims / SOFTMAX_TEMPERATURE
+    probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+    probs /= probs.sum(axis=1, keepdims=True)
+    mean = probs.mean(axis=0)
+
+    categories = list(CATEGORY_PROTOTYPES)
+    best = int(mean.argmax())
+    return {
+        "category": categories[best],
+        "confidence": round(float(mean[best]), 3),
+        "scores": {c: round(float(p), 3) for c, p in zip(categories, mean)},
+        "method": "embedding",
+    }
+
+
+def _decide(embedded: Optional[Dict[str, Any]], themes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if embedded is not None and embedded["confidence"] >= CLASSIFIER_MIN_CONFIDENCE:
+        return embedded
+    fallback = _lexicon_category(themes)
+    if embedded is not None:
+        fallback["embedding"] = embedded
+    return fallback
+
+
+def classify_batch(transcripts: Sequence[str],
+                   themes: Optional[Sequence[List[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+    """
+    Catégorie éditoriale de plusieurs transcriptions : tous les morceaux
+    sont encodés ensemble (lots de EMBEDDING_BATCH_SIZE, cache par morceau).
+
+    `themes` : thèmes du lexique déjà classés (nlp.analyze()["categories"]),
+    calculés ici s'ils ne sont pas fournis. Retourne pour chaque transcription
+    {"category", "confidence", "scores", "method": "embedding" | "lexicon"},
+    plus "error" si le modèle d'embeddings n'a pas pu servir.
+    """
+    if themes is None:
+        themes = [nlp.analyze(t)["categories"] for t in transcripts]
+
+    chunks = [chunk_text(t or "") for t in transcripts]
+    embedded: List[Optional[Dict[str, Any]]] = [None] * len(transcripts)
+    error = None
+
+    if CATEGORY_CLASSIFIER == "embedding" and any(chunks):
+        try:
+            vectors = embed([c for doc_chunks in chunks for c in doc_chunks])
+            start = 0
+            for i, doc_chunks in enumerate(chunks):
+                if doc_chunks:
+                    embedded[i] = _from_embeddings(vectors[start:start + len(doc_chunks)])
+                    start += len(doc_chunks)
+        except Exception as e:
+            # Modèle absent ou non téléchargeable : le lexique prend le relais
+            print(f"⚠️ Classifieur par embeddings indisponible : {e}")
+            error = f"{type(e).__name__}: {e}"
+
+    results = [_decide(e, t) for e, t in zip(embedded, themes)]
+    if error:
+        for result in results:
+            result["error"] = error
+    return results
+
+
+def classify(transcript: str, themes: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    return classify_batch([transcript], None if themes is None else [themes])[0]
+
+
+def fingerprint() -> Dict[str, Any]:
+    """Configuration qui détermine la catégorie (clé du cache des étapes du pipeline)."""
+    return {
+        "classifier": CATEGORY_CLASSIFIER,
+        "model": EMBEDDING_MODEL,
+        "chunk_words": CHUNK_WORDS,
+        "min_confidence": CLASSIFIER_MIN_CONFIDENCE,
+        "temperature": SOFTMAX_TEMPERATURE,
+        "prototypes": CATEGORY_PROTOTYPES,
+        "theme_to_category": THEME_TO_CATEGORY,
+    }
@@ -0,0 +1,132 @@
+import math
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import ContextManager, Dict, Iterator, List, Mapping, Optional
+
+from services import sqlite_store
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+CORPUS_DB_PATH = Path(os.getenv("CORPUS_DB_PATH", str(BASE_DIR / "uploads" / "cache" / "corpus.sqlite")))
+
+# Paramètres BM25 (valeurs usuelles)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Nombre max de paramètres par requête SQLite (limite par défaut : 999)
+_SQL_BATCH = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    length INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS doc_freq (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS corpus_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    n_docs INTEGER NOT NULL,
+    total_length INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO corpus_stats (id, n_docs, total_length) VALUES (0, 0, 0);
+"""
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return sqlite_store.connect(CORPUS_DB_PATH, _SCHEMA)
+
+
+def _batches(items: List[str]) -> Iterator[List[str]]:
+    for i in range(0, len(items), _SQL_BATCH):
+        yield items[i:i + _SQL_BATCH]
+
+
+def stats() -> Dict[str, float]:
+    with _connect() as conn:
+        n_docs, total_length = conn.execute(
+            "SELECT n_docs, total_length FROM corpus_stats WHERE id = 0"
+        ).fetchone()
+    return {"n_docs": n_docs, "avg_length": total_length / n_docs if n_docs else 0.0}
+
+
+def add_document(doc_id: str, term_counts: Mapping[str, int]) -> bool:
+    """
+    Ajoute un document au corpus : une ligne par terme distinct du document
+    (coût proportionnel au nouveau document, pas au corpus).
+    Idempotent : un document déjà indexé (même id) n'est pas recompté.
+    """
+    length = sum(term_counts.values())
+    with _connect() as conn:
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO documents (doc_id, length, added_at) VALUES (?, ?, ?)",
+            (doc_id, length, time.time()),
+        ).rowcount
+        if not inserted:
+            return False
+
+        conn.executemany(
+            "INSERT INTO doc_freq (term, df) VALUES (?, 1) "
+            "ON CONFLICT(term) DO UPDATE SET df = df + 1",
+            ((term,) for term in term_counts),
+        )
+        conn.execute(
+            "UPDATE corpus_stats SET n_docs = n_docs + 1, total_length = total_length + ? WHERE id = 0",
+            (length,),
+        )
+    return True
+
+
+def _document_frequencies(conn: sqlite3.Connection, terms: List[str]) -> Dict[str, int]:
+    found: Dict[str, int] = {}
+    for batch in _batches(terms):
+        placeholders = ",".join("?" * len(batch))
+        found.update(conn.execute(
+            f"SELECT term, df FROM doc_freq WHERE term IN ({placeholders})", batch
+        ))
+    return found
+
+
+def document_frequencies(terms: List[str]) -> Dict[str, int]:
+    """Nombre de documents du corpus contenant chaque terme (absent = 0)."""
+    with _connect() as conn:
+        return _document_frequencies(conn, terms)
+
+
+def bm25_scores(term_counts: Mapping[str, int], doc_id: Optional[str] = None) -> Dict[str, float]:
+    """
+    Poids BM25 de chaque terme d'un document par rapport au corpus.
+    Le document est compté comme faisant partie du corpus (s'il n'y est pas
+    déjà) : un terme jamais vu a df = 1, et un corpus vide donne le même
+    IDF à tous les termes (classement par fréquence).
+    """
+    terms = list(term_counts)
+    length = sum(term_counts.values())
+
+    with _connect() as conn:
+        n_docs, total_length = conn.execute(
+            "SELECT n_docs, total_length FROM corpus_stats WHERE id = 0"
+        ).fetchone()
+        indexed = doc_id is not None and conn.execute(
+            "SELECT 1 FROM documents WHERE doc_id = ?", (doc_id,)
+        ).fetchone() is not None
+        df = _document_frequencies(conn, terms)
+
+    if not indexed:
+        n_docs += 1
+        total_length += length
+        df = {term: df.get(term, 0) + 1 for term in terms}
+
+    avg_length = total_length / n_docs if n_docs else 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / max(avg_length, 1.0))
+
+    scores = {}
+    for term, tf in term_counts.items():
+        term_df = df.get(term, 1)
+        idf = math.log(1 + (n_docs - term_df + 0.5) / (term_df + 0.5))
+        scores[term] = idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
@@ -0,0 +1,201 @@
+import base64
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, Optional, Tuple
+
+from services import sqlite_store
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+EPISODES_DB_PATH = Path(os.getenv("EPISODES_DB_PATH", str(BASE_DIR / "uploads" / "episodes.sqlite")))
+
+# Taille de page par défaut / maximale de GET /episodes
+EPISODES_PAGE_SIZE = 50
+EPISODES_MAX_PAGE_SIZE = 200
+
+# Colonnes stockées en JSON
+_JSON_FIELDS = ("keywords", "quality_details", "classification", "transcript_ref")
+
+# Champs d'un épisode renvoyés par la liste (sans transcription ni détails)
+_SUMMARY_FIELDS = (
+    "episode_id", "content_hash", "status", "stage", "title", "contributor_email", "category",
+    "cover_image", "keywords", "duration", "audio_url", "quality_status", "quality_score",
+    "error", "created_at", "updated_at",
+)
+
+# Colonnes modifiables par les étapes du pipeline
+_FIELDS = set(_SUMMARY_FIELDS) - {"episode_id", "created_at", "updated_at"} | {
+    "contributor_name", "quality_details", "classification", "transcript_ref",
+}
+
+# Un index par filtre de GET /episodes, terminé par (created_at, id) : chaque
+# page est une plage d'index, sans tri ni OFFSET (coût constant)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    episode_id TEXT NOT NULL UNIQUE,
+    content_hash TEXT,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    title TEXT,
+    contributor_email TEXT,
+    contributor_name TEXT,
+    category TEXT,
+    cover_image TEXT,
+    keywords TEXT,
+    duration REAL,
+    audio_url TEXT,
+    quality_status TEXT,
+    quality_score INTEGER,
+    quality_details TEXT,
+    classification TEXT,
+    transcript_ref TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_episodes_created ON episodes(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_episodes_contributor ON episodes(contributor_email, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_episodes_category ON episodes(category, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_episodes_status ON episodes(status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_episodes_content_hash ON episodes(content_hash);
+CREATE TABLE IF NOT EXISTS transcripts (
+    episode_id TEXT PRIMARY KEY,
+    transcript TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return sqlite_store.connect(EPISODES_DB_PATH, _SCHEMA, row_factory=sqlite3.Row)
+
+
+# ------------------------------------------------------------
+# 1) Écriture (étape par étape, depuis le pipeline)
+# ------------------------------------------------------------
+
+def create(episode_id: str, contributor_email: str, content_hash: Optional[str] = None) -> None:
+    """
+    Crée l'épisode au début du pipeline (status "processing"). Un job
+    relancé avec le même id repart de zéro, en gardant sa date de création.
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO episodes (episode_id, content_hash, status, stage, contributor_email, "
+            "created_at, updated_at) VALUES (?, ?, 'processing', 'audio', ?, ?, ?) "
+            "ON CONFLICT(episode_id) DO UPDATE SET content_hash = excluded.content_hash, "
+            "status = 'processing', stage = 'audio', error = NULL, updated_at = excluded.updated_at",
+            (episode_id, content_hash, contributor_email, now, now),
+        )
+
+
+def update(episode_id: str, transcript: Optional[str] = None, **fields: Any) -> None:
+    """Enregistre les résultats d'une étape (colonnes de _FIELDS, et la transcription)."""
+    unknown = set(fields) - _FIELDS
+    if unknown:
+        raise ValueError(f"Champs d'épisode inconnus : {sorted(unknown)}")
+
+    values = {k: json.dumps(v, ensure_ascii=False) if k in _JSON_FIELDS and v is not None else v
+              for k, v in fields.items()}
+    values["updated_at"] = time.time()
+    with _connect() as conn:
+        conn.execute(
+            f"UPDATE episodes SET {', '.join(f'{k} = ?' for k in values)} WHERE episode_id = ?",
+            (*values.values(), episode_id),
+        )
+        if transcript is not None:
+            conn.execute("INSERT OR REPLACE INTO transcripts (episode_id, transcript) VALUES (?, ?)",
+                         (episode_id, transcript))
+
+
+def mark_failed(episode_id: str, error: str) -> None:
+    update(episode_id, status="failed", stage="failed", error=error)
+
+
+# ------------------------------------------------------------
+# 2) Lecture
+# ------------------------------------------------------------
+
+def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    episode = dict(row)
+    episode.pop("id", None)
+    for key in _JSON_FIELDS:
+        if episode.get(key) is not None:
+            episode[key] = json.loads(episode[key])
+    return episode
+
+
+def get(episode_id: str, with_transcript: bool = True) -> Optional[Dict[str, Any]]:
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM episodes WHERE episode_id = ?", (episode_id,)).fetchone()
+        if row is None:
+            return None
+        episode = _row_to_dict(row)
+        if with_transcript:
+            found = conn.execute("SELECT transcript FROM transcripts WHERE episode_id = ?",
+                                 (episode_id,)).fetchone()
+            episode["transcript"] = found[0] if found else None
+    return episode
+
+
+def iter_ids(**filters: Any) -> Iterator[str]:
+    """Ids de tous les épisodes (filtres de list_episodes), page par page."""
+    cursor = None
+    while True:
+        page = list_episodes(limit=EPISODES_MAX_PAGE_SIZE, cursor=cursor, **filters)
+        for episode in page["episodes"]:
+            yield episode["episode_id"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+
+def _encode_cursor(created_at: float, rowid: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at!r}:{rowid}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, rowid = raw.split(":")
+        return float(created_at), int(rowid)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Curseur de pagination invalide")
+
+
+def list_episodes(limit: int = EPISODES_PAGE_SIZE, cursor: Optional[str] = None,
+                  contributor_email: Optional[str] = None, category: Optional[str] = None,
+                  status: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Épisodes du plus récent au plus ancien, page par page (keyset) :
+    `next_cursor` de la réponse donne la page suivante (None = dernière page).
+    Filtres optionnels : contributeur, catégorie, statut.
+    """
+    limit = min(max(limit, 1), EPISODES_MAX_PAGE_SIZE)
+    where, params = [], []
+    for column, value in (("contributor_email", contributor_email), ("category", category), ("status", status)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if cursor:
+        where.append("(created_at, id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+
+    query = (
+        f"SELECT id, {', '.join(_SUMMARY_FIELDS)} FROM episodes "
+        f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+        "ORDER BY created_at DESC, id DESC LIMIT ?"
+    )
+    with _connect() as conn:
+        rows = conn.execute(query, (*params, limit + 1)).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "episodes": [_row_to_dict(row) for row in rows],
+        "next_cursor": _encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None,
+    }
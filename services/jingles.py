@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from services import audio
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+JINGLE_CACHE_DIR = BASE_DIR / "uploads" / "cache" / "jingles"
+SEEN_FORMATS_PATH = JINGLE_CACHE_DIR / "formats.json"
+
+# Nombre d'entrées gardées en mémoire (chemins des génériques déjà prêts)
+JINGLE_LRU_SIZE = int(os.getenv("JINGLE_LRU_SIZE", "16"))
+
+# (chemin source, hash source, codec, fréquence, canaux, débit, extension) → fichier prêt
+_lru: "OrderedDict[Tuple, Path]" = OrderedDict()
+# chemin source → (mtime_ns, taille, sha256, infos ffprobe)
+_sources: Dict[str, Tuple[int, int, str, Dict[str, Any]]] = {}
+_lock = Lock()
+
+
+# ------------------------------------------------------------
+# 1) Empreinte des fichiers sources (mtime + hash)
+# ------------------------------------------------------------
+
+def _available(source: Path) -> bool:
+    """Générique présent et non vide (resources/outro.mp3 est un fichier vide en attendant)."""
+    try:
+        return source.stat().st_size > 0
+    except OSError:
+        return False
+
+
+def _source_info(source: Path) -> Tuple[str, Dict[str, Any]]:
+    """
+    Hash et infos ffprobe du générique source. Recalculés seulement si le
+    mtime ou la taille du fichier changent.
+    """
+    st = source.stat()
+    cached = _sources.get(str(source))
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2], cached[3]
+
+    digest = hashlib.sha256(source.read_bytes()).hexdigest()
+    info = audio.probe(source)
+    _sources[str(source)] = (st.st_mtime_ns, st.st_size, digest, info)
+
+    # Le contenu a changé : on purge les versions transcodées de l'ancien fichier
+    if cached and cached[2] != digest:
+        _invalidate(source, keep_hash=digest)
+
+    return digest, info
+
+
+def _invalidate(source: Path, keep_hash: str) -> None:
+    for key in [k for k in _lru if k[0] == str(source) and k[1] != keep_hash]:
+        del _lru[key]
+    if JINGLE_CACHE_DIR.exists():
+        for path in JINGLE_CACHE_DIR.glob(f"{source.stem}-*"):
+            if not path.name.startswith(f"{source.stem}-{keep_hash[:12]}-"):
+                path.unlink(missing_ok=True)
+
+
+# ------------------------------------------------------------
+# 2) Formats rencontrés (pour préparer les génériques au démarrage)
+# ------------------------------------------------------------
+
+def _format_key(target: Dict[str, Any], suffix: str) -> Dict[str, Any]:
+    return {
+        "codec": target["codec"],
+        "sample_rate": target["sample_rate"],
+        "channels": target["channels"],
+        "bit_rate": target.get("bit_rate") or 0,
+        "suffix": suffix,
+    }
+
+
+def _load_seen_formats() -> list:
+    if not SEEN_FORMATS_PATH.exists():
+        return []
+    with open(SEEN_FORMATS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _remember_format(fmt: Dict[str, Any]) -> None:
+    seen = _load_seen_formats()
+    if fmt in seen:
+        return
+    seen.append(fmt)
+    tmp_path = SEEN_FORMATS_PATH.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(seen, f)
+    os.replace(tmp_path, SEEN_FORMATS_PATH)
+
+
+# ------------------------------------------------------------
+# 3) API publique
+# ------------------------------------------------------------
+
+def get_jingle(source: Path, target: Dict[str, Any], suffix: str) -> Optional[Path]:
+    """
+    Générique `source` prêt à être concaténé (stream copy) avec un épisode au
+    format `target` : le fichier source lui-même s'il correspond déjà, sinon
+    une version transcodée une seule fois et gardée sur disque + LRU mémoire.
+    """
+    if not _available(source):
+        return None
+
+    with _lock:
+        digest, info = _source_info(source)
+        fmt = _format_key(target, suffix)
+        key = (str(source), digest, fmt["codec"], fmt["sample_rate"], fmt["channels"], fmt["bit_rate"], suffix)
+
+        cached = _lru.get(key)
+        if cached is not None and cached.exists():
+            _lru.move_to_end(key)
+            return cached
+
+        if audio.same_format(info, target) and source.suffix.lower() == suffix:
+            ready = source
+        else:
+            JINGLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            ready = JINGLE_CACHE_DIR / (
+                f"{source.stem}-{digest[:12]}-{fmt['codec']}-{fmt['sample_rate']}-{fmt['channels']}"
+                f"-{fmt['bit_rate']}{suffix}"
+            )
+            if not ready.exists():
+                # Écriture atomique : plusieurs workers peuvent préparer le même format
+                tmp_path = ready.with_name(f".{os.getpid()}-{ready.name}")
+                audio.transcode(source, target, tmp_path)
+                os.replace(tmp_path, ready)
+            _remember_format(fmt)
+
+        _lru[key] = ready
+        _lru.move_to_end(key)
+        while len(_lru) > JINGLE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+        return ready
+
+
+def source_hash(source: Path) -> Optional[str]:
+    """SHA-256 du générique (None s'il est absent), recalculé seulement s'il change."""
+    if not _available(source):
+        return None
+    with _lock:
+        digest, _ = _source_info(source)
+    return digest
+
+
+def duration(source: Path) -> Optional[float]:
+    """Durée du générique en secondes (None s'il est absent), sans relancer ffprobe."""
+    if not _available(source):
+        return None
+    with _lock:
+        _, info = _source_info(source)
+    return info["duration"]
+
+
+def warmup() -> None:
+    """
+    Prépare intro et outro pour tous les formats déjà rencontrés.
+    Appelé au démarrage des workers ; un générique absent ou vide est
+    ignoré, les autres erreurs ne bloquent rien.
+    """
+    sources = [s for s in (audio.INTRO_PATH, audio.OUTRO_PATH) if _available(s)]
+    for fmt in _load_seen_formats():
+        for source in sources:
+            try:
+                get_jingle(source, fmt, fmt["suffix"])
+            except Exception as e:
+                print(f"⚠️ Générique {source.name} ({fmt['codec']}) non préparé : {e}")
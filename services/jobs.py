@@ -0,0 +1,383 @@
+import json
+import os
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from services import episodes
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+JOBS_DIR = BASE_DIR / "uploads" / "jobs"
+# État de chaque worker (modèle chargé ou non), lu par la sonde /ready
+WORKERS_DIR = JOBS_DIR / "workers"
+
+# Nombre de process workers qui exécutent le pipeline en parallèle
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "2"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = Lock()
+# Identifiant du pool courant (les états des workers d'un ancien pool sont ignorés)
+_pool_id: Optional[str] = None
+# Dans un worker : pool auquel il appartient
+_worker_pool_id: Optional[str] = None
+
+
+# ------------------------------------------------------------
+# 1) Stockage de l'état des jobs (un fichier JSON par job)
+# ------------------------------------------------------------
+
+def _job_path(job_id: str) -> Path:
+    return JOBS_DIR / f"{job_id}.json"
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    """Écriture atomique : fichier temporaire puis renommage."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _write_job(job: Dict[str, Any]) -> None:
+    _write_json(_job_path(job["id"]), job)
+
+
+def _update_job(job_id: str, **fields: Any) -> Dict[str, Any]:
+    job = get_job(job_id) or {"id": job_id}
+    job.update(fields)
+    job["updated_at"] = time.time()
+    _write_job(job)
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Retourne l'état d'un job ou None s'il n'existe pas."""
+    # L'id sert de nom de fichier : on refuse tout ce qui n'est pas un uuid hex
+    if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+        return None
+
+    path = _job_path(job_id)
+    if not path.exists():
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _segments_path(job_id: str) -> Path:
+    return JOBS_DIR / f"{job_id}.segments.jsonl"
+
+
+def append_segment(job_id: str, segment: Dict[str, Any]) -> None:
+    """Ajoute un segment de transcription partielle (une ligne JSON par segment)."""
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    line = json.dumps(segment, ensure_ascii=False) + "\n"
+    # Une seule écriture en mode append : un lecteur ne voit jamais de ligne à moitié
+    # écrite, sauf la dernière, qu'il ignore tant qu'elle n'est pas terminée
+    with open(_segments_path(job_id), "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def read_segments(job_id: str, start: int = 0) -> List[Dict[str, Any]]:
+    """Segments partiels d'un job à partir de l'indice `start`."""
+    path = _segments_path(job_id)
+    if not path.exists():
+        return []
+
+    segments = []
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if not line.endswith("\n"):
+                break
+            if i >= start:
+                segments.append(json.loads(line))
+    return segments
+
+
+def list_jobs(limit: int = 50) -> List[Dict[str, Any]]:
+    """Jobs les plus récents d'abord (sans le résultat complet ni la traceback)."""
+    if not JOBS_DIR.exists():
+        return []
+
+    paths = sorted(JOBS_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+
+    jobs = []
+    for path in paths[:limit]:
+        with open(path, encoding="utf-8") as f:
+            job = json.load(f)
+        job.pop("result", None)
+        job.pop("traceback", None)
+        jobs.append(job)
+    return jobs
+
+
+# ------------------------------------------------------------
+# 2) Exécution dans un process worker
+# ------------------------------------------------------------
+
+def _run_job(job_id: str, raw_path: str, contributor_email: str) -> None:
+    """Point d'entrée exécuté dans le process worker."""
+    # Import ici : les dépendances lourdes (Whisper, pydub) ne sont
+    # chargées que dans les workers, jamais dans le process de l'API.
+    from services import pipeline
+
+    def on_progress(stage: str, progress: float) -> None:
+        _update_job(job_id, status="running", stage=stage, progress=round(progress, 2))
+
+    def on_segment(segment: Dict[str, Any]) -> None:
+        append_segment(job_id, segment)
+
+    # Un job relancé repart d'une transcription partielle vide
+    _segments_path(job_id).unlink(missing_ok=True)
+
+    try:
+        result = pipeline.process_upload(raw_path, contributor_email,
+                                         on_progress=on_progress, on_segment=on_segment,
+                                         episode_id=job_id)
+        _update_job(job_id, status="done", stage="done", progress=1.0, result=result)
+    except Exception as e:
+        _update_job(
+            job_id,
+            status="failed",
+            error=f"{type(e).__name__}: {e}",
+            traceback=traceback.format_exc(),
+        )
+        episodes.mark_failed(job_id, f"{type(e).__name__}: {e}")
+    finally:
+        # Le modèle a pu être chargé par ce job (préchargement en échec)
+        _write_worker_status()
+
+
+def _init_worker(pool_id: str) -> None:
+    """
+    Au démarrage de chaque worker : précharge les modèles Whisper et
+    prépare les génériques déjà connus. Une erreur ici ne doit pas casser
+    le pool : le chargement sera retenté au premier job.
+    """
+    global _worker_pool_id
+    from services import jingles, stt
+
+    _worker_pool_id = pool_id
+    try:
+        stt.warmup()
+    except Exception as e:
+        print(f"⚠️ Préchargement Whisper impossible : {e}")
+
+    jingles.warmup()
+    _write_worker_status()
+
+
+def _write_worker_status() -> None:
+    """
+    Publie l'état du modèle de ce worker dans un fichier : la sonde /ready
+    le lit directement, sans envoyer de tâche derrière des jobs de plusieurs minutes.
+    """
+    from services import stt
+
+    _write_json(WORKERS_DIR / f"{_worker_pool_id}-{os.getpid()}.json",
+                {"pool": _worker_pool_id, "pid": os.getpid(), "stt": stt.status(), "updated_at": time.time()})
+
+
+def _worker_statuses() -> List[Dict[str, Any]]:
+    """États publiés par les workers du pool courant."""
+    if _pool_id is None or not WORKERS_DIR.exists():
+        return []
+
+    statuses = []
+    for path in WORKERS_DIR.glob(f"{_pool_id}-*.json"):
+        try:
+            with open(path, encoding="utf-8") as f:
+                statuses.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return statuses
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _on_job_finished(job_id: str, executor: ProcessPoolExecutor, future: Future) -> None:
+    """Filet de sécurité si le worker meurt (OOM, segfault...) ou si le job est annulé."""
+    if future.cancelled():
+        # Arrêt de l'API avant qu'un worker ne prenne le job : remis en file au redémarrage
+        return
+    error = future.exception()
+    if error is not None:
+        _update_job(job_id, status="failed", error=f"{type(error).__name__}: {error}")
+    if isinstance(error, BrokenProcessPool):
+        # Un worker est mort : le pool n'accepte plus rien, le suivant le remplace
+        _discard_executor(executor)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor, _pool_id
+    with _executor_lock:
+        if _executor is None:
+            _pool_id = uuid.uuid4().hex
+            for path in WORKERS_DIR.glob("*.json") if WORKERS_DIR.exists() else ():
+                path.unlink(missing_ok=True)
+            _executor = ProcessPoolExecutor(max_workers=PIPELINE_WORKERS, initializer=_init_worker,
+                                            initargs=(_pool_id,))
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    """Oublie un pool cassé (une seule fois, même si plusieurs jobs le signalent)."""
+    global _executor, _pool_id
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+            _pool_id = None
+
+
+def _submit(job_id: str, raw_path: str, contributor_email: str) -> None:
+    executor = _get_executor()
+    try:
+        future = executor.submit(_run_job, job_id, raw_path, contributor_email)
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        executor = _get_executor()
+        future = executor.submit(_run_job, job_id, raw_path, contributor_email)
+    future.add_done_callback(lambda f: _on_job_finished(job_id, executor, f))
+
+
+# ------------------------------------------------------------
+# 3) API publique
+# ------------------------------------------------------------
+
+def submit(raw_path: str, contributor_email: str) -> Dict[str, Any]:
+    """
+    Met un épisode en file d'attente et retourne immédiatement le job.
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    job = {
+        "id": job_id,
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0.0,
+        "file": raw_path,
+        "contributor_email": contributor_email,
+        "created_at": now,
+        "updated_at": now,
+    }
+    _write_job(job)
+    _submit(job_id, raw_path, contributor_email)
+    return job
+
+
+def resubmit(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Relance le pipeline d'un job existant (même id, même fichier). Les étapes
+    dont les entrées n'ont pas changé sont reprises du cache : après une
+    erreur, le job repart de l'étape qui a échoué ; après une modification
+    des lexiques, seule l'étape NLP tourne. Un job en cours n'est pas relancé.
+    """
+    job = get_job(job_id)
+    if job is None or job["status"] in ("queued", "running"):
+        return job
+
+    return _requeue(job_id)
+
+
+def _requeue(job_id: str) -> Dict[str, Any]:
+    job = _update_job(job_id, status="queued", stage="queued", progress=0.0,
+                      error=None, traceback=None, result=None)
+    _submit(job_id, job["file"], job["contributor_email"])
+    return job
+
+
+def _requeue_interrupted() -> int:
+    """
+    Jobs encore "queued" ou "running" au démarrage : leurs workers sont
+    morts avec le process précédent de l'API. Ils sont remis en file ; les
+    étapes déjà terminées sont reprises du cache.
+    """
+    if not JOBS_DIR.exists():
+        return 0
+
+    count = 0
+    for path in JOBS_DIR.glob("*.json"):
+        try:
+            with open(path, encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if job.get("status") in ("queued", "running"):
+            _requeue(job["id"])
+            count += 1
+    return count
+
+
+def start() -> None:
+    """
+    Démarre les workers (qui préchargent Whisper) sans bloquer l'API, et
+    remet en file les jobs interrompus par un arrêt.
+    L'API elle-même n'importe jamais torch.
+    """
+    _start_workers()
+    requeued = _requeue_interrupted()
+    if requeued:
+        print(f"↩️ {requeued} job(s) interrompu(s) remis en file")
+
+
+def _start_workers() -> None:
+    """Le pool ne lance ses process qu'à la première tâche : une tâche vide suffit."""
+    executor = _get_executor()
+    try:
+        executor.submit(_write_worker_status)
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        _get_executor().submit(_write_worker_status)
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    Prêt = un worker du pool courant a terminé son initialisation et a un
+    modèle chargé. Lu dans les fichiers d'état des workers : la réponse
+    est immédiate, même quand tous les workers sont occupés. Un pool cassé
+    (worker tué) est remplacé.
+    """
+    with _executor_lock:
+        executor = _executor
+    if executor is None:
+        _start_workers()
+        return {"ready": False, "reason": "workers en cours de démarrage"}
+
+    statuses = _worker_statuses()
+    alive = [s for s in statuses if _is_alive(s["pid"])]
+    if statuses and not alive:
+        # Tous les workers du pool sont morts : le pool est cassé, on le remplace
+        _discard_executor(executor)
+        _start_workers()
+        return {"ready": False, "reason": "pool de workers cassé, redémarrage"}
+    statuses = alive
+    if not statuses:
+        return {"ready": False, "reason": "workers en cours de démarrage"}
+
+    loaded = [s["stt"] for s in statuses if s["stt"].get("ready")]
+    if not loaded:
+        return {"ready": False, "reason": "modèle Whisper non chargé", "stt": statuses[0]["stt"]}
+
+    return {"ready": True, "workers": PIPELINE_WORKERS, "stt": loaded[0]}
+
+
+def shutdown() -> None:
+    global _executor, _pool_id
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+            _pool_id = None
@@ -1,6 +1,13 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional, Tuple
+import os
 import re
-from collections import Counter
+from collections import Counter, deque
+
+from services import corpus_index
+
+# Classement des mots-clés non éditoriaux : "bm25" (par rapport au corpus
+# des épisodes déjà traités, voir services.corpus_index) ou "frequency"
+KEYWORD_RANKING = os.getenv("NLP_KEYWORD_RANKING", "bm25")
 
 # Stopwords FR très simples pour filtrer les mots sans intérêt
 BASIC_STOPWORDS = {
@@ -240,83 +247,306 @@ def _normalize(text: str) -> str:
     return text
 
 
-def _tokenize(text: str) -> List[str]:
-    """Découpe en mots simples, en enlevant les stopwords et mots trop courts."""
-    text = _normalize(text)
-    tokens = text.split()
-    tokens = [
+def _filter_tokens(words: List[str]) -> List[str]:
+    """Mots simples d'un texte déjà normalisé, sans stopwords ni mots trop courts."""
+    return [
         t.strip("'-")
-        for t in tokens
+        for t in words
         if len(t.strip("'-")) >= 3 and t not in BASIC_STOPWORDS
     ]
-    return tokens
 
-def extract_keywords(transcript: str, max_keywords: int = 10) -> List[str]:
+
+def _tokenize(text: str) -> List[str]:
+    """Découpe en mots simples, en enlevant les stopwords et mots trop courts."""
+    return _filter_tokens(_normalize(text).split())
+
+class LexiconMatcher:
     """
-    Extracteur de mots-clés :
-    1) repère les mots-clés éditoriaux CURATED_KEYWORDS présents dans le texte
-    2) complète avec des mots fréquents significatifs
+    Automate d'Aho-Corasick construit une fois sur des expressions déjà
+    normalisées : toutes les occurrences sont trouvées en un seul passage
+    sur le texte, quel que soit le nombre d'expressions.
+
+    L'alphabet de l'automate est le mot (texte découpé aux espaces et aux
+    apostrophes) : une occurrence commence toujours en début de mot, et le
+    dernier mot tolère une marque de pluriel/féminin ("conflit" →
+    "conflits", "épuisé" → "épuisée"). "rps" ne matche plus dans "corps".
     """
-    if not transcript:
+
+    # Terminaisons tolérées sur le dernier mot d'une expression
+    ENDINGS = ("s", "e", "es", "x")
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._lengths: List[int] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        # Derniers mots des expressions (filtre rapide avant de tester les terminaisons)
+        self._last_words: set = set()
+
+        for pattern in dict.fromkeys(p for p in patterns if p):
+            self._add(pattern)
+        self._build_failure_links()
+
+    @staticmethod
+    def words(text: str) -> List[str]:
+        """Découpage commun aux expressions et aux textes (déjà normalisés)."""
+        return text.replace("'", " ").split()
+
+    def _add(self, pattern: str) -> None:
+        words = self.words(pattern)
+        node = 0
+        for word in words:
+            nxt = self._goto[node].get(word)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][word] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(len(self.patterns))
+        self.patterns.append(pattern)
+        self._lengths.append(len(words))
+        self._last_words.add(words[-1])
+
+    def _build_failure_links(self) -> None:
+        # Parcours en largeur : le lien d'échec d'un nœud pointe vers le plus
+        # long suffixe de son chemin qui est aussi un préfixe d'expression
+        todo = deque(self._goto[0].values())
+        while todo:
+            node = todo.popleft()
+            for word, child in self._goto[node].items():
+                todo.append(child)
+                fallback = self._fail[node]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _next(self, node: int, word: str) -> int:
+        goto, fail = self._goto, self._fail
+        while node and word not in goto[node]:
+            node = fail[node]
+        return goto[node].get(word, 0)
+
+    def find(self, words: List[str]) -> Dict[str, List[int]]:
+        """Expression → positions (indices de mots) de ses occurrences dans `words`."""
+        hits: Dict[str, List[int]] = {}
+        out, root, last_words = self._out, self._goto[0], self._last_words
+        node = 0
+
+        def record(index: int, i: int) -> None:
+            hits.setdefault(self.patterns[index], []).append(i + 1 - self._lengths[index])
+
+        for i, word in enumerate(words):
+            # Expressions qui finissent sur ce mot, à une terminaison près
+            # (toutes les terminaisons font 1 ou 2 caractères)
+            if word[:-1] in last_words or word[:-2] in last_words:
+                for ending in self.ENDINGS:
+                    if len(word) > len(ending) and word.endswith(ending):
+                        for index in out[self._next(node, word[:-len(ending)])]:
+                            record(index, i)
+
+            # Cas le plus fréquent : mot hors lexique depuis la racine
+            if not node and word not in root:
+                continue
+            node = self._next(node, word)
+            for index in out[node]:
+                record(index, i)
+
+        return hits
+
+
+def _normalize_expression(text: str) -> str:
+    """Forme canonique d'une expression des lexiques ("l’imposteur" = "l'imposteur")."""
+    return " ".join(LexiconMatcher.words(_normalize(text)))
+
+
+_matcher: Optional[LexiconMatcher] = None
+# Expression normalisée → mots-clés éditoriaux / (catégorie, expression) qu'elle représente ;
+# deux graphies de la même expression ne donnent qu'un mot-clé (la première du vocabulaire)
+_keyword_patterns: Dict[str, List[str]] = {}
+_theme_patterns: Dict[str, List[Tuple[str, str]]] = {}
+
+
+def _get_matcher() -> LexiconMatcher:
+    """Automate unique construit depuis CURATED_KEYWORDS et THEME_LEXICON."""
+    global _matcher
+    if _matcher is None:
+        for kw in CURATED_KEYWORDS:
+            _keyword_patterns.setdefault(_normalize_expression(kw), []).append(kw)
+        for category, expressions in THEME_LEXICON.items():
+            for expr in expressions:
+                _theme_patterns.setdefault(_normalize_expression(expr), []).append((category, expr))
+        _matcher = LexiconMatcher(list(_keyword_patterns) + list(_theme_patterns))
+    return _matcher
+
+
+def _scan_words(words: List[str]) -> Dict[str, Dict]:
+    hits = _get_matcher().find(words)
+
+    keywords: Dict[str, List[int]] = {}
+    themes: Dict[str, Dict[str, int]] = {}
+    for pattern, positions in hits.items():
+        for kw in _keyword_patterns.get(pattern, [])[:1]:
+            keywords[kw] = positions
+        for category, expr in _theme_patterns.get(pattern, []):
+            themes.setdefault(category, {})[expr] = len(positions)
+
+    return {"keywords": keywords, "themes": themes}
+
+
+def scan_lexicons(transcript: str) -> Dict[str, Dict]:
+    """
+    Un seul passage sur la transcription pour les deux lexiques :
+    - "keywords" : mot-clé éditorial → positions (indices de mots)
+    - "themes"   : catégorie → {expression : nombre d'occurrences}
+    """
+    return _scan_words(LexiconMatcher.words(_normalize(transcript or "")))
+
+
+# ------------------------------------------------------------
+# Analyse complète en une passe
+# ------------------------------------------------------------
+
+DEFAULT_CATEGORY = "Bien-être général"
+
+
+class Document:
+    """
+    Représentation partagée d'une transcription : normalisée et découpée
+    une seule fois, lexiques parcourus une seule fois (les expressions de
+    plusieurs mots des lexiques y jouent le rôle des n-grammes).
+    """
+
+    def __init__(self, transcript: str):
+        self.transcript = transcript or ""
+        self.text_norm = _normalize(self.transcript)
+        self.tokens = _filter_tokens(self.text_norm.split())
+        self.token_counts = Counter(self.tokens)
+        self.hits = _scan_words(LexiconMatcher.words(self.text_norm))
+
+
+def _ranked_terms(doc: Document, doc_id: Optional[str] = None) -> List[str]:
+    """
+    Mots "simples" du document, du plus au moins caractéristique.
+    BM25 : un mot fréquent dans l'épisode mais présent dans presque tous les
+    épisodes ("travail", "vraiment") passe derrière les mots propres à l'épisode.
+    """
+    counts = {w: n for w, n in doc.token_counts.items() if len(w) >= 4 and w not in BASIC_STOPWORDS}
+    if KEYWORD_RANKING != "bm25":
+        return sorted(counts, key=counts.get, reverse=True)
+
+    scores = corpus_index.bm25_scores(counts, doc_id)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _keywords(doc: Document, max_keywords: int, doc_id: Optional[str] = None) -> List[str]:
+    if not doc.transcript:
         return []
 
-    text_norm = _normalize(transcript)
-    tokens = _tokenize(transcript)
-
-    # 1) Mots-clés éditoriaux trouvés dans le texte
-    curated_found = []
-    for kw in CURATED_KEYWORDS:
-        kw_norm = _normalize(kw)
-        if kw_norm in text_norm:
-            curated_found.append(kw)
-
-    # 2) Mots fréquents "simples"
-    counts = Counter(tokens)
-    frequent = [w for w, _ in counts.most_common(30)]
-    candidates = [
-        w for w in frequent
-        if len(w) >= 4 and w not in BASIC_STOPWORDS
-    ]
+    # 1) Mots-clés éditoriaux trouvés dans le texte (ordre du vocabulaire)
+    curated_found = [kw for kw in CURATED_KEYWORDS if kw in doc.hits["keywords"]]
 
-    # 3) Fusion : d'abord les mots-clés éditoriaux, puis les mots fréquents
-    merged = curated_found + candidates
+    # 2) Mots caractéristiques de l'épisode
+    candidates = _ranked_terms(doc, doc_id)[:30]
 
-    # 4) Supprimer les doublons en gardant l'ordre
-    seen = set()
-    unique_keywords: List[str] = []
-    for w in merged:
-        if w not in seen:
-            seen.add(w)
-            unique_keywords.append(w)
+    # 3) Fusion : d'abord les mots-clés éditoriaux, puis les mots fréquents,
+    #    sans doublons en gardant l'ordre
+    unique_keywords = list(dict.fromkeys(curated_found + candidates))
 
-    # 5) Limiter à N mots-clés
+    # 4) Limiter à N mots-clés
     return unique_keywords[:max_keywords]
 
+
+def _rank_categories(doc: Document) -> List[Dict]:
+    """
+    Catégories trouvées, de la plus probable à la moins probable.
+    Score = nombre d'expressions distinctes du thème présentes (à égalité,
+    l'ordre de THEME_LEXICON départage) ; confiance = part du score total.
+    """
+    themes = doc.hits["themes"]
+    ranked = [
+        {"category": category, "score": len(themes[category]),
+         "occurrences": sum(themes[category].values())}
+        for category in THEME_LEXICON
+        if category in themes
+    ]
+    ranked.sort(key=lambda c: c["score"], reverse=True)
+
+    total = sum(c["score"] for c in ranked)
+    for c in ranked:
+        c["confidence"] = round(c["score"] / total, 3)
+    return ranked
+
+
+def _analyze_document(doc: Document, max_keywords: int, doc_id: Optional[str] = None) -> Dict:
+    categories = _rank_categories(doc)
+    category = categories[0]["category"] if categories else DEFAULT_CATEGORY
+    return {
+        "keywords": _keywords(doc, max_keywords, doc_id),
+        "category": category,
+        "confidence": categories[0]["confidence"] if categories else 0.0,
+        "categories": categories,
+        "cover_image": map_category_to_cover(category),
+    }
+
+
+def analyze(transcript: str, max_keywords: int = 10, doc_id: Optional[str] = None) -> Dict:
+    """
+    Analyse NLP complète en une passe :
+    {"keywords", "category", "confidence", "categories" (classées, avec
+    score et confiance), "cover_image"}.
+
+    `doc_id` (ex. hash du contenu audio) : le document est ajouté à l'index
+    du corpus après l'analyse (une seule fois par id).
+    """
+    doc = Document(transcript)
+    result = _analyze_document(doc, max_keywords, doc_id)
+    if doc_id and doc.tokens:
+        corpus_index.add_document(doc_id, doc.token_counts)
+    return result
+
+
+def analyze_batch(transcripts: Iterable[str], max_keywords: int = 10) -> List[Dict]:
+    """`analyze` sur plusieurs transcriptions (automate construit une seule fois)."""
+    _get_matcher()
+    return [analyze(transcript, max_keywords) for transcript in transcripts]
+
+
+def fingerprint() -> Dict:
+    """
+    Tout ce qui détermine le résultat de `analyze`, hors état du corpus :
+    une modification des lexiques invalide l'étape NLP du pipeline (et elle seule).
+    """
+    return {
+        "ranking": KEYWORD_RANKING,
+        "stopwords": sorted(BASIC_STOPWORDS),
+        "curated": CURATED_KEYWORDS,
+        "themes": THEME_LEXICON,
+        "endings": list(LexiconMatcher.ENDINGS),
+    }
+
+
+def extract_keywords(transcript: str, max_keywords: int = 10) -> List[str]:
+    """
+    Extracteur de mots-clés :
+    1) repère les mots-clés éditoriaux CURATED_KEYWORDS présents dans le texte
+    2) complète avec des mots fréquents significatifs
+    """
+    return _keywords(Document(transcript), max_keywords)
+
 def guess_category(transcript: str) -> str:
     """
     Devine une catégorie principale en fonction des expressions trouvées
     dans le texte, à partir de THEME_LEXICON.
     """
     if not transcript:
-        return "Bien-être général"
-
-    text_norm = _normalize(transcript)
-    scores = {}
-
-    for category, expressions in THEME_LEXICON.items():
-        score = 0
-        for expr in expressions:
-            if expr in text_norm:
-                score += 1
-        if score > 0:
-            scores[category] = score
-
-    if not scores:
-        return "Bien-être général"
+        return DEFAULT_CATEGORY
 
-    # Catégorie avec le plus de "matchs"
-    best_category = max(scores.items(), key=lambda x: x[1])[0]
-    return best_category
+    categories = _rank_categories(Document(transcript))
+    return categories[0]["category"] if categories else DEFAULT_CATEGORY
 
 
 def map_category_to_cover(category: str) -> str:
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Thread
+from typing import Any, ContextManager, Dict, List, Optional
+
+from services import sqlite_store
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTBOX_DB_PATH = Path(os.getenv("OUTBOX_DB_PATH", str(BASE_DIR / "uploads" / "outbox.sqlite")))
+
+# Envois simultanés vers Symfony et fréquence de relève de la file
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+
+# Après OUTBOX_MAX_ATTEMPTS échecs, l'épisode passe en "dead" (à traiter à la main)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "20"))
+OUTBOX_RETRY_BASE = 10.0
+OUTBOX_RETRY_MAX = 3600.0
+
+# Un envoi "sending" non terminé après ce délai (process tué) est repris
+OUTBOX_LEASE_SECONDS = 300.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    episode_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);
+"""
+
+_stop = Event()
+_thread: Optional[Thread] = None
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return sqlite_store.connect(OUTBOX_DB_PATH, _SCHEMA)
+
+
+# ------------------------------------------------------------
+# 1) Mise en file (fin de job, sans attendre Symfony)
+# ------------------------------------------------------------
+
+def make_key(content_hash: str, episode: Dict[str, Any]) -> str:
+    """
+    Clé d'idempotence = contenu audio + contenu publié (contributeur, texte,
+    mots-clés, catégorie…). Le même fichier envoyé par un autre contributeur,
+    ou retraité avec d'autres lexiques, est une nouvelle publication.
+    """
+    raw = json.dumps(episode, sort_keys=True, ensure_ascii=False)
+    return f"{content_hash}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]}"
+
+
+def enqueue(episode: Dict[str, Any], idempotency_key: str, episode_id: Optional[str] = None) -> str:
+    """
+    Enregistre un épisode à publier et rend la main immédiatement.
+    La clé d'idempotence (make_key) empêche les doublons : le même épisode
+    publié deux fois (même audio, même contenu) n'est envoyé qu'une fois.
+    Retourne le statut dans la file.
+    Une clé "transcript_ref" dans `episode` (artefact de transcription) est
+    transmise à publish.build_payload.
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO outbox (idempotency_key, episode_id, payload, status, next_attempt_at, "
+            "created_at, updated_at) VALUES (?, ?, ?, 'pending', ?, ?, ?) "
+            "ON CONFLICT(idempotency_key) DO UPDATE SET "
+            "episode_id = excluded.episode_id, payload = excluded.payload, updated_at = excluded.updated_at "
+            "WHERE status = 'pending'",
+            (idempotency_key, episode_id, json.dumps(episode, ensure_ascii=False), now, now, now),
+        )
+        row = conn.execute("SELECT status FROM outbox WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+    return row[0]
+
+
+# ------------------------------------------------------------
+# 2) Envoi (thread de fond dans le process de l'API)
+# ------------------------------------------------------------
+
+def _claim(limit: int) -> List[tuple]:
+    """
+    Réserve au plus `limit` envois dus (ou abandonnés par un process tué).
+    BEGIN IMMEDIATE : deux process ne peuvent pas réserver la même ligne.
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT id, idempotency_key, payload, attempts FROM outbox "
+            "WHERE (status = 'pending' AND next_attempt_at <= ?) "
+            "OR (status = 'sending' AND lease_until < ?) "
+            "ORDER BY next_attempt_at LIMIT ?",
+            (now, now, limit),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE outbox SET status = 'sending', lease_until = ?, updated_at = ? WHERE id = ?",
+            ((now + OUTBOX_LEASE_SECONDS, now, row[0]) for row in rows),
+        )
+    return rows
+
+
+def _retry_delay(attempts: int) -> float:
+    return random.uniform(0.5, 1.0) * min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** attempts)
+
+
+def _deliver(row: tuple) -> str:
+    # Import ici : pydantic / requests ne sont chargés que si la file sert
+    from models.episode import Episode
+    from services import publish
+
+    outbox_id, key, payload, attempts = row
+    try:
+        episode = json.loads(payload)
+        transcript_ref = episode.pop("transcript_ref", None)
+        result = publish.publish_episode(Episode(**episode), headers={"Idempotency-Key": key},
+                                         transcript_ref=transcript_ref)
+    except Exception as e:
+        # Payload invalide, artefact illisible… : compté comme un échec, sinon
+        # la ligne resterait "sending" (et reprise à chaque bail) indéfiniment
+        result = {"status": "EXCEPTION", "details": f"{type(e).__name__}: {e}"}
+    status = result["status"]
+    now = time.time()
+
+    if status == "SENT":
+        fields = {"status": "sent", "sent_at": now, "last_error": None}
+    elif status == "NOT_CONFIGURED":
+        # Rien n'a été tenté : l'épisode attend que Symfony soit configuré
+        fields = {"status": "pending", "next_attempt_at": now + 60}
+    elif status == "CIRCUIT_OPEN":
+        # Rien n'a été envoyé : nouvel essai à la réouverture, sans compter de tentative
+        fields = {"status": "pending", "next_attempt_at": now + publish.breaker.retry_in()}
+    elif status == "ERROR":
+        # Refus explicite (4xx) : réessayer ne changerait rien
+        fields = {"status": "dead", "last_error": json.dumps(result, ensure_ascii=False)[:2000]}
+    else:
+        attempts += 1
+        fields = {
+            "status": "dead" if attempts >= OUTBOX_MAX_ATTEMPTS else "pending",
+            "attempts": attempts,
+            "next_attempt_at": now + _retry_delay(attempts),
+            "last_error": result.get("details") or status,
+        }
+
+    fields["lease_until"] = None
+    fields["updated_at"] = now
+    with _connect() as conn:
+        conn.execute(
+            f"UPDATE outbox SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+            (*fields.values(), outbox_id),
+        )
+    return fields["status"]
+
+
+def drain_once(executor: ThreadPoolExecutor) -> int:
+    """Envoie les épisodes dus (au plus OUTBOX_CONCURRENCY à la fois)."""
+    rows = _claim(OUTBOX_CONCURRENCY)
+    list(executor.map(_deliver, rows))
+    return len(rows)
+
+
+def _run() -> None:
+    with ThreadPoolExecutor(max_workers=OUTBOX_CONCURRENCY) as executor:
+        while not _stop.is_set():
+            try:
+                if drain_once(executor):
+                    continue
+            except Exception as e:
+                print(f"⚠️ Outbox : {type(e).__name__}: {e}")
+            _stop.wait(OUTBOX_POLL_SECONDS)
+
+
+def start() -> None:
+    """Démarre le thread d'envoi ; les envois en attente avant un redémarrage reprennent."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = Thread(target=_run, name="outbox-drain", daemon=True)
+    _thread.start()
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    """Arrêt : un envoi interrompu reste "sending" et sera repris après le bail."""
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
+
+
+# ------------------------------------------------------------
+# 3) Métriques
+# ------------------------------------------------------------
+
+def stats() -> Dict[str, Any]:
+    """Taille de la file (backlog) et ancienneté du plus vieil épisode en attente."""
+    with _connect() as conn:
+        by_status = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+        oldest = conn.execute(
+            "SELECT MIN(created_at) FROM outbox WHERE status IN ('pending', 'sending')"
+        ).fetchone()[0]
+
+    return {
+        "backlog": by_status.get("pending", 0) + by_status.get("sending", 0),
+        "by_status": by_status,
+        "oldest_pending_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+        "concurrency": OUTBOX_CONCURRENCY,
+        "worker_alive": _thread is not None and _thread.is_alive(),
+    }
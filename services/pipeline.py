@@ -0,0 +1,337 @@
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services import (artifacts, audio, classifier, episodes, jingles, outbox, quality, stage_cache, stt,
+                      nlp, search, vad)
+from models.episode import Episode
+
+# Callback de progression : (étape, avancement entre 0 et 1)
+ProgressCallback = Callable[[str, float], None]
+
+# Callback de transcription partielle : un segment (temps du fichier publié)
+SegmentCallback = Callable[[Dict[str, Any]], None]
+
+# DAG des étapes mémoïsées : étape → étapes dont elle lit le résultat
+# ("raw" = fichier envoyé, identifié par son hash). La clé d'une étape
+# combine le hash des résultats en amont, sa configuration et sa version :
+# une étape ne se relance que si l'une des trois change, et ses
+# successeurs seulement si son résultat change.
+# Enregistrement (save) et publication (outbox) sont idempotents par hash
+# du contenu (audio, et épisode publié pour l'outbox), sans passer par ce cache.
+STAGE_GRAPH: Dict[str, Tuple[str, ...]] = {
+    "analyze": ("raw",),
+    "mix": ("raw",),
+    "vad": ("raw",),
+    "transcribe": ("raw", "vad"),
+    "nlp": ("transcribe",),
+}
+
+# À incrémenter quand le code d'une étape change son résultat
+STAGE_VERSIONS = {
+    "analyze": 1,
+    "mix": 1,
+    "vad": 1,
+    "transcribe": 2,
+    "nlp": 1,
+}
+
+
+class PipelineContext:
+    """
+    État partagé par les étapes d'un épisode : le fichier brut est décodé
+    une seule fois (ffmpeg → float32) puis lu par l'analyse qualité et
+    Whisper. Le fichier final, lui, est assemblé en stream copy.
+    """
+
+    def __init__(self, raw_path: str):
+        self.raw_path = raw_path
+        self._decoded: Optional[audio.DecodedAudio] = None
+        self._levels: Optional[Dict[str, Any]] = None
+        # Hash du résultat de chaque étape terminée (entrée des suivantes)
+        self.output_hashes: Dict[str, str] = {}
+        # Compte rendu : étape → {"cached", "seconds"}
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def decoded(self) -> audio.DecodedAudio:
+        if self._decoded is None:
+            self._decoded = audio.decode(self.raw_path)
+        return self._decoded
+
+    @property
+    def levels(self) -> Dict[str, Any]:
+        """Mesures qualité (dont les niveaux par trame, réutilisés par le VAD)."""
+        if self._levels is None:
+            self._levels = quality.measure(self.decoded.samples, self.decoded.frame_rate,
+                                           with_broadcast=audio.QUALITY_METRICS == "broadcast")
+        return self._levels
+
+    @property
+    def content_hash(self) -> str:
+        return audio.content_hash(self.raw_path)
+
+
+def _noop_progress(stage: str, progress: float) -> None:
+    pass
+
+
+def _run_stage(ctx: PipelineContext, name: str, config: Dict[str, Any],
+               compute: Callable[[], Any], valid: Callable[[Any], bool] = lambda output: True,
+               cacheable: Callable[[Any], bool] = lambda output: True) -> Any:
+    """
+    Exécute une étape du DAG, ou reprend son résultat si les mêmes entrées,
+    la même configuration et la même version ont déjà été traitées (par ce
+    job ou un précédent : un job relancé après une erreur repart de
+    l'étape qui a échoué). `valid` écarte un résultat périmé (fichier supprimé).
+    Un résultat dégradé (`cacheable` faux : Whisper ou modèle en erreur)
+    n'est pas mémorisé : l'étape sera retentée au prochain passage.
+    """
+    if "raw" not in ctx.output_hashes:
+        ctx.output_hashes["raw"] = ctx.content_hash
+
+    inputs = {dep: ctx.output_hashes[dep] for dep in STAGE_GRAPH[name]}
+    key = stage_cache.make_key(name, STAGE_VERSIONS[name], {"inputs": inputs, "config": config})
+
+    started = time.perf_counter()
+    cached = stage_cache.get(key)
+    if cached is not None and valid(cached["output"]):
+        output, output_hash = cached["output"], cached["output_hash"]
+    else:
+        cached = None
+        output = compute()
+        if cacheable(output):
+            output_hash = stage_cache.put(key, name, STAGE_VERSIONS[name], output)
+        else:
+            output_hash = stage_cache.digest(output)
+
+    ctx.output_hashes[name] = output_hash
+    ctx.stages[name] = {"cached": cached is not None, "seconds": round(time.perf_counter() - started, 3)}
+    return output
+
+
+def _store(episode_id: Optional[str], **fields: Any) -> None:
+    """Résultats d'une étape → dépôt d'épisodes (seulement pour un job identifié)."""
+    if episode_id:
+        episodes.update(episode_id, **fields)
+
+
+def _skip_plan(ctx: PipelineContext) -> Dict[str, Any]:
+    """Silences longs à retirer avant Whisper (niveaux déjà calculés par l'analyse)."""
+    return vad.skip_plan(ctx.levels["frame_db"], ctx.levels["frame_ms"], ctx.decoded.duration_seconds)
+
+
+def _transcribe(ctx: PipelineContext, plan: Dict[str, Any],
+                on_segment: Optional[SegmentCallback] = None) -> Dict[str, Any]:
+    """
+    Whisper ne tourne que sur l'épisode brut (buffer partagé). La
+    transcription de l'intro, faite une fois puis servie par le cache, est
+    placée en tête et les segments de l'épisode sont décalés de la durée de
+    l'intro : les temps correspondent au fichier publié.
+    Le texte retourné est celui de l'épisode seul (le générique ne doit pas
+    polluer les mots-clés).
+
+    `on_segment` reçoit chaque segment dès sa sortie de Whisper, déjà ramené
+    aux temps du fichier publié (transcription partielle en direct).
+    `plan` (étape vad, mémoïsée) donne la clé du cache des transcriptions :
+    si Whisper a déjà traité ce contenu, le fichier n'est pas décodé.
+    """
+    emit = on_segment or (lambda seg: None)
+
+    segments = []
+    offset = 0.0
+    intro_error = False
+    intro_duration = jingles.duration(audio.INTRO_PATH)
+    if intro_duration is not None:
+        intro = stt.transcribe_segments(str(audio.INTRO_PATH))
+        segments += [dict(seg, source="intro") for seg in intro["segments"]]
+        intro_error = bool(intro.get("error"))
+        offset = intro_duration
+        for seg in segments:
+            emit(seg)
+
+    # Silences longs retirés avant Whisper, puis temps des segments ramenés
+    # à l'audio d'origine
+    def on_episode_segment(seg: Dict[str, Any]) -> None:
+        remapped = vad.remap_segments([seg], plan)
+        emit(stt.offset_segments([dict(remapped[0], source="episode")], offset)[0])
+
+    episode = stt.transcribe_segments(
+        lambda: vad.compact(ctx.decoded.to_mono_16k(), plan, audio.WHISPER_SAMPLE_RATE),
+        content_hash=f"{ctx.content_hash}:{plan['key']}" if plan["key"] else ctx.content_hash,
+        on_segment=on_episode_segment if on_segment else None,
+    )
+    episode["segments"] = vad.remap_segments(episode["segments"], plan)
+
+    segments += stt.offset_segments(
+        [dict(seg, source="episode") for seg in episode["segments"]], offset
+    )
+
+    return {"text": episode["text"], "segments": segments, "skipped_seconds": plan["skipped_seconds"],
+            "error": intro_error or bool(episode.get("error"))}
+
+
+def build_episode(
+    raw_path: str,
+    contributor_email: str,
+    contributor_name: Optional[str] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    on_segment: Optional[SegmentCallback] = None,
+    episode_id: Optional[str] = None,
+) -> Tuple[Episode, Dict[str, Any]]:
+    """
+    Pipeline complet sur un fichier brut déjà sauvegardé, étapes du DAG
+    STAGE_GRAPH (mémoïsées, voir _run_stage) :
+    - analyze : audio.analyze_episode_audio (qualité)
+    - mix : audio.mix_final_audio (fichier final avec génériques)
+    - vad : silences longs à retirer avant Whisper
+    - transcribe : stt (Whisper)
+    - nlp : nlp.analyze (mots-clés, thèmes) + classifier.classify (catégorie éditoriale)
+    - construit un Episode (brouillon)
+
+    Utilisé par les workers de jobs (API) et par l'interface Streamlit.
+    `on_segment` reçoit la transcription partielle, segment par segment.
+    Avec `episode_id`, chaque étape enregistre ses résultats dans le dépôt
+    d'épisodes dès qu'elle se termine (services.episodes).
+    """
+    report = on_progress or _noop_progress
+    ctx = PipelineContext(raw_path)
+
+    # 1. Qualité (épisode brut) puis audio final (intro + épisode)
+    report("audio", 0.0)
+    audio_info = dict(_run_stage(
+        ctx, "analyze", {"metrics": audio.QUALITY_METRICS},
+        lambda: audio.analyze_episode_audio(raw_path, decoded=ctx.decoded, levels=ctx.levels),
+    ))
+    audio_info["final_path"] = _run_stage(
+        ctx, "mix", {"intro": jingles.source_hash(audio.INTRO_PATH)},
+        lambda: audio.mix_final_audio(raw_path),
+        valid=lambda final_path: Path(final_path).exists(),
+    )
+    _store(episode_id, stage="transcription", duration=audio_info["duration_seconds"],
+           audio_url=audio_info["final_path"], quality_status=audio_info["quality_status"],
+           quality_score=audio_info["quality_score"], quality_details=audio_info.get("quality_details"))
+
+    # 2. Transcription (Whisper) – épisode brut seul, depuis le buffer partagé.
+    #    Cache par contenu : le buffer n'est préparé que si Whisper doit tourner.
+    report("transcription", 0.3)
+    plan = _run_stage(ctx, "vad", vad.fingerprint(), lambda: _skip_plan(ctx))
+    transcription = _run_stage(
+        ctx, "transcribe",
+        {"stt": stt.fingerprint(), "intro": jingles.source_hash(audio.INTRO_PATH)},
+        lambda: _transcribe(ctx, plan, on_segment),
+        cacheable=lambda output: not output.get("error"),
+    )
+    if ctx.stages["transcribe"]["cached"] and on_segment:
+        # Résultat repris du cache : la transcription "en direct" arrive d'un coup
+        for seg in transcription["segments"]:
+            on_segment(seg)
+    transcript = transcription["text"]
+    audio_info["transcript_segments"] = transcription["segments"]
+    audio_info["stt_skipped_seconds"] = transcription["skipped_seconds"]
+    audio_info["transcription_error"] = bool(transcription.get("error"))
+    _store(episode_id, stage="nlp", transcript=transcript)
+
+    # 3. NLP : mots-clés, catégorie, pochette. Seule étape relancée quand
+    #    les lexiques ou le classifieur changent.
+    report("nlp", 0.9)
+
+    def analyze_text() -> Dict[str, Any]:
+        # Une seule normalisation et un seul passage des lexiques ; l'épisode
+        # rejoint l'index du corpus (classement BM25 des mots-clés suivants)
+        analysis = nlp.analyze(transcript, doc_id=ctx.content_hash)
+        # Catégorie éditoriale (embeddings, repli sur le lexique)
+        classification = classifier.classify(transcript, themes=analysis["categories"])
+        return {"analysis": analysis, "classification": classification}
+
+    text_analysis = _run_stage(
+        ctx, "nlp", {"nlp": nlp.fingerprint(), "classifier": classifier.fingerprint()}, analyze_text,
+        # Modèle d'embeddings indisponible : repli sur le lexique, non mémorisé
+        cacheable=lambda output: not output["classification"].get("error"),
+    )
+    analysis = text_analysis["analysis"]
+    classification = text_analysis["classification"]
+    audio_info["category_scores"] = analysis["categories"]
+    audio_info["classification"] = classification
+    category = classification["category"]
+    _store(episode_id, keywords=analysis["keywords"], category=category,
+           cover_image=nlp.map_category_to_cover(category), classification=classification)
+
+    # 4. Épisode (brouillon)
+    title = "Titre provisoire"
+    if contributor_name:
+        title = f"{title} - {contributor_name}"
+
+    episode = Episode(
+        title=title,
+        audio_url=audio_info["final_path"],
+        duration=audio_info["duration_seconds"],
+        transcript=transcript,
+        keywords=analysis["keywords"],
+        category=category,
+        cover_image=nlp.map_category_to_cover(category),
+        contributor_email=contributor_email,
+        quality_status=audio_info["quality_status"],
+        quality_score=audio_info["quality_score"],
+        status="draft",
+    )
+    _store(episode_id, stage="done", status=episode.status, title=episode.title,
+           contributor_name=contributor_name)
+    audio_info["stages"] = ctx.stages
+
+    report("done", 1.0)
+    return episode, audio_info
+
+
+def process_upload(raw_path: str, contributor_email: str,
+                   on_progress: Optional[ProgressCallback] = None,
+                   on_segment: Optional[SegmentCallback] = None,
+                   episode_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Exécute le pipeline et retourne le résultat au format de la réponse /upload.
+    Avec `episode_id` (id du job), l'épisode est enregistré dans le dépôt
+    d'épisodes au fil des étapes, ajouté à l'index de recherche et mis en
+    file de publication (outbox, envoyé à Symfony en arrière-plan).
+    En mode TRANSCRIPT_MODE=artifact, la transcription et ses segments sont
+    écrits dans un artefact compressé ; l'aperçu et le payload n'en portent
+    que la référence (transcript_ref).
+    """
+    content_hash = audio.content_hash(raw_path)
+    if episode_id:
+        episodes.create(episode_id, contributor_email, content_hash=content_hash)
+
+    episode, audio_info = build_episode(raw_path, contributor_email, on_progress=on_progress,
+                                        on_segment=on_segment, episode_id=episode_id)
+
+    preview = episode.dict()
+    queued = episode.dict()
+    if not artifacts.inline_transcript():
+        transcript_ref = artifacts.put_transcript(episode.transcript, audio_info["transcript_segments"])
+        del preview["transcript"]
+        preview["transcript_ref"] = queued["transcript_ref"] = transcript_ref
+        _store(episode_id, transcript_ref=transcript_ref)
+
+    publication = "NOT_SENT"
+    if episode_id and audio_info["transcription_error"]:
+        # Texte de remplacement : ni indexé ni publié ; le job échoue et sa
+        # relance reprend à la transcription (étapes audio en cache)
+        raise RuntimeError("Transcription impossible, épisode non publié")
+    if episode_id:
+        search.index_episode(episode_id, episode.dict(), audio_info["transcript_segments"],
+                             content_hash=content_hash)
+        # Clé d'idempotence = audio + contenu publié : un ré-upload identique
+        # ne crée pas de doublon, un contenu différent est republié
+        publication = outbox.enqueue(queued, idempotency_key=outbox.make_key(content_hash, queued),
+                                     episode_id=episode_id).upper()
+
+    return {
+        "steps": {
+            "audio": "OK",
+            "transcription": "OK",
+            "nlp": "OK",
+            "publication": publication
+        },
+        # Étapes du DAG recalculées ou reprises du cache
+        "stages": audio_info["stages"],
+        "episode_preview": preview
+    }
@@ -1,6 +1,11 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import os
+import random
+import time
+from threading import Lock
+
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from models.episode import Episode
 
@@ -9,14 +14,39 @@ load_dotenv()
 
 SYMFONY_API_URL = os.getenv("SYMFONY_API_URL")
 SYMFONY_API_TOKEN = os.getenv("SYMFONY_API_TOKEN")
+# Endpoint d'envoi groupé (N épisodes par requête) ; vide = un appel par épisode
+SYMFONY_BULK_URL = os.getenv("SYMFONY_BULK_URL")
+
+# Délais (connexion, lecture) en secondes
+PUBLISH_CONNECT_TIMEOUT = float(os.getenv("PUBLISH_CONNECT_TIMEOUT", "3"))
+PUBLISH_READ_TIMEOUT = float(os.getenv("PUBLISH_READ_TIMEOUT", "10"))
+
+# Nouvelles tentatives : backoff exponentiel avec jitter ("full jitter")
+PUBLISH_MAX_RETRIES = int(os.getenv("PUBLISH_MAX_RETRIES", "4"))
+PUBLISH_BACKOFF_BASE = float(os.getenv("PUBLISH_BACKOFF_BASE", "0.5"))
+PUBLISH_BACKOFF_MAX = float(os.getenv("PUBLISH_BACKOFF_MAX", "30"))
+
+# Disjoncteur : ouvert après N échecs consécutifs, nouvel essai après X secondes
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("PUBLISH_CIRCUIT_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("PUBLISH_CIRCUIT_RESET", "30"))
+
+# Taille des lots en mode groupé et des pools de connexions
+PUBLISH_BULK_SIZE = int(os.getenv("PUBLISH_BULK_SIZE", "50"))
+PUBLISH_POOL_SIZE = int(os.getenv("PUBLISH_POOL_SIZE", "10"))
 
+# Codes HTTP pour lesquels une nouvelle tentative a un sens
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
 
-def build_payload(episode: Episode) -> Dict[str, Any]:
+
+def build_payload(episode: Episode, transcript_ref: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Transforme notre modèle Episode en payload pour l'API Symfony.
     À ADAPTER en fonction des champs attendus côté Symfony.
+
+    Avec `transcript_ref` (artifacts.put_transcript), la transcription n'est
+    pas incluse : Symfony la télécharge à part (transcriptRef.url).
     """
-    return {
+    payload = {
         "title": episode.title,
         "audioUrl": episode.audio_url,
         "duration": episode.duration,
@@ -29,14 +59,152 @@ def build_payload(episode: Episode) -> Dict[str, Any]:
         "qualityScore": episode.quality_score,
         "status": episode.status,  # ex: "draft" ou "ready_for_review"
     }
+    if transcript_ref is not None:
+        del payload["transcript"]
+        payload["transcriptRef"] = transcript_ref
+    return payload
+
+
+# ------------------------------------------------------------
+# 1) Session HTTP partagée et disjoncteur
+# ------------------------------------------------------------
 
+_session: Optional[requests.Session] = None
+_session_lock = Lock()
+
+
+def _get_session() -> requests.Session:
+    """
+    Session unique par process : connexions TCP/TLS réutilisées (keep-alive)
+    au lieu d'une nouvelle poignée de main par épisode.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=PUBLISH_POOL_SIZE, pool_maxsize=PUBLISH_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["Content-Type"] = "application/json"
+            # Si un token d'API est disponible, on l'ajoute (à adapter selon Symfony : Bearer, X-API-KEY, etc.)
+            if SYMFONY_API_TOKEN:
+                session.headers["Authorization"] = f"Bearer {SYMFONY_API_TOKEN}"
+            _session = session
+        return _session
+
+
+class CircuitBreaker:
+    """
+    Coupe les appels quand Symfony est en panne : après `threshold` échecs
+    consécutifs, le circuit est ouvert et les appels échouent immédiatement
+    pendant `reset_seconds`. Ensuite un seul appel d'essai passe
+    ("half_open") : succès → fermé, échec → ouvert à nouveau.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def retry_in(self) -> float:
+        """Secondes avant le prochain appel d'essai (0 si le circuit est fermé)."""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+
+breaker = CircuitBreaker()
+
+
+def _backoff(attempt: int, response: Optional[requests.Response] = None) -> float:
+    """Délai avant la tentative suivante : Retry-After si fourni, sinon full jitter."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), PUBLISH_BACKOFF_MAX)
+    return random.uniform(0, min(PUBLISH_BACKOFF_MAX, PUBLISH_BACKOFF_BASE * 2 ** attempt))
+
+
+def _post(url: str, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    POST avec nouvelles tentatives (erreurs réseau, 5xx, 429) et disjoncteur.
+    Les erreurs 4xx ne sont pas retentées : la requête elle-même est en cause.
+    """
+    session = _get_session()
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            return {
+                "status": "CIRCUIT_OPEN",
+                "details": f"Symfony indisponible, nouvel essai dans {breaker.retry_in():.0f} s",
+                "attempts": attempt,
+            }
 
-def publish_episode(episode: Episode) -> Dict[str, Any]:
+        response = None
+        try:
+            response = session.post(url, json=body, headers=headers,
+                                    timeout=(PUBLISH_CONNECT_TIMEOUT, PUBLISH_READ_TIMEOUT))
+        except requests.RequestException as e:
+            error = f"Erreur lors de l'appel à Symfony : {e}"
+        else:
+            if 200 <= response.status_code < 300:
+                breaker.record_success()
+                return {"status": "SENT", "http_status": response.status_code,
+                        "response": safe_json(response), "attempts": attempt + 1}
+            if response.status_code not in RETRYABLE_STATUS:
+                # Symfony répond : le service est sain, c'est la requête qui est refusée
+                breaker.record_success()
+                return {"status": "ERROR", "http_status": response.status_code,
+                        "response": safe_json(response), "attempts": attempt + 1}
+            error = f"HTTP {response.status_code}"
+
+        breaker.record_failure()
+        attempt += 1
+        if attempt > PUBLISH_MAX_RETRIES:
+            return {"status": "FAILED", "details": error, "attempts": attempt,
+                    **({"http_status": response.status_code} if response is not None else {})}
+        time.sleep(_backoff(attempt - 1, response))
+
+
+# ------------------------------------------------------------
+# 2) Publication
+# ------------------------------------------------------------
+
+def publish_episode(episode: Episode, headers: Optional[Dict[str, str]] = None,
+                    transcript_ref: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Envoie l'épisode vers le back-office Symfony.
     Retourne un dict avec un statut et des détails.
 
     Le but : ne JAMAIS faire planter l'API même si Symfony ne répond pas.
+    Statuts : SENT, ERROR (refus 4xx), FAILED (après les nouvelles
+    tentatives), CIRCUIT_OPEN (Symfony en panne, rien envoyé), NOT_CONFIGURED.
     """
 
     # Si l'URL Symfony n'est pas configurée, on ne tente rien
@@ -46,32 +214,8 @@ def publish_episode(episode: Episode) -> Dict[str, Any]:
             "details": "SYMFONY_API_URL non définie dans le fichier .env. Publication non envoyée."
         }
 
-    payload = build_payload(episode)
-
-    headers = {
-        "Content-Type": "application/json",
-    }
-
-    # Si un token d'API est disponible, on l'ajoute (à adapter selon Symfony : Bearer, X-API-KEY, etc.)
-    if SYMFONY_API_TOKEN:
-        headers["Authorization"] = f"Bearer {SYMFONY_API_TOKEN}"
-
     try:
-        response = requests.post(SYMFONY_API_URL, json=payload, headers=headers, timeout=10)
-
-        if 200 <= response.status_code < 300:
-            return {
-                "status": "SENT",
-                "http_status": response.status_code,
-                "response": safe_json(response)
-            }
-        else:
-            return {
-                "status": "ERROR",
-                "http_status": response.status_code,
-                "response": safe_json(response)
-            }
-
+        return _post(SYMFONY_API_URL, build_payload(episode, transcript_ref), headers)
     except Exception as e:
         # Pour le hackathon : on loggue l'erreur mais on ne casse rien
         return {
@@ -80,6 +224,27 @@ def publish_episode(episode: Episode) -> Dict[str, Any]:
         }
 
 
+def publish_bulk(episodes: List[Episode], batch_size: int = PUBLISH_BULK_SIZE) -> List[Dict[str, Any]]:
+    """
+    Publie plusieurs épisodes (ex. republication du catalogue).
+    Avec SYMFONY_BULK_URL : `batch_size` épisodes par requête
+    ({"episodes": [...]}), chaque épisode d'un lot reçoit le statut du lot.
+    Sinon : un appel par épisode, sur la même session.
+    """
+    if not SYMFONY_BULK_URL:
+        return [publish_episode(episode) for episode in episodes]
+
+    results: List[Dict[str, Any]] = []
+    for i in range(0, len(episodes), batch_size):
+        batch = episodes[i:i + batch_size]
+        try:
+            result = _post(SYMFONY_BULK_URL, {"episodes": [build_payload(e) for e in batch]})
+        except Exception as e:
+            result = {"status": "FAILED", "details": f"Erreur lors de l'appel à Symfony : {e}"}
+        results.extend(dict(result, batch=i // batch_size) for _ in batch)
+    return results
+
+
 def safe_json(response: requests.Response) -> Any:
     """
     Essaie de décoder le JSON de réponse, sinon renvoie le texte brut.
@@ -0,0 +1,472 @@
+from math import pi, tan
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Plancher en dB pour le silence numérique (évite -inf dans le JSON)
+DB_FLOOR = -120.0
+
+# Fenêtre d'analyse du bruit de fond et part des trames les plus calmes
+NOISE_FRAME_MS = 200
+NOISE_QUIET_RATIO = 0.2
+
+# EBU R128 / ITU-R BS.1770 : blocs de 400 ms, recouvrement 75 %
+LUFS_BLOCK_S = 0.4
+LUFS_STEP_S = 0.1
+LUFS_ABSOLUTE_GATE = -70.0
+LUFS_RELATIVE_GATE = -10.0
+LUFS_CHUNK_STEPS = 100  # filtrage K par tranches de 10 s
+
+# True peak : sur-échantillonnage x4 (BS.1770 annexe 2) autour des crêtes
+TRUE_PEAK_OVERSAMPLING = 4
+TRUE_PEAK_SEARCH_DB = 6.0
+TRUE_PEAK_MAX_FRAMES = 64
+# Contexte ajouté de chaque côté d'une fenêtre sur-échantillonnée
+TRUE_PEAK_PAD = 64
+
+
+def _to_db(values: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return np.maximum(20 * np.log10(values), DB_FLOOR)
+
+
+def _power_to_db(power: float) -> float:
+    if power <= 0:
+        return DB_FLOOR
+    return max(10 * float(np.log10(power)), DB_FLOOR)
+
+
+# ------------------------------------------------------------
+# 1) Statistiques par trame : énergie et crête en un seul passage
+# ------------------------------------------------------------
+
+def frame_stats(samples: np.ndarray, frame_len: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Découpe le buffer (frames × canaux) en trames de `frame_len` échantillons
+    par un simple reshape (sans copie) et retourne pour chaque trame :
+    somme des carrés, nombre d'échantillons et crête absolue.
+    La dernière trame peut être partielle.
+    """
+    n_full = len(samples) // frame_len
+    full = samples[:n_full * frame_len].reshape(n_full, -1)
+
+    # Accumulation float32 (SIMD) : largement assez précis pour des trames de 200 ms
+    energy = np.einsum("ij,ij->i", full, full).astype(np.float64)
+    counts = np.full(n_full, full.shape[1], dtype=np.float64)
+    peaks = np.maximum(full.max(axis=1, initial=0.0), -full.min(axis=1, initial=0.0))
+
+    rest = samples[n_full * frame_len:].ravel()
+    if rest.size:
+        energy = np.append(energy, np.dot(rest.astype(np.float64), rest))
+        counts = np.append(counts, rest.size)
+        peaks = np.append(peaks, np.abs(rest).max())
+
+    return energy, counts, peaks
+
+
+def frame_dbfs(samples: np.ndarray, sample_rate: int,
+               frame_ms: int = NOISE_FRAME_MS) -> np.ndarray:
+    """Niveau RMS (dBFS) de chaque trame de `frame_ms`, tous canaux confondus."""
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    energy, counts, _ = frame_stats(samples, frame_len)
+    return _to_db(np.sqrt(energy / counts))
+
+
+def noise_floor(frame_db: np.ndarray, quiet_ratio: float = NOISE_QUIET_RATIO) -> float:
+    """Moyenne des trames les plus calmes (sélection partielle, sans tri complet)."""
+    if frame_db.size == 0:
+        return DB_FLOOR
+    k = max(1, int(frame_db.size * quiet_ratio))
+    return float(np.partition(frame_db, k - 1)[:k].mean())
+
+
+def rms_dbfs(samples: np.ndarray) -> float:
+    if samples.size == 0:
+        return DB_FLOOR
+    flat = samples.ravel()
+    return _power_to_db(float(np.dot(flat, flat)) / flat.size)
+
+
+def peak_dbfs(samples: np.ndarray) -> float:
+    if samples.size == 0:
+        return DB_FLOOR
+    return float(_to_db(max(samples.max(), -samples.min())))
+
+
+# ------------------------------------------------------------
+# 2) True peak (dBTP)
+# ------------------------------------------------------------
+
+def window_true_peak(samples: np.ndarray, start: int, end: int,
+                     at_file_start: bool = True, at_file_end: bool = True) -> float:
+    """
+    Crête vraie (linéaire) de samples[start:end], sur-échantillonnée x4 avec
+    TRUE_PEAK_PAD échantillons de contexte de chaque côté. La sortie qui
+    correspond au contexte est écartée : le filtre y « sonne » contre le
+    bord coupé et surestime la crête (+0.5 dB sur un sinus pleine échelle).
+    Seuls les vrais bords du fichier (`at_file_start`, `at_file_end`) sont gardés.
+    """
+    from scipy.signal import resample_poly
+
+    lo = max(0, start - TRUE_PEAK_PAD)
+    hi = min(len(samples), end + TRUE_PEAK_PAD)
+    up = resample_poly(samples[lo:hi], TRUE_PEAK_OVERSAMPLING, 1, axis=0)
+
+    trim = TRUE_PEAK_PAD * TRUE_PEAK_OVERSAMPLING
+    head = 0 if lo == 0 and at_file_start else trim
+    tail = 0 if hi == len(samples) and at_file_end else trim
+    up = up[head:len(up) - tail]
+    return float(np.abs(up).max()) if up.size else 0.0
+
+
+def true_peak_dbtp(samples: np.ndarray, sample_rate: int,
+                   frame_peaks: Optional[np.ndarray] = None,
+                   frame_len: Optional[int] = None) -> float:
+    """
+    Crête vraie : sur-échantillonnage x4 (BS.1770 annexe 2).
+
+    Une crête inter-échantillons ne dépasse la crête échantillonnée que de
+    quelques dB : on ne sur-échantillonne donc que les TRUE_PEAK_MAX_FRAMES
+    trames les plus fortes (à moins de TRUE_PEAK_SEARCH_DB du maximum),
+    au lieu de tout le fichier.
+    """
+    if samples.size == 0:
+        return DB_FLOOR
+
+    # Au-delà de 176 kHz le sur-échantillonnage n'apporte plus rien
+    if sample_rate >= 176400:
+        return peak_dbfs(samples)
+
+    if frame_peaks is None or frame_len is None:
+        frame_len = max(1, sample_rate // 10)
+        _, _, frame_peaks = frame_stats(samples, frame_len)
+
+    threshold = frame_peaks.max() * 10 ** (-TRUE_PEAK_SEARCH_DB / 20)
+    candidates = np.flatnonzero(frame_peaks >= threshold)
+    if candidates.size > TRUE_PEAK_MAX_FRAMES:
+        loudest = np.argpartition(frame_peaks[candidates], -TRUE_PEAK_MAX_FRAMES)
+        candidates = candidates[loudest[-TRUE_PEAK_MAX_FRAMES:]]
+
+    peak = float(frame_peaks.max())
+    for idx in candidates:
+        peak = max(peak, window_true_peak(samples, idx * frame_len, (idx + 1) * frame_len))
+
+    return float(_to_db(peak))
+
+
+# ------------------------------------------------------------
+# 3) Loudness intégrée (LUFS, EBU R128)
+# ------------------------------------------------------------
+
+def k_weighting(sample_rate: int) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+    """
+    Coefficients des deux biquads de pondération K (BS.1770),
+    recalculés pour n'importe quelle fréquence d'échantillonnage.
+    """
+    # Étage 1 : shelf haut (effet de tête)
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = tan(pi * f0 / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = np.array([(vh + vb * k / q + k * k) / a0,
+                        2 * (k * k - vh) / a0,
+                        (vh - vb * k / q + k * k) / a0])
+    shelf_a = np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+
+    # Étage 2 : passe-haut RLB
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = tan(pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    hp_b = np.array([1.0, -2.0, 1.0])
+    hp_a = np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+
+    return (shelf_b, shelf_a), (hp_b, hp_a)
+
+
+def gated_loudness(block_powers: np.ndarray) -> float:
+    """
+    Double portillonnage BS.1770 sur les puissances moyennes (déjà sommées
+    sur les canaux) des blocs de 400 ms.
+    """
+    if block_powers.size == 0:
+        return DB_FLOOR
+
+    with np.errstate(divide="ignore"):
+        block_lufs = -0.691 + 10 * np.log10(block_powers)
+
+    gated = block_powers[block_lufs > LUFS_ABSOLUTE_GATE]
+    if gated.size == 0:
+        return DB_FLOOR
+
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + LUFS_RELATIVE_GATE
+    with np.errstate(divide="ignore"):
+        gated_lufs = -0.691 + 10 * np.log10(gated)
+    gated = gated[gated_lufs > relative_gate]
+    if gated.size == 0:
+        return DB_FLOOR
+
+    return max(-0.691 + 10 * float(np.log10(gated.mean())), DB_FLOOR)
+
+
+def k_weighting_filter(sample_rate: int) -> np.ndarray:
+    """
+    Les deux biquads en sections du second ordre (format sos de scipy),
+    en float64 : fusionnés en un filtre d'ordre 4 ou calculés en float32,
+    les pôles proches de 1 (passe-haut à 38 Hz) rendent le filtre instable
+    aux fréquences d'échantillonnage élevées.
+    """
+    (b1, a1), (b2, a2) = k_weighting(sample_rate)
+    return np.array([np.concatenate((b1, a1)), np.concatenate((b2, a2))], dtype=np.float64)
+
+
+def block_powers_from_steps(step_energy: np.ndarray, step_len: int) -> np.ndarray:
+    """
+    Puissance moyenne des blocs de 400 ms (4 pas de 100 ms consécutifs),
+    à partir de l'énergie pondérée K de chaque pas.
+    """
+    steps_per_block = int(round(LUFS_BLOCK_S / LUFS_STEP_S))
+    if step_energy.size < steps_per_block:
+        return np.empty(0)
+    window = np.lib.stride_tricks.sliding_window_view(step_energy, steps_per_block)
+    return window.sum(axis=1) / (steps_per_block * step_len)
+
+
+def integrated_lufs(samples: np.ndarray, sample_rate: int) -> float:
+    """Loudness intégrée EBU R128 (canaux pondérés à 1.0, stéréo/mono)."""
+    from scipy.signal import sosfilt
+
+    step_len = int(round(LUFS_STEP_S * sample_rate))
+    if len(samples) < 4 * step_len:
+        return DB_FLOOR
+
+    # Les deux sections en cascade (float64), par tranches de LUFS_CHUNK_STEPS
+    # pas : la sortie filtrée reste petite et contiguë (canal par canal)
+    sos = k_weighting_filter(sample_rate)
+    zi = np.zeros((len(sos), samples.shape[1], 2))
+    n_steps = len(samples) // step_len
+    step_energy = np.empty(n_steps)
+    for lo in range(0, n_steps, LUFS_CHUNK_STEPS):
+        hi = min(n_steps, lo + LUFS_CHUNK_STEPS)
+        weighted, zi = sosfilt(sos, samples[lo * step_len:hi * step_len].T, axis=-1, zi=zi)
+        steps = weighted.reshape(len(weighted), hi - lo, step_len)
+        step_energy[lo:hi] = np.einsum("cij,cij->i", steps, steps)
+
+    return gated_loudness(block_powers_from_steps(step_energy, step_len))
+
+
+# ------------------------------------------------------------
+# 4) Mesure complète en mémoire
+# ------------------------------------------------------------
+
+def measure(samples: np.ndarray, sample_rate: int, with_broadcast: bool = True) -> Dict[str, Any]:
+    """
+    Toutes les mesures qualité sur un buffer float32 (frames × canaux).
+    Un seul passage sur le buffer pour RMS, crête et bruit de fond ;
+    `with_broadcast` ajoute true peak et LUFS (EBU R128).
+    `frame_db` est renvoyé pour être réutilisé (ex. détection des silences).
+    """
+    frame_len = max(1, int(sample_rate * NOISE_FRAME_MS / 1000))
+    energy, counts, peaks = frame_stats(samples, frame_len)
+    frame_db = _to_db(np.sqrt(energy / counts))
+
+    total = float(counts.sum())
+    levels = {
+        "duration": len(samples) / sample_rate,
+        "loudness_dbfs": _power_to_db(float(energy.sum()) / total) if total else DB_FLOOR,
+        "peak_dbfs": float(_to_db(peaks.max())) if peaks.size else DB_FLOOR,
+        "noise_floor_dbfs": noise_floor(frame_db),
+        "true_peak_dbtp": None,
+        "loudness_lufs": None,
+        "frame_db": frame_db,
+        "frame_ms": NOISE_FRAME_MS,
+    }
+
+    if with_broadcast:
+        levels["true_peak_dbtp"] = true_peak_dbtp(samples, sample_rate, peaks, frame_len)
+        levels["loudness_lufs"] = integrated_lufs(samples, sample_rate)
+
+    return levels
+
+
+# ------------------------------------------------------------
+# 5) Mesure en streaming (mémoire constante, fichiers très longs)
+# ------------------------------------------------------------
+
+# Histogrammes à pas fixe : la mémoire ne dépend pas de la durée
+NOISE_HIST_MIN, NOISE_HIST_MAX, NOISE_HIST_STEP = DB_FLOOR, 10.0, 0.05
+LUFS_HIST_MIN, LUFS_HIST_MAX, LUFS_HIST_STEP = LUFS_ABSOLUTE_GATE, 10.0, 0.1
+
+
+def _hist_index(values: np.ndarray, lo: float, hi: float, step: float) -> np.ndarray:
+    n_bins = int(round((hi - lo) / step))
+    return np.clip(((values - lo) / step).astype(np.int64), 0, n_bins - 1)
+
+
+class StreamingAnalyzer:
+    """
+    Mêmes mesures que `measure`, mais alimentées bloc par bloc.
+
+    On ne garde que des accumulateurs : énergie totale, crête, histogramme des
+    niveaux de trames (bruit de fond), histogramme des blocs de loudness
+    (portillonnage EBU R128) et l'état du filtre K entre deux blocs.
+    """
+
+    def __init__(self, sample_rate: int, channels: int, with_broadcast: bool = True):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.with_broadcast = with_broadcast
+        self.frame_len = max(1, int(sample_rate * NOISE_FRAME_MS / 1000))
+        self.step_len = int(round(LUFS_STEP_S * sample_rate))
+
+        self.n_samples = 0
+        self.energy = 0.0
+        self.peak = 0.0
+        self.true_peak = 0.0
+
+        n_noise = int(round((NOISE_HIST_MAX - NOISE_HIST_MIN) / NOISE_HIST_STEP))
+        self._noise_count = np.zeros(n_noise)
+        self._noise_db_sum = np.zeros(n_noise)
+        self._frame_carry = np.empty((0, channels), dtype=np.float32)
+        # Derniers échantillons lus : contexte du sur-échantillonnage (true peak)
+        self._tp_context = np.empty((0, channels), dtype=np.float32)
+
+        n_lufs = int(round((LUFS_HIST_MAX - LUFS_HIST_MIN) / LUFS_HIST_STEP))
+        self._lufs_count = np.zeros(n_lufs)
+        self._lufs_power = np.zeros(n_lufs)
+        # État du filtre K : (sections, 2, canaux), en float64 comme integrated_lufs
+        self._sos = k_weighting_filter(sample_rate)
+        self._zi = np.zeros((len(self._sos), 2, channels))
+        self._step_carry = np.empty((0, channels))
+        self._last_steps = np.empty(0)
+
+    # --- trames de 200 ms : RMS, crête, bruit de fond ---
+
+    def _add_frames(self, energy: np.ndarray, counts: np.ndarray) -> None:
+        frame_db = _to_db(np.sqrt(energy / counts))
+        idx = _hist_index(frame_db, NOISE_HIST_MIN, NOISE_HIST_MAX, NOISE_HIST_STEP)
+        np.add.at(self._noise_count, idx, 1)
+        np.add.at(self._noise_db_sum, idx, frame_db)
+
+    # --- pondération K, pas de 100 ms, blocs de 400 ms ---
+
+    def _add_loudness(self, block: np.ndarray) -> None:
+        from scipy.signal import sosfilt
+
+        weighted, self._zi = sosfilt(self._sos, block, axis=0, zi=self._zi)
+        pending = np.concatenate((self._step_carry, weighted))
+
+        n_steps = len(pending) // self.step_len
+        steps = pending[:n_steps * self.step_len].reshape(n_steps, -1)
+        self._step_carry = pending[n_steps * self.step_len:]
+        if not n_steps:
+            return
+
+        # On garde les 3 derniers pas pour former les blocs à cheval sur deux lectures
+        step_energy = np.concatenate((self._last_steps, np.einsum("ij,ij->i", steps, steps)))
+        powers = block_powers_from_steps(step_energy, self.step_len)
+        self._last_steps = step_energy[-3:]
+
+        with np.errstate(divide="ignore"):
+            lufs = -0.691 + 10 * np.log10(powers)
+        keep = lufs > LUFS_ABSOLUTE_GATE
+        idx = _hist_index(lufs[keep], LUFS_HIST_MIN, LUFS_HIST_MAX, LUFS_HIST_STEP)
+        np.add.at(self._lufs_count, idx, 1)
+        np.add.at(self._lufs_power, idx, powers[keep])
+
+    def _add_true_peak(self, pending: np.ndarray, n_frames: int, peaks: np.ndarray) -> None:
+        """
+        Sur-échantillonne la trame la plus forte du bloc si elle peut battre le
+        record. `pending` = trames complètes suivies du reste non encore
+        découpé ; le contexte de gauche vient de la lecture précédente.
+        """
+        if peaks.size == 0 or self.sample_rate >= 176400:
+            self.true_peak = max(self.true_peak, self.peak)
+            return
+
+        best = int(np.argmax(peaks))
+        if peaks[best] >= max(self.true_peak, self.peak) * 10 ** (-TRUE_PEAK_SEARCH_DB / 20):
+            offset = len(self._tp_context)
+            window = np.concatenate((self._tp_context, pending)) if offset else pending
+            start = offset + best * self.frame_len
+            peak = window_true_peak(window, start, start + self.frame_len,
+                                    at_file_start=offset == 0,
+                                    at_file_end=False)
+            self.true_peak = max(self.true_peak, peak, float(peaks[best]))
+
+        end = n_frames * self.frame_len
+        self._tp_context = pending[max(0, end - TRUE_PEAK_PAD):end].copy()
+
+    def update(self, block: np.ndarray) -> None:
+        """Ajoute un bloc (frames × canaux) float32."""
+        if block.size == 0:
+            return
+        self.n_samples += len(block)
+
+        pending = np.concatenate((self._frame_carry, block)) if len(self._frame_carry) else block
+        n_full = len(pending) // self.frame_len
+        frames = pending[:n_full * self.frame_len]
+        self._frame_carry = pending[n_full * self.frame_len:].copy()
+
+        if n_full:
+            energy, counts, peaks = frame_stats(frames, self.frame_len)
+            self.energy += float(energy.sum())
+            self.peak = max(self.peak, float(peaks.max()))
+            self._add_frames(energy, counts)
+            if self.with_broadcast:
+                self._add_true_peak(pending, n_full, peaks)
+
+        if self.with_broadcast:
+            self._add_loudness(block)
+
+    def _noise_floor(self) -> float:
+        total = self._noise_count.sum()
+        if total == 0:
+            return DB_FLOOR
+
+        # Moyenne des `k` trames les plus calmes, en parcourant l'histogramme
+        k = max(1, int(total * NOISE_QUIET_RATIO))
+        taken, db_sum = 0.0, 0.0
+        for count, s in zip(self._noise_count, self._noise_db_sum):
+            if count == 0:
+                continue
+            use = min(count, k - taken)
+            db_sum += s * (use / count)
+            taken += use
+            if taken >= k:
+                break
+        return db_sum / taken
+
+    def _loudness(self) -> float:
+        count = self._lufs_count.sum()
+        if count == 0:
+            return DB_FLOOR
+
+        relative_gate = -0.691 + 10 * np.log10(self._lufs_power.sum() / count) + LUFS_RELATIVE_GATE
+        centers = LUFS_HIST_MIN + (np.arange(self._lufs_count.size) + 0.5) * LUFS_HIST_STEP
+        keep = centers > relative_gate
+        if self._lufs_count[keep].sum() == 0:
+            return DB_FLOOR
+        return max(-0.691 + 10 * float(np.log10(self._lufs_power[keep].sum() / self._lufs_count[keep].sum())),
+                   DB_FLOOR)
+
+    def result(self) -> Dict[str, Any]:
+        """Termine la dernière trame (partielle) et retourne les mesures."""
+        if len(self._frame_carry):
+            energy, counts, peaks = frame_stats(self._frame_carry, len(self._frame_carry))
+            self.energy += float(energy.sum())
+            self.peak = max(self.peak, float(peaks.max()))
+            self._add_frames(energy, counts)
+            self._frame_carry = self._frame_carry[:0]
+
+        total = self.n_samples * self.channels
+        return {
+            "duration": self.n_samples / self.sample_rate,
+            "loudness_dbfs": _power_to_db(self.energy / total) if total else DB_FLOOR,
+            "peak_dbfs": float(_to_db(self.peak)) if total else DB_FLOOR,
+            "noise_floor_dbfs": self._noise_floor(),
+            "true_peak_dbtp": float(_to_db(max(self.true_peak, self.peak))) if self.with_broadcast else None,
+            "loudness_lufs": self._loudness() if self.with_broadcast else None,
+            "frame_db": None,
+            "frame_ms": NOISE_FRAME_MS,
+        }
@@ -0,0 +1,183 @@
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List, Optional
+
+from services import sqlite_store
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+SEARCH_DB_PATH = Path(os.getenv("SEARCH_DB_PATH", str(BASE_DIR / "uploads" / "cache" / "search.sqlite")))
+
+# Extraits renvoyés par épisode et taille d'un extrait (en mots)
+SEARCH_HITS_PER_EPISODE = 5
+SNIPPET_WORDS = 12
+
+# Index plein texte SQLite FTS5 :
+# - episodes_fts : transcription complète, pour classer les épisodes (BM25)
+# - segments_fts : segments Whisper, pour les extraits horodatés. Les segments
+#   d'un épisode ont des rowid contigus (first_segment..last_segment) : la
+#   recherche des extraits d'un épisode est une plage de rowid, pas un scan.
+# Accents ignorés ("sante" trouve "santé").
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    episode_id TEXT NOT NULL UNIQUE,
+    content_hash TEXT,
+    title TEXT,
+    category TEXT,
+    audio_url TEXT,
+    duration REAL,
+    first_segment INTEGER,
+    last_segment INTEGER,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_episodes_content_hash ON episodes(content_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS episodes_fts USING fts5(
+    transcript, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, start UNINDEXED, end UNINDEXED, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return sqlite_store.connect(SEARCH_DB_PATH, _SCHEMA)
+
+
+# ------------------------------------------------------------
+# 1) Indexation (à la fin de chaque job)
+# ------------------------------------------------------------
+
+def _delete(conn: sqlite3.Connection, rows: List[tuple]) -> None:
+    for rowid, first, last in rows:
+        conn.execute("DELETE FROM episodes_fts WHERE rowid = ?", (rowid,))
+        if first is not None:
+            conn.execute("DELETE FROM segments_fts WHERE rowid BETWEEN ? AND ?", (first, last))
+        conn.execute("DELETE FROM episodes WHERE id = ?", (rowid,))
+
+
+def index_episode(episode_id: str, episode: Dict[str, Any], segments: List[Dict[str, Any]],
+                  content_hash: Optional[str] = None) -> None:
+    """
+    Indexe (ou ré-indexe) un épisode : transcription complète + segments
+    horodatés. Un épisode déjà indexé avec le même id ou le même contenu
+    audio est remplacé. Les segments du générique ne sont pas indexés.
+    """
+    segments = [seg for seg in segments if seg.get("source") != "intro" and seg["text"]]
+
+    with _connect() as conn:
+        # Verrou d'écriture dès le début : deux workers ne peuvent pas réserver
+        # la même plage de rowid
+        conn.execute("BEGIN IMMEDIATE")
+        previous = conn.execute(
+            "SELECT id, first_segment, last_segment FROM episodes WHERE episode_id = ? "
+            "OR (content_hash IS NOT NULL AND content_hash = ?)",
+            (episode_id, content_hash),
+        ).fetchall()
+        _delete(conn, previous)
+
+        # Plage de rowid réservée aux segments de cet épisode
+        first = (conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM segments_fts").fetchone()[0] + 1
+                 if segments else None)
+        conn.executemany(
+            "INSERT INTO segments_fts (rowid, text, start, end) VALUES (?, ?, ?, ?)",
+            ((first + i, seg["text"], seg["start"], seg["end"]) for i, seg in enumerate(segments)),
+        )
+
+        cursor = conn.execute(
+            "INSERT INTO episodes (episode_id, content_hash, title, category, audio_url, duration, "
+            "first_segment, last_segment, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (episode_id, content_hash, episode.get("title"), episode.get("category"),
+             episode.get("audio_url"), episode.get("duration"),
+             first, first + len(segments) - 1 if segments else None, time.time()),
+        )
+        transcript = episode.get("transcript") or " ".join(seg["text"] for seg in segments)
+        conn.execute("INSERT INTO episodes_fts (rowid, transcript) VALUES (?, ?)",
+                     (cursor.lastrowid, transcript))
+
+
+def remove_episode(episode_id: str) -> None:
+    with _connect() as conn:
+        _delete(conn, conn.execute(
+            "SELECT id, first_segment, last_segment FROM episodes WHERE episode_id = ?", (episode_id,)
+        ).fetchall())
+
+
+# ------------------------------------------------------------
+# 2) Recherche
+# ------------------------------------------------------------
+
+def _fts_query(query: str) -> str:
+    """
+    Requête utilisateur → requête FTS5 sûre : chaque mot est cité (pas de
+    syntaxe FTS5 involontaire), "expressions entre guillemets" gardées telles
+    quelles, `mot*` pour un préfixe. Tous les termes doivent être présents.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        if phrase:
+            terms.append('"' + " ".join(re.findall(r"\w+", phrase)) + '"')
+            continue
+        # Un "*" (ou des guillemets) seul ne préfixe pas le terme précédent
+        parts = re.findall(r"\w+", word)
+        if not parts:
+            continue
+        terms += [f'"{part}"' for part in parts]
+        if word.endswith("*"):
+            terms[-1] += "*"
+    return " ".join(t for t in terms if t != '""')
+
+
+def search(query: str, limit: int = 20, hits_per_episode: int = SEARCH_HITS_PER_EPISODE) -> Dict[str, Any]:
+    """
+    Épisodes classés par pertinence (BM25 sur la transcription complète),
+    avec pour chacun les segments qui contiennent la requête : temps de début
+    et de fin dans le fichier publié, extrait avec les termes [surlignés].
+    """
+    started = time.perf_counter()
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return {"query": query, "results": [], "took_ms": 0.0}
+
+    with _connect() as conn:
+        episodes = conn.execute(
+            "SELECT e.id, e.episode_id, e.title, e.category, e.audio_url, e.duration, "
+            "e.first_segment, e.last_segment, bm25(episodes_fts) AS score "
+            "FROM episodes_fts JOIN episodes e ON e.id = episodes_fts.rowid "
+            "WHERE episodes_fts MATCH ? ORDER BY score LIMIT ?",
+            (fts_query, limit),
+        ).fetchall()
+
+        results = []
+        for _, episode_id, title, category, audio_url, duration, first, last, score in episodes:
+            hits = []
+            if first is not None:
+                hits = [
+                    {"start": start, "end": end, "snippet": snippet}
+                    for start, end, snippet in conn.execute(
+                        "SELECT start, end, snippet(segments_fts, 0, '[', ']', '…', ?) "
+                        "FROM segments_fts WHERE segments_fts MATCH ? AND rowid BETWEEN ? AND ? "
+                        "ORDER BY rowid LIMIT ?",
+                        (SNIPPET_WORDS, fts_query, first, last, hits_per_episode),
+                    )
+                ]
+            results.append({
+                "episode_id": episode_id,
+                "title": title,
+                "category": category,
+                "audio_url": audio_url,
+                "duration": duration,
+                # bm25() de FTS5 est négatif (plus petit = plus pertinent)
+                "score": round(-score, 3),
+                "hits": hits,
+            })
+
+    return {
+        "query": query,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,58 @@
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Iterator, Optional, Set, Tuple
+
+# Bases dont le schéma a déjà été appliqué dans ce process
+_initialized: Set[Tuple[str, str]] = set()
+_initialized_lock = Lock()
+
+
+@contextmanager
+def connect(path: Path, schema: str,
+            row_factory: Optional[Callable[[sqlite3.Cursor, tuple], Any]] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Connexion courte (une par opération) : sûre entre process workers.
+    Le dossier, le mode WAL (persistant dans le fichier) et le schéma ne
+    sont appliqués qu'à la première connexion à `path` dans ce process.
+    Le bloc `with` est une transaction (commit, ou rollback sur exception).
+    """
+    marker = (str(Path(path).resolve()), schema)
+    with _initialized_lock:
+        first = marker not in _initialized
+
+    if first:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        if first:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(schema)
+            with _initialized_lock:
+                _initialized.add(marker)
+        if row_factory is not None:
+            conn.row_factory = row_factory
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def evict_lru(conn: sqlite3.Connection, table: str, max_bytes: int) -> None:
+    """
+    Supprime les entrées les moins récemment utilisées au-delà de `max_bytes`
+    (tables de cache : colonnes key, size, last_access).
+    """
+    total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+    if total <= max_bytes:
+        return
+
+    rows = conn.execute(f"SELECT key, size FROM {table} ORDER BY last_access ASC")
+    to_delete = []
+    for key, size in rows:
+        if total <= max_bytes:
+            break
+        to_delete.append((key,))
+        total -= size
+    conn.executemany(f"DELETE FROM {table} WHERE key = ?", to_delete)
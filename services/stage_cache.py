@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Optional
+
+from services import sqlite_store
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+STAGE_CACHE_PATH = Path(os.getenv("STAGE_CACHE_PATH", str(BASE_DIR / "uploads" / "cache" / "stages.sqlite")))
+
+# Taille maximale du cache (résultats JSON des étapes) avant éviction LRU
+STAGE_CACHE_MAX_BYTES = int(os.getenv("STAGE_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_results (
+    key TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    output TEXT NOT NULL,
+    output_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stage_results_last_access ON stage_results(last_access);
+CREATE INDEX IF NOT EXISTS idx_stage_results_stage ON stage_results(stage);
+"""
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return sqlite_store.connect(STAGE_CACHE_PATH, _SCHEMA)
+
+
+def digest(value: Any) -> str:
+    """SHA-256 d'une valeur JSON (clés triées : même valeur → même hash)."""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def make_key(stage: str, version: int, inputs: Dict[str, Any]) -> str:
+    """Clé = (étape, version de l'étape, hash des entrées et de la configuration)."""
+    return digest([stage, version, inputs])
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    """{"output", "output_hash"} ou None."""
+    with _connect() as conn:
+        row = conn.execute("SELECT output, output_hash FROM stage_results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE stage_results SET last_access = ? WHERE key = ?", (time.time(), key))
+    return {"output": json.loads(row[0]), "output_hash": row[1]}
+
+
+def put(key: str, stage: str, version: int, output: Any) -> str:
+    """Enregistre le résultat d'une étape ; retourne son hash (entrée des étapes suivantes)."""
+    payload = json.dumps(output, ensure_ascii=False)
+    output_hash = digest(output)
+    now = time.time()
+
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO stage_results "
+            "(key, stage, version, output, output_hash, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, stage, version, payload, output_hash, len(payload.encode("utf-8")), now, now),
+        )
+        sqlite_store.evict_lru(conn, "stage_results", STAGE_CACHE_MAX_BYTES)
+    return output_hash
+
+
+def stats() -> Dict[str, Any]:
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT stage, COUNT(*), COALESCE(SUM(size), 0) FROM stage_results GROUP BY stage"
+        ).fetchall()
+    return {stage: {"entries": count, "bytes": size} for stage, count, size in rows}
@@ -1,35 +1,400 @@
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-import whisper
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-# On charge le modèle Whisper une seule fois
-model = whisper.load_model("base")
+import numpy as np
 
+from services import audio, stt_backends, transcript_cache, vad
 
-def transcribe(audio_path: str) -> str:
+# Configuration du modèle (variables d'environnement) ; le moteur
+# d'inférence est choisi par STT_BACKEND (voir services.stt_backends)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")  # "cpu", "cuda" ou "auto"
+WHISPER_POOL_SIZE = int(os.getenv("WHISPER_POOL_SIZE", "1"))
+
+# Moteur : "single" (un appel Whisper sur tout l'épisode) ou "chunked"
+# (morceaux de ~30 s coupés aux silences, transcrits en parallèle)
+STT_ENGINE = os.getenv("STT_ENGINE", "single")
+STT_CHUNK_WORKERS = int(os.getenv("STT_CHUNK_WORKERS", "2"))
+
+WHISPER_SAMPLE_RATE = audio.WHISPER_SAMPLE_RATE
+
+
+# ------------------------------------------------------------
+# 1) Registre de modèles : chargement paresseux + pool d'instances
+# ------------------------------------------------------------
+
+_backend: Optional[stt_backends.STTBackend] = None
+
+
+def get_backend() -> stt_backends.STTBackend:
+    """Backend d'inférence du process (STT_BACKEND), créé une seule fois."""
+    global _backend
+    if _backend is None:
+        _backend = stt_backends.get_backend()
+    return _backend
+
+
+class _ModelPool:
     """
-    Transcrit un fichier audio ou vidéo avec Whisper.
-    En cas d'erreur, retourne un message explicite sans casser l'API.
+    Pool de `size` instances d'un même modèle, chargées par le backend.
+    Les instances sont chargées à la demande (ou par `preload`) puis
+    réutilisées ; `acquire` bloque si toutes sont occupées.
     """
-    audio_path_str = str(Path(audio_path))
 
-    # 1) Vérifier que le fichier existe vraiment
-    p = Path(audio_path_str)
-    if not p.exists():
-        return f"[Transcription impossible] Fichier introuvable : {audio_path_str}"
+    def __init__(self, backend: stt_backends.STTBackend, name: str, device: str, size: int):
+        self.backend = backend
+        self.name = name
+        self.device = device
+        self.size = max(1, size)
+        self._free: "queue.Queue[Any]" = queue.Queue()
+        self._created = 0
+        self._lock = Lock()
+
+    def _load(self) -> Any:
+        # Import dans le backend : le moteur n'est chargé qu'au premier usage
+        return self.backend.load(self.name, self.device)
+
+    def transcribe(self, source: "stt_backends.BackendInput") -> Dict[str, Any]:
+        """Transcription par une instance libre du pool (schéma commun des backends)."""
+        with self.acquire() as model:
+            return self.backend.transcribe(model, source, WHISPER_LANGUAGE, self.device)
+
+    def _try_create(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+        try:
+            self._free.put(self._load())
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+        return True
+
+    def preload(self) -> None:
+        while self._try_create():
+            pass
+
+    @property
+    def loaded(self) -> int:
+        return self._created
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        try:
+            model = self._free.get_nowait()
+        except queue.Empty:
+            self._try_create()
+            model = self._free.get()
+        try:
+            yield model
+        finally:
+            self._free.put(model)
+
+
+_pools: Dict[Tuple[str, str, str], _ModelPool] = {}
+_pools_lock = Lock()
+
+
+def get_pool(name: str = WHISPER_MODEL, device: str = WHISPER_DEVICE) -> _ModelPool:
+    """Pool (unique par process) pour un triplet (backend, modèle, device)."""
+    backend = get_backend()
+    device = backend.resolve_device(device)
+    with _pools_lock:
+        pool = _pools.get((backend.name, name, device))
+        if pool is None:
+            pool = _ModelPool(backend, name, device, WHISPER_POOL_SIZE)
+            _pools[(backend.name, name, device)] = pool
+        return pool
+
+
+# État des modèles des workers de morceaux, relevé par warmup()
+_chunk_status: Optional[Dict[str, Any]] = None
+
+
+def _uses_chunk_pool() -> bool:
+    """Moteur par morceaux en parallèle : seuls les workers de morceaux transcrivent."""
+    return STT_ENGINE == "chunked" and STT_CHUNK_WORKERS > 1
+
+
+def warmup() -> Dict[str, Any]:
+    """
+    Précharge le pool par défaut (appelé au démarrage des workers). Avec le
+    moteur par morceaux en parallèle, le modèle n'est chargé que dans les
+    workers de morceaux : on démarre leur pool et on attend le premier.
+    """
+    global _chunk_status
+    if _uses_chunk_pool():
+        _chunk_status = _get_chunk_executor().submit(_pool_status).result()
+        return status()
+
+    get_pool().preload()
+    return status()
+
+
+def status() -> Dict[str, Any]:
+    """État du modèle par défaut (sans rien charger) : ce process ou ses workers de morceaux."""
+    if _chunk_status is not None:
+        return dict(_chunk_status, chunk_workers=STT_CHUNK_WORKERS)
+    return _pool_status()
+
+
+def _pool_status() -> Dict[str, Any]:
+    loaded = sum(p.loaded for (_, name, _), p in _pools.items() if name == WHISPER_MODEL)
+    return {
+        "backend": get_backend().name,
+        "model": WHISPER_MODEL,
+        "device": WHISPER_DEVICE,
+        "pool_size": WHISPER_POOL_SIZE,
+        "loaded": loaded,
+        "ready": loaded > 0,
+    }
+
+
+# ------------------------------------------------------------
+# 2) Moteur par morceaux (VAD + process pool)
+# ------------------------------------------------------------
+
+# Reçoit chaque segment {start, end, text} dès qu'il est transcrit
+SegmentCallback = Callable[[Dict[str, Any]], None]
+
+# Marge audio ajoutée de chaque côté d'un morceau (contexte pour Whisper) ;
+# les segments de cette marge appartiennent au morceau voisin
+CHUNK_PADDING_S = 0.3
+
+_chunk_executor: Optional[ProcessPoolExecutor] = None
+_chunk_executor_lock = Lock()
+
+
+def _init_chunk_worker(threads: int) -> None:
+    """Un modèle par worker, et le moteur limité à sa part des cœurs."""
+    get_backend().set_threads(threads)
+    get_pool().preload()
+
+
+def _transcribe_chunk(samples: np.ndarray) -> List[Dict[str, Any]]:
+    """Exécuté dans un worker : segments d'un morceau (temps relatifs)."""
+    return get_pool().transcribe(samples)["segments"]
+
+
+def _get_chunk_executor() -> ProcessPoolExecutor:
+    global _chunk_executor
+    with _chunk_executor_lock:
+        if _chunk_executor is None:
+            # Chaque worker de jobs a son propre pool de morceaux : les cœurs
+            # sont partagés entre PIPELINE_WORKERS × STT_CHUNK_WORKERS modèles
+            from services.jobs import PIPELINE_WORKERS
+
+            threads = max(1, (os.cpu_count() or 1) // (PIPELINE_WORKERS * STT_CHUNK_WORKERS))
+            _chunk_executor = ProcessPoolExecutor(
+                max_workers=STT_CHUNK_WORKERS,
+                initializer=_init_chunk_worker,
+                initargs=(threads,),
+            )
+        return _chunk_executor
+
+
+def _padded(bounds: Tuple[int, int], total: int) -> Tuple[int, int]:
+    pad = int(CHUNK_PADDING_S * WHISPER_SAMPLE_RATE)
+    return max(0, bounds[0] - pad), min(total, bounds[1] + pad)
+
+
+def iter_stitched(chunks: List[Tuple[int, int]],
+                  results: Iterable[List[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """
+    Recolle les segments des morceaux au fur et à mesure qu'ils arrivent :
+    temps décalés par le début (avec marge) de chaque morceau, puis chaque
+    segment n'est gardé que par le morceau qui possède son milieu. Un segment
+    identique au précédent n'est supprimé que s'il le chevauche dans le temps
+    ou commence dans la marge de recouvrement du morceau : une phrase
+    réellement répétée plus loin ("Merci.", "Oui.") est conservée.
+    """
+    total = chunks[-1][1] if chunks else 0
+    previous: Optional[Dict[str, Any]] = None
+    previous_chunk = -1
+
+    for index, (bounds, segments) in enumerate(zip(chunks, results)):
+        offset = _padded(bounds, total)[0] / WHISPER_SAMPLE_RATE
+        own_start, own_end = bounds[0] / WHISPER_SAMPLE_RATE, bounds[1] / WHISPER_SAMPLE_RATE
+
+        for seg in offset_segments(segments, offset):
+            middle = (seg["start"] + seg["end"]) / 2
+            if not (own_start <= middle < own_end or (bounds[1] == total and middle >= own_end)):
+                continue
+            if previous is not None and seg["text"] == previous["text"]:
+                overlaps = seg["start"] < previous["end"]
+                in_margin = previous_chunk < index and seg["start"] < own_start + CHUNK_PADDING_S
+                if overlaps or in_margin:
+                    continue
+            previous, previous_chunk = seg, index
+            yield seg
+
+
+def iter_chunked(samples: np.ndarray) -> Iterator[Dict[str, Any]]:
+    """
+    Découpe le buffer mono 16 kHz aux silences (services.vad) en morceaux de
+    ~30 s, les transcrit en parallèle (un modèle par worker) et produit les
+    segments recollés, dans l'ordre, dès que chaque morceau est prêt.
+    """
+    chunks = vad.find_chunks(samples, WHISPER_SAMPLE_RATE)
+    pieces = [samples[slice(*_padded(bounds, len(samples)))] for bounds in chunks]
+
+    if STT_CHUNK_WORKERS > 1 and len(pieces) > 1:
+        results = _get_chunk_executor().map(_transcribe_chunk, pieces)
+    else:
+        results = (_transcribe_chunk(piece) for piece in pieces)
+
+    yield from iter_stitched(chunks, results)
+
+
+def transcribe_chunked(samples: np.ndarray,
+                       on_segment: Optional[SegmentCallback] = None) -> Dict[str, Any]:
+    """Moteur par morceaux ; `on_segment` reçoit chaque segment dès qu'il est prêt."""
+    segments = []
+    for seg in iter_chunked(samples):
+        segments.append(seg)
+        if on_segment:
+            on_segment(seg)
+
+    return {
+        "text": " ".join(seg["text"] for seg in segments).strip(),
+        "language": WHISPER_LANGUAGE,
+        "segments": segments,
+    }
+
+
+# ------------------------------------------------------------
+# 3) Transcription (avec cache par contenu)
+# ------------------------------------------------------------
+
+WHISPER_LANGUAGE = "fr"
+
+# Entrée acceptée : chemin, buffer float32 mono 16 kHz, ou fonction qui
+# produit ce buffer (appelée seulement si le cache ne répond pas)
+AudioInput = Union[str, np.ndarray, Callable[[], np.ndarray]]
+
+UNAVAILABLE_MESSAGE = (
+    "[Transcription non disponible pour cet épisode] "
+    "La transcription automatique sera activée dans la prochaine version de l’agent."
+)
+
+
+def _cache_options(pool: _ModelPool) -> Dict[str, Any]:
+    """Options qui influencent le résultat (donc la clé de cache)."""
+    options = pool.backend.options(pool.device)
+    options["engine"] = STT_ENGINE
+    if STT_ENGINE == "chunked":
+        options["chunk_s"] = vad.CHUNK_TARGET_S
+    return options
+
+
+def _run_whisper(pool: _ModelPool, audio_input: AudioInput,
+                 on_segment: Optional[SegmentCallback] = None) -> Dict[str, Any]:
+    if callable(audio_input):
+        audio_input = audio_input()
+
+    if isinstance(audio_input, np.ndarray):
+        source = audio_input
+        label = f"buffer PCM ({len(audio_input) / 16000:.0f} s)"
+    else:
+        source = str(Path(audio_input))
+        label = source
+
+    print(f"🔍 Transcription en cours ({STT_ENGINE}) : {label}")
+
+    if STT_ENGINE == "chunked":
+        if not isinstance(source, np.ndarray):
+            # Décodage ffmpeg commun, indépendant du backend
+            source = audio.decode(Path(source), WHISPER_SAMPLE_RATE, 1).samples[:, 0]
+        return transcribe_chunked(source, on_segment)
+
+    # Appel unique : le moteur ne rend la main qu'à la fin, les segments
+    # arrivent donc tous d'un coup (utiliser STT_ENGINE=chunked pour du direct)
+    result = pool.transcribe(source)
+    _emit(result["segments"], on_segment)
+    return result
+
+
+def fingerprint() -> Dict[str, Any]:
+    """Modèle, langue et options du pool par défaut (clé du cache des étapes du pipeline)."""
+    pool = get_pool()
+    return {"model": pool.name, "language": WHISPER_LANGUAGE, "options": _cache_options(pool)}
+
+
+def _emit(segments: List[Dict[str, Any]], on_segment: Optional[SegmentCallback]) -> None:
+    if on_segment:
+        for seg in segments:
+            on_segment(seg)
+
+
+def transcribe_segments(audio_input: AudioInput, content_hash: Optional[str] = None,
+                        on_segment: Optional[SegmentCallback] = None) -> Dict[str, Any]:
+    """
+    Transcription complète : {"text", "language", "segments": [{start, end, text}]}.
+    `on_segment` reçoit les segments au fil de l'eau (transcription partielle).
+
+    Si `content_hash` est fourni (ou si l'entrée est un fichier), le résultat
+    est mis en cache sur disque par (contenu, modèle, langue, options) :
+    un ré-upload du même fichier ne relance pas Whisper.
+    En cas d'erreur, `text` contient un message explicite et `error` vaut True.
+    """
+    if isinstance(audio_input, (str, Path)):
+        audio_input = str(Path(audio_input))
+
+        # 1) Vérifier que le fichier existe vraiment
+        if not Path(audio_input).exists():
+            return {
+                "text": f"[Transcription impossible] Fichier introuvable : {audio_input}",
+                "segments": [], "error": True,
+            }
+        content_hash = content_hash or audio.content_hash(Path(audio_input))
 
     try:
-        print(f"🔍 Transcription en cours : {audio_path_str}")
+        pool = get_pool()
 
-        result = model.transcribe(audio_path_str, language="fr", fp16=False)
-        text = result.get("text", "").strip()
+        key = None
+        if content_hash:
+            key = transcript_cache.make_key(content_hash, pool.name, WHISPER_LANGUAGE, _cache_options(pool))
+            cached = transcript_cache.get(key)
+            if cached is not None:
+                _emit(cached["segments"], on_segment)
+                return cached
 
-        if not text:
-            return "[Transcription vide] Aucun texte détecté dans l'audio."
+        result = _run_whisper(pool, audio_input, on_segment)
 
-        return text
+        if not result["text"]:
+            return {
+                "text": "[Transcription vide] Aucun texte détecté dans l'audio.",
+                "segments": [], "error": True,
+            }
+
+        if key:
+            transcript_cache.put(key, content_hash, pool.name, WHISPER_LANGUAGE,
+                                 _cache_options(pool), result)
+        return result
 
     except Exception:
-        return (
-            "[Transcription non disponible pour cet épisode] "
-            "La transcription automatique sera activée dans la prochaine version de l’agent."
-        )
+        return {"text": UNAVAILABLE_MESSAGE, "segments": [], "error": True}
+
+
+def transcribe(audio_input: AudioInput, content_hash: Optional[str] = None) -> str:
+    """
+    Transcrit un fichier audio ou vidéo avec Whisper (texte seul).
+    Accepte aussi un buffer déjà décodé (float32 mono 16 kHz) : Whisper ne
+    relance alors pas ffmpeg.
+    En cas d'erreur, retourne un message explicite sans casser l'API.
+    """
+    return transcribe_segments(audio_input, content_hash)["text"]
+
+
+def offset_segments(segments: List[Dict[str, Any]], offset: float) -> List[Dict[str, Any]]:
+    """Décale les temps des segments (ex. durée de l'intro dans le fichier publié)."""
+    if not offset:
+        return segments
+    return [dict(seg, start=seg["start"] + offset, end=seg["end"] + offset) for seg in segments]
@@ -0,0 +1,153 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+# Moteur d'inférence : "whisper" (openai-whisper, PyTorch) ou
+# "faster-whisper" (CTranslate2, quantifié int8 par défaut sur CPU)
+STT_BACKEND = os.getenv("STT_BACKEND", "whisper")
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")
+
+# Décodage commun aux deux moteurs : 1 = glouton (défaut d'openai-whisper),
+# > 1 = recherche en faisceau. Les comparaisons de backends (WER, vitesse)
+# se font ainsi à décodage égal.
+STT_BEAM_SIZE = int(os.getenv("STT_BEAM_SIZE", "1"))
+
+# Entrée d'un backend : chemin de fichier ou buffer float32 mono 16 kHz
+BackendInput = Union[str, np.ndarray]
+
+
+class STTBackend(ABC):
+    """
+    Interface commune des moteurs de transcription. Tous retournent le même
+    schéma : {"text", "language", "segments": [{start, end, text}]}.
+    """
+
+    name = ""
+
+    def __init__(self) -> None:
+        # Threads d'inférence par process (0 = valeur par défaut du moteur)
+        self.threads = 0
+
+    @abstractmethod
+    def resolve_device(self, device: str) -> str:
+        """"auto" → "cuda" si un GPU est visible, sinon "cpu"."""
+
+    def set_threads(self, threads: int) -> None:
+        self.threads = threads
+
+    @abstractmethod
+    def load(self, model_name: str, device: str) -> Any:
+        """Charge une instance du modèle (appelé par le pool de stt)."""
+
+    @abstractmethod
+    def transcribe(self, model: Any, source: BackendInput, language: str, device: str) -> Dict[str, Any]:
+        """Transcrit `source` avec une instance chargée par `load`."""
+
+    def options(self, device: str) -> Dict[str, Any]:
+        """Options qui influencent le résultat (clé du cache de transcriptions)."""
+        return {"backend": self.name}
+
+
+def _segment(start: float, end: float, text: str) -> Dict[str, Any]:
+    return {"start": float(start), "end": float(end), "text": text.strip()}
+
+
+class WhisperBackend(STTBackend):
+    """openai-whisper : fp32 sur CPU, fp16 sur GPU."""
+
+    name = "whisper"
+
+    def resolve_device(self, device: str) -> str:
+        if device != "auto":
+            return device
+        import torch
+
+        return "cuda" if torch.cuda.is_available() else "cpu"
+
+    def set_threads(self, threads: int) -> None:
+        import torch
+
+        super().set_threads(threads)
+        torch.set_num_threads(threads)
+
+    def load(self, model_name: str, device: str) -> Any:
+        # Import ici : torch / whisper ne sont chargés qu'au premier usage
+        import whisper
+
+        return whisper.load_model(model_name, device=device)
+
+    def _decode_options(self, device: str) -> Dict[str, Any]:
+        options = {"task": "transcribe", "fp16": device != "cpu"}
+        if STT_BEAM_SIZE > 1:
+            options["beam_size"] = STT_BEAM_SIZE
+        return options
+
+    def transcribe(self, model: Any, source: BackendInput, language: str, device: str) -> Dict[str, Any]:
+        result = model.transcribe(source, language=language, **self._decode_options(device))
+        return {
+            "text": result.get("text", "").strip(),
+            "language": result.get("language", language),
+            "segments": [_segment(s["start"], s["end"], s["text"]) for s in result.get("segments", [])],
+        }
+
+    def options(self, device: str) -> Dict[str, Any]:
+        # Mêmes options qu'avant l'introduction des backends (décodage glouton) :
+        # le cache reste valide
+        return self._decode_options(device)
+
+
+class FasterWhisperBackend(STTBackend):
+    """
+    faster-whisper (CTranslate2) : mêmes poids que Whisper, convertis et
+    quantifiés (`STT_COMPUTE_TYPE`, int8 par défaut). Plus rapide et plus
+    léger en mémoire sur CPU, sans PyTorch.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, compute_type: str = STT_COMPUTE_TYPE):
+        super().__init__()
+        self.compute_type = compute_type
+
+    def resolve_device(self, device: str) -> str:
+        if device != "auto":
+            return device
+        import ctranslate2
+
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+    def load(self, model_name: str, device: str) -> Any:
+        from faster_whisper import WhisperModel
+
+        return WhisperModel(model_name, device=device, compute_type=self.compute_type,
+                            cpu_threads=self.threads)
+
+    def transcribe(self, model: Any, source: BackendInput, language: str, device: str) -> Dict[str, Any]:
+        segments, info = model.transcribe(source, language=language, task="transcribe",
+                                          beam_size=STT_BEAM_SIZE)
+        # `segments` est un générateur : le décodage a lieu pendant l'itération
+        result: List[Dict[str, Any]] = [_segment(s.start, s.end, s.text) for s in segments]
+        return {
+            "text": " ".join(seg["text"] for seg in result).strip(),
+            "language": info.language or language,
+            "segments": result,
+        }
+
+    def options(self, device: str) -> Dict[str, Any]:
+        return {"backend": self.name, "task": "transcribe", "compute_type": self.compute_type,
+                "beam_size": STT_BEAM_SIZE}
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def get_backend(name: str = STT_BACKEND) -> STTBackend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend STT inconnu : {name} (attendu : {', '.join(BACKENDS)})")
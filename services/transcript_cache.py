@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Optional
+
+from services import sqlite_store
+
+# Dossiers
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_DB_PATH = Path(os.getenv("TRANSCRIPT_CACHE_PATH", str(BASE_DIR / "uploads" / "cache" / "transcripts.sqlite")))
+
+# Taille maximale du cache (transcriptions JSON) avant éviction LRU
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    language TEXT,
+    options TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts(last_access);
+CREATE INDEX IF NOT EXISTS idx_transcripts_content_hash ON transcripts(content_hash);
+"""
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return sqlite_store.connect(CACHE_DB_PATH, _SCHEMA)
+
+
+def make_key(content_hash: str, model: str, language: Optional[str],
+             options: Dict[str, Any]) -> str:
+    """Clé = (hash du contenu audio, modèle, langue, options de décodage)."""
+    raw = json.dumps([content_hash, model, language, options], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    """Transcription complète (texte + segments) ou None."""
+    with _connect() as conn:
+        row = conn.execute("SELECT payload FROM transcripts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (time.time(), key))
+    return json.loads(row[0])
+
+
+def put(key: str, content_hash: str, model: str, language: Optional[str],
+        options: Dict[str, Any], transcription: Dict[str, Any]) -> None:
+    payload = json.dumps(transcription, ensure_ascii=False)
+    now = time.time()
+
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO transcripts "
+            "(key, content_hash, model, language, options, payload, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, content_hash, model, language, json.dumps(options, sort_keys=True),
+             payload, len(payload.encode("utf-8")), now, now),
+        )
+        sqlite_store.evict_lru(conn, "transcripts", TRANSCRIPT_CACHE_MAX_BYTES)
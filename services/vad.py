@@ -0,0 +1,154 @@
+import os
+from bisect import bisect_right
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from services import quality
+
+# Détection d'activité vocale (VAD) par énergie, sur trames courtes
+VAD_FRAME_MS = 30
+
+# Découpage en morceaux pour Whisper (fenêtre native de 30 s, marge comprise)
+CHUNK_TARGET_S = 29.0
+CHUNK_MIN_S = 15.0
+
+
+def frame_levels(samples: np.ndarray, sample_rate: int, frame_ms: int = VAD_FRAME_MS) -> np.ndarray:
+    """Niveau (dBFS) de chaque trame d'un signal mono."""
+    return quality.frame_dbfs(samples.reshape(-1, 1), sample_rate, frame_ms)
+
+
+def find_chunks(samples: np.ndarray, sample_rate: int,
+                target_s: float = CHUNK_TARGET_S, min_s: float = CHUNK_MIN_S) -> List[Tuple[int, int]]:
+    """
+    Découpe un signal mono en morceaux d'au plus `target_s` secondes, en
+    coupant dans la trame la plus calme entre `min_s` et `target_s` après le
+    début du morceau (idéalement un silence entre deux phrases).
+    Retourne des bornes (début, fin) en échantillons.
+    """
+    total = len(samples)
+    target = int(target_s * sample_rate)
+    if total <= target:
+        return [(0, total)]
+
+    frame_len = max(1, int(sample_rate * VAD_FRAME_MS / 1000))
+    frame_db = frame_levels(samples, sample_rate)
+
+    # Lissage sur 3 trames : on évite de couper sur un creux isolé en pleine syllabe
+    smoothed = np.convolve(frame_db, np.ones(3) / 3, mode="same")
+
+    chunks = []
+    start = 0
+    while total - start > target:
+        lo = (start + int(min_s * sample_rate)) // frame_len
+        hi = (start + target) // frame_len
+        cut_frame = lo + int(np.argmin(smoothed[lo:hi]))
+        cut = cut_frame * frame_len + frame_len // 2
+        chunks.append((start, cut))
+        start = cut
+
+    chunks.append((start, total))
+    return chunks
+
+
+# ------------------------------------------------------------
+# Suppression des silences avant Whisper
+# ------------------------------------------------------------
+
+# Seuil parole / silence : bruit de fond du fichier + marge
+VAD_MARGIN_DB = 10.0
+VAD_MIN_THRESHOLD_DB = -60.0
+
+# Silences plus longs que SKIP_MIN_SILENCE_S retirés (0 = désactivé) ;
+# on garde SKIP_KEEP_MARGIN_S de chaque côté pour ne pas couper de mots
+SKIP_MIN_SILENCE_S = float(os.getenv("STT_SKIP_MIN_SILENCE_S", "2.0"))
+SKIP_KEEP_MARGIN_S = 0.3
+
+
+def fingerprint() -> Dict[str, Any]:
+    """Réglages qui changent les plages envoyées à Whisper."""
+    return {
+        "margin_db": VAD_MARGIN_DB,
+        "min_threshold_db": VAD_MIN_THRESHOLD_DB,
+        "skip_min_silence_s": SKIP_MIN_SILENCE_S,
+        "keep_margin_s": SKIP_KEEP_MARGIN_S,
+    }
+
+
+def speech_threshold(frame_db: np.ndarray) -> float:
+    """Seuil parole / silence : bruit de fond + VAD_MARGIN_DB."""
+    return max(quality.noise_floor(frame_db) + VAD_MARGIN_DB, VAD_MIN_THRESHOLD_DB)
+
+
+def skip_plan(frame_db: np.ndarray, frame_ms: int, duration: float,
+              min_silence_s: float = SKIP_MIN_SILENCE_S) -> Dict[str, Any]:
+    """
+    À partir des niveaux par trame déjà calculés par l'analyse qualité,
+    liste les plages à garder pour Whisper (en secondes, temps d'origine).
+
+    Table de correspondance : chaque plage gardée est (début dans l'audio
+    compacté, début d'origine, durée) → voir `remap_segments`.
+    """
+    frame_s = frame_ms / 1000
+    key = f"skip={min_silence_s}/{SKIP_KEEP_MARGIN_S}"
+
+    if min_silence_s <= 0 or frame_db is None or frame_db.size == 0:
+        return {"key": "", "spans": [(0.0, 0.0, duration)], "skipped_seconds": 0.0}
+
+    silent = frame_db <= speech_threshold(frame_db)
+
+    # Bornes des suites de trames silencieuses
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    kept = []
+    cursor = 0.0
+    for s, e in zip((starts * frame_s).tolist(), np.minimum(ends * frame_s, duration).tolist()):
+        if e - s < min_silence_s:
+            continue
+        cut_start = s + SKIP_KEEP_MARGIN_S if s > 0 else 0.0
+        cut_end = e - SKIP_KEEP_MARGIN_S if e < duration else duration
+        if cut_end > cut_start:
+            if cut_start > cursor:
+                kept.append((cursor, cut_start))
+            cursor = cut_end
+    if cursor < duration:
+        kept.append((cursor, duration))
+
+    spans = []
+    compact_start = 0.0
+    for start, end in kept:
+        spans.append((compact_start, start, end - start))
+        compact_start += end - start
+
+    return {"key": key, "spans": spans, "skipped_seconds": round(float(duration - compact_start), 2)}
+
+
+def compact(samples: np.ndarray, plan: Dict[str, Any], sample_rate: int) -> np.ndarray:
+    """Buffer réduit aux seules plages gardées (entrée de Whisper)."""
+    if plan["skipped_seconds"] <= 0:
+        return samples
+    parts = [
+        samples[int(orig * sample_rate):int((orig + length) * sample_rate)]
+        for _, orig, length in plan["spans"]
+    ]
+    return np.concatenate(parts) if parts else samples[:0]
+
+
+def _remap_time(t: float, spans: List[Tuple[float, float, float]], starts: List[float]) -> float:
+    i = max(0, bisect_right(starts, t) - 1)
+    compact_start, orig_start, length = spans[i]
+    return orig_start + min(t - compact_start, length)
+
+
+def remap_segments(segments: List[Dict[str, Any]], plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Ramène les temps des segments (audio compacté) aux temps d'origine."""
+    if plan["skipped_seconds"] <= 0:
+        return segments
+    spans = plan["spans"]
+    starts = [span[0] for span in spans]
+    return [
+        dict(seg, start=_remap_time(seg["start"], spans, starts), end=_remap_time(seg["end"], spans, starts))
+        for seg in segments
+    ]